@@ -1,10 +1,55 @@
 # app_server.py - Web-сервер для Telegram Mini App интерфейса
 
-from flask import Flask, jsonify
-import models
+import time
+import hmac
+import uuid
+
+from flask import Flask, jsonify, request, g
+from telebot import types
+import config
+import metrics
+import signal_store
+import bot
+from live_feed import feed
+from stats import stats
+from event_bus import bus, TOPIC_SIGNAL_STORED, TOPIC_SIGNAL_UPDATED, BLOCK, DROP_OLDEST
 
 app = Flask(__name__, static_folder="frontend", static_url_path="/")
 
+# Префикс ETag уникален для процесса: после перезапуска счётчик версий начинается заново
+ETAG_PREFIX = uuid.uuid4().hex[:8]
+
+# Показатели, вычисляемые только в момент чтения /metrics
+metrics.Gauge("signalbot_bus_queue_depth", "Глубина очереди потребителя шины событий.", ("consumer",),
+              collect=lambda: [((s["name"],), s["depth"]) for s in bus.stats()])
+metrics.Counter("signalbot_bus_dropped_events_total", "События, отброшенные потребителем шины.", ("consumer",),
+                collect=lambda: [((s["name"],), s["dropped"]) for s in bus.stats()])
+metrics.Counter("signalbot_bus_overflowed_events_total", "События, поставленные в очередь сверх лимита.",
+                ("consumer",), collect=lambda: [((s["name"],), s["overflowed"]) for s in bus.stats()])
+metrics.Gauge("signalbot_sse_clients", "Подключённые клиенты /api/stream.").set_function(feed.client_count)
+metrics.Gauge("signalbot_webhook_queue_depth", "Обновления Telegram, ожидающие обработки.").set_function(
+    lambda: len(bot.updates))
+metrics.Gauge("signalbot_signals_buffered", "Сигналы в буфере /api/signals.").set_function(
+    lambda: len(signal_store.signals))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Время обработки и статус каждого запроса (для /api/stream – время до начала потока).
+    """
+    endpoint = request.endpoint or "unknown"
+    started = g.pop("request_started", None)
+    if started is not None:
+        metrics.http_request_seconds.labels(endpoint).observe(time.perf_counter() - started)
+    metrics.http_requests_total.labels(endpoint, response.status_code).inc()
+    return response
+
 @app.route("/")
 def index_page():
     """Отдаёт главную страницу (frontend/index.html)."""
@@ -19,25 +64,219 @@ def analytics_page():
 def get_signals():
     """
     Возвращает JSON со свежими сигналами для веб-интерфейса.
-    Параметр limit передаётся через query-string (default: 20).
+    Параметры query-string:
+    - limit (default: 20) – сколько сигналов вернуть;
+    - since_id – вернуть только сигналы с id > since_id (курсор для инкрементальных запросов);
+    - asset, direction, result – фильтры на стороне сервера (result: WIN / LOSS / PENDING).
+    Ответ снабжается ETag (версия хранилища); при совпадении If-None-Match возвращается 304.
     """
-    from flask import request
+    from flask import request, Response
     try:
         limit = int(request.args.get("limit", 20))
     except ValueError:
         limit = 20
+    # 0 и отрицательные значения иначе превратились бы в срез [-0:] / [-n:] – весь буфер или его начало
+    limit = max(1, min(limit, config.SIGNALS_BUFFER_SIZE))
+    try:
+        since_id = int(request.args["since_id"]) if "since_id" in request.args else None
+    except ValueError:
+        since_id = None
+
+    # Проверяем ETag до построения ответа – неизменившиеся опросы почти ничего не стоят
+    etag = f"{ETAG_PREFIX}-{signal_store.version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        version, body = signal_store.select_encoded(
+            limit,
+            since_id=since_id,
+            asset=request.args.get("asset") or None,
+            direction=request.args.get("direction") or None,
+            result=request.args.get("result") or None
+        )
+        etag = f"{ETAG_PREFIX}-{version}"
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/stream")
+def stream_events():
+    """
+    Поток Server-Sent Events: события "signal" (новый сигнал) и "settled" (WIN/LOSS).
+    Поддерживает возобновление по заголовку Last-Event-ID (или параметру last_event_id).
+    """
+    from flask import request, Response, stream_with_context
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    connection = feed.connect(last_event_id)
+    if connection is None:
+        return Response("Too many stream clients", status=503, headers={"Retry-After": "10"})
+    client, replay = connection
+    return Response(
+        stream_with_context(feed.stream(client, replay, heartbeat=config.SSE_HEARTBEAT)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/api/stats")
+def get_stats():
+    """
+    Возвращает агрегированную статистику: win rate и активность по дням и часам,
+    по активам и направлениям, а также экспозицию Martingale.
+    Необязательные параметры: from, to ("YYYY-MM-DD[ HH]") – итоги за диапазон.
+    Поддерживает ETag (версия агрегатов).
+    """
+    from flask import request, Response
+    start, end = request.args.get("from"), request.args.get("to")
+    etag = f"{ETAG_PREFIX}-s{stats.version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(stats.snapshot(start, end))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/history")
+def get_history():
+    """
+    Возвращает сигналы из истории (SQLite) за диапазон времени.
+    Параметры query-string: asset, from, to ("YYYY-MM-DD[ HH:MM:SS]"), limit (default: 1000).
+    """
+    from flask import request, Response
+    try:
+        limit = max(1, min(int(request.args.get("limit", 1000)), 10000))
+    except ValueError:
+        limit = 1000
+    history = signal_store.history.query(
+        asset=request.args.get("asset"),
+        start=request.args.get("from"),
+        end=request.args.get("to"),
+        limit=limit
+    )
+    body = b"[" + b",".join(sig.to_json() for sig in history) + b"]"
+    return Response(body, mimetype="application/json")
+
+
+@app.route("/api/bus")
+def get_bus_stats():
+    """
+    Возвращает состояние очередей шины событий (глубина, отброшенные события).
+    """
+    return jsonify(bus.stats())
+
+
+@app.route("/telegram/webhook", methods=["POST"])
+def telegram_webhook():
+    """
+    Приём обновлений Telegram (TELEGRAM_MODE=webhook). Запрос проверяется по секрету из заголовка
+    X-Telegram-Bot-Api-Secret-Token, а обновление передаётся обработчикам бота через ограниченный пул –
+    ответ Telegram уходит сразу, не дожидаясь обработчика.
+    """
+    from flask import Response
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "").encode()
+    if not config.WEBHOOK_SECRET or not hmac.compare_digest(secret, config.WEBHOOK_SECRET.encode()):
+        return Response(status=403)
+    try:
+        update = types.Update.de_json(request.get_data(as_text=True))
+    except (ValueError, KeyError, TypeError):
+        update = None
+    if update is None:
+        return Response(status=400)
+    if not bot.updates.submit(update):
+        # Очередь заполнена – Telegram повторит доставку
+        return Response(status=503, headers={"Retry-After": "1"})
+    return Response(status=200)
+
+
+@app.route("/metrics")
+def get_metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    """
+    from flask import Response
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def subscribe_consumers() -> None:
+    """
+    Подписывает веб-часть на шину событий процесса: сохранённые сигналы (уже с id)
+    транслируются клиентам Mini App через SSE, а агрегаты /api/stats обновляются за O(1) на событие.
+    """
+    bus.subscribe("live-feed", {TOPIC_SIGNAL_STORED: feed.publish_signal,
+                                TOPIC_SIGNAL_UPDATED: feed.publish_settlement},
+                  maxsize=config.BUS_QUEUE_SIZE, policy=DROP_OLDEST)
+    bus.subscribe("stats", {TOPIC_SIGNAL_STORED: stats.on_signal,
+                            TOPIC_SIGNAL_UPDATED: stats.on_settled},
+                  maxsize=config.BUS_QUEUE_SIZE, policy=BLOCK)
+
+
+def self_check(count: int = 30) -> None:
+    """
+    Проверка /api/signals через тестовый клиент Flask на буфере сигналов процесса:
+    выборка последних limit, курсор since_id без пропусков и повторов, фильтры, ограничение limit,
+    ETag / If-None-Match (304) и смена ETag после нового сигнала и после расчёта.
+    """
+    from models import Signal, Result
+
+    signal_store.signals.clear()
+    for i in range(1, count + 1):
+        signal_store.buffer_signal(Signal(ts=1_700_000_000 + i, asset=("EURUSD", "GBPUSD")[i % 2],
+                                          direction=("CALL", "PUT")[i % 3 == 0], amount=1.0, entry_price=1.1,
+                                          result=("WIN", "LOSS", None)[i % 3], id=i))
+    client = app.test_client()
+
+    def ids(response) -> list[int]:
+        return [sig["id"] for sig in response.get_json()]
+
+    response = client.get("/api/signals?limit=10")
+    assert response.status_code == 200 and ids(response) == list(range(count - 9, count + 1)), ids(response)
+    etag = response.headers["ETag"]
+    response = client.get("/api/signals?limit=10", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and not response.data, response.status_code
+
+    # Курсор: страницы since_id покрывают буфер ровно один раз
+    seen, cursor = [], 0
+    while True:
+        page = ids(client.get(f"/api/signals?since_id={cursor}&limit=7"))
+        if not page:
+            break
+        seen.extend(page)
+        cursor = page[-1]
+    assert seen == list(range(1, count + 1)), seen
+
+    assert all(sig["asset"] == "GBPUSD" for sig in client.get("/api/signals?asset=GBPUSD&limit=100").get_json())
+    assert all(sig["direction"] == "PUT" for sig in client.get("/api/signals?direction=PUT&limit=100").get_json())
+    pending = client.get("/api/signals?result=PENDING&limit=100").get_json()
+    assert pending and all(sig["result"] is None for sig in pending)
+    for limit, expected in (("0", [count]), ("-3", [count]), ("abc", list(range(count - 19, count + 1))),
+                            (str(10 ** 9), list(range(1, count + 1)))):
+        assert ids(client.get(f"/api/signals?limit={limit}")) == expected, limit
+
+    # Расчёт и новый сигнал меняют ETag: клиент со старым ETag получает 200 и свежие данные
+    settled = next(sig for sig in signal_store.signals if sig.result is None)
+    signal_store.publish_updated(Signal(settled.ts, settled.asset, settled.direction, settled.amount,
+                                        settled.entry_price, Result.WIN, settled.id))
+    response = client.get("/api/signals?limit=100", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert {sig["id"]: sig["result"] for sig in response.get_json()}[settled.id] == "WIN"
+    etag = response.headers["ETag"]
+    signal_store.buffer_signal(Signal(ts=1_700_000_000 + count + 1, asset="EURUSD", direction="CALL", amount=1.0,
+                                      entry_price=1.1, id=count + 1))
+    response = client.get("/api/signals?limit=100", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and ids(response)[-1] == count + 1
+    print(f"OK: /api/signals – {count + 1} сигналов, курсор, фильтры, limit, ETag/304.")
+
 
-    with models.signals_lock:
-        recent_signals = models.signals[-limit:]
-        data = [
-            {
-                "time": sig.time,
-                "asset": sig.asset,
-                "direction": sig.direction,
-                "amount": sig.amount,
-                "entry_price": sig.entry_price,
-                "result": sig.result
-            }
-            for sig in recent_signals
-        ]
-    return jsonify(data)
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    self_check()
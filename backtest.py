@@ -0,0 +1,216 @@
+# backtest.py – Szybki backtest: odtwarza serię cen przez Strategy, MoneyManager i reguły rozliczeń symulatora
+
+import os
+import csv
+import time
+import logging
+import argparse
+import itertools
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from clock import VirtualClock
+from series import AssetSeries
+from event_bus import TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED
+from strategy import Strategy
+from money import MoneyManager
+from data_provider import DummyDataProvider
+from tick_archive import TickArchive
+
+
+@dataclass
+class BacktestResult:
+    """
+    Wynik jednego przebiegu backtestu.
+    :param params: Parametry przebiegu (window_size, trade_duration_steps, ...).
+    :param ticks: Liczba odtworzonych cen.
+    :param trades: Liczba rozliczonych transakcji.
+    :param pnl: Zysk/strata w USD (wygrana = stawka × payout, przegrana = -stawka).
+    :param max_drawdown: Największy spadek kapitału od szczytu (USD).
+    :param max_stake: Największa stawka (istotne przy Martingale).
+    :param elapsed: Czas obliczeń w sekundach.
+    """
+    params: dict
+    ticks: int = 0
+    trades: int = 0
+    wins: int = 0
+    losses: int = 0
+    pnl: float = 0.0
+    max_drawdown: float = 0.0
+    max_stake: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def win_rate(self) -> float | None:
+        return 100.0 * self.wins / self.trades if self.trades else None
+
+
+class _ResultBus:
+    """
+    Zamiast szyny zdarzeń: liczy wynik backtestu z publikowanych sygnałów.
+    """
+
+    def __init__(self, result: BacktestResult, payout: float):
+        self.result = result
+        self.payout = payout
+        self.peak = 0.0
+
+    def publish(self, topic: str, signal) -> None:
+        result = self.result
+        if topic == TOPIC_SIGNAL_NEW:
+            if signal.amount > result.max_stake:
+                result.max_stake = signal.amount
+        elif topic == TOPIC_SIGNAL_SETTLED:
+            result.trades += 1
+            if signal.result == "WIN":
+                result.wins += 1
+                result.pnl += signal.amount * self.payout
+            else:
+                result.losses += 1
+                result.pnl -= signal.amount
+            self.peak = max(self.peak, result.pnl)
+            result.max_drawdown = max(result.max_drawdown, self.peak - result.pnl)
+
+
+class _SeriesProvider(DummyDataProvider):
+    """
+    Symulator, którego „losowy spacer” zastąpiono odtwarzaną serią cen.
+    Rozliczenia i generowanie sygnałów pochodzą wprost z DummyDataProvider.step().
+    """
+
+    def __init__(self, prices, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prices = iter(prices)
+
+    def generate_price(self) -> float:
+        self.price = next(self.prices)
+        return self.price
+
+
+def run_backtest(prices, window_size: int = 5, trade_duration_steps: int = None,
+                 base_amount: float = None, use_martingale: bool = None, payout: float = None,
+                 asset: str = None, start_time: float = None) -> BacktestResult:
+    """
+    Odtwarza serię cen tak szybko, jak pozwala CPU, na zegarze wirtualnym
+    (jeden tick = DATA_UPDATE_INTERVAL sekund czasu symulacji).
+    :param prices: Sekwencja cen (lista, tablica NumPy, ...).
+    :param start_time: Czas (epoka) pierwszej ceny; domyślnie bieżący.
+    :return: BacktestResult z P&L, win rate, obsunięciem i maksymalną stawką.
+    """
+    params = {
+        "window_size": window_size,
+        "trade_duration_steps": trade_duration_steps if trade_duration_steps is not None else config.TRADE_DURATION_STEPS,
+        "base_amount": base_amount if base_amount is not None else config.BASE_AMOUNT,
+        "use_martingale": use_martingale if use_martingale is not None else config.USE_MARTINGALE,
+    }
+    result = BacktestResult(params=params)
+    bus = _ResultBus(result, payout if payout is not None else config.PAYOUT)
+    clock = VirtualClock(start_time)
+    provider = _SeriesProvider(
+        prices,
+        asset or config.ASSET,
+        Strategy(window_size=window_size),
+        MoneyManager(base_amount=params["base_amount"], use_martingale=params["use_martingale"]),
+        bus=bus,
+        trade_duration_steps=params["trade_duration_steps"],
+        clock=clock,
+        # Własna historia cen – przebiegi backtestu nie mieszają się ze wspólnym series.store
+        series=AssetSeries(asset or config.ASSET)
+    )
+    started = time.perf_counter()
+    # Logi pojedynczych sygnałów są zbędne przy milionach ticków
+    previous_level = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        while True:
+            provider.step()
+            clock.advance(provider.update_interval)
+            result.ticks += 1
+    except StopIteration:
+        # Seria cen się skończyła
+        pass
+    finally:
+        logging.disable(previous_level)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def load_prices(path: str, asset: str = None) -> list[float]:
+    """
+    Wczytuje ceny z pliku: jedna cena w wierszu lub CSV z kolumną "close" / "price",
+    albo z katalogu archiwum ticków (tick_archive.py) – wtedy ceny aktywa asset.
+    """
+    if os.path.isdir(path):
+        _, prices = TickArchive(path).range(asset or config.ASSET)
+        return prices.tolist()
+    with open(path, "r", newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        try:
+            float(first.split(",")[0])
+            return [float(line.split(",")[0]) for line in f if line.strip()]
+        except ValueError:
+            reader = csv.DictReader(f)
+            column = "close" if "close" in reader.fieldnames else "price"
+            return [float(row[column]) for row in reader]
+
+
+_sweep_prices = None
+
+
+def _init_sweep_worker(prices) -> None:
+    # Seria cen trafia do procesu roboczego raz, a nie z każdym zadaniem
+    global _sweep_prices
+    _sweep_prices = prices
+
+
+def _run_sweep_task(params: dict) -> BacktestResult:
+    return run_backtest(_sweep_prices, **params)
+
+
+def sweep(prices, grid: list[dict], processes: int = None) -> list[BacktestResult]:
+    """
+    Uruchamia backtest dla każdego zestawu parametrów z grid w puli procesów.
+    :param grid: Lista słowników z argumentami run_backtest (np. {"window_size": 7}).
+    :param processes: Liczba procesów (None = liczba rdzeni).
+    """
+    prices = list(prices)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_sweep_worker,
+                             initargs=(prices,)) as executor:
+        return list(executor.map(_run_sweep_task, grid))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest strategii ekstremów na serii cen.")
+    parser.add_argument("prices", help="Plik z cenami (jedna w wierszu lub CSV z kolumną close/price) "
+                                       "lub katalog archiwum ticków")
+    parser.add_argument("--asset", default=config.ASSET, help="Aktywo odczytywane z archiwum ticków")
+    parser.add_argument("--window", type=int, nargs="+", default=[5], help="Rozmiary okna strategii")
+    parser.add_argument("--duration", type=int, nargs="+", default=[config.TRADE_DURATION_STEPS],
+                        help="Czas trwania transakcji w tickach")
+    parser.add_argument("--martingale", choices=["on", "off"], nargs="+", default=["on"])
+    parser.add_argument("--base-amount", type=float, default=config.BASE_AMOUNT)
+    parser.add_argument("--payout", type=float, default=config.PAYOUT)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    prices = load_prices(args.prices, args.asset)
+    grid = [
+        {"window_size": window, "trade_duration_steps": duration, "use_martingale": martingale == "on",
+         "base_amount": args.base_amount, "payout": args.payout}
+        for window, duration, martingale in itertools.product(args.window, args.duration, args.martingale)
+    ]
+    results = sweep(prices, grid, args.processes) if len(grid) > 1 else [run_backtest(prices, **grid[0])]
+    print(f"{'window':>6} {'dur':>4} {'mart':>5} {'trades':>7} {'win%':>6} {'pnl':>10} "
+          f"{'max_dd':>10} {'max_stake':>10} {'sec':>6}")
+    for result in sorted(results, key=lambda r: r.pnl, reverse=True):
+        p = result.params
+        win_rate = f"{result.win_rate:.1f}" if result.win_rate is not None else "-"
+        print(f"{p['window_size']:>6} {p['trade_duration_steps']:>4} {str(p['use_martingale']):>5} "
+              f"{result.trades:>7} {win_rate:>6} {result.pnl:>10.2f} {result.max_drawdown:>10.2f} "
+              f"{result.max_stake:>10.2f} {result.elapsed:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+# benchmark.py – Mikrobenchmarki gorących ścieżek z porównaniem do linii bazowej i progami regresji
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import threading
+from collections import deque
+
+# Benchmark nie może dotykać produkcyjnej historii sygnałów – ustawiamy to przed importem config
+os.environ["SIGNALS_DB"] = ":memory:"
+
+import signal_store
+from models import Signal, signals_lock
+from strategy import Strategy
+from money import MoneyManager
+from settlement import SettlementEngine
+
+DEFAULT_OUTPUT = "benchmarks/latest.json"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 1.30  # wynik wolniejszy niż baseline × próg oznacza regresję
+API_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def random_walk(count: int, seed: int = 1) -> list[float]:
+    """
+    Powtarzalna seria cen (losowy spacer jak w symulatorze).
+    """
+    rng = random.Random(seed)
+    price = 1.1
+    prices = []
+    for _ in range(count):
+        price = round(max(0.00001, price + rng.uniform(-0.0005, 0.0005)), 5)
+        prices.append(price)
+    return prices
+
+
+def make_signals(count: int, seed: int = 1) -> list[Signal]:
+    """
+    Sygnały z nadanymi id, po połowie rozliczone, na kilku aktywach.
+    """
+    rng = random.Random(seed)
+    assets = ("EURUSD", "GBPUSD", "USDJPY", "AUDUSD")
+    return [
+        Signal(ts=1_704_067_200.0 + i,
+               asset=assets[i % len(assets)],
+               direction="CALL" if rng.random() < 0.5 else "PUT",
+               amount=float(2 ** rng.randrange(4)),
+               entry_price=round(1.1 + rng.uniform(-0.01, 0.01), 5),
+               result=rng.choice(("WIN", "LOSS", None)),
+               id=i + 1)
+        for i in range(count)
+    ]
+
+
+class Case:
+    """
+    Jeden benchmark: setup() przygotowuje dane raz, run() wykonuje pomiar
+    i zwraca (sekundy na operację, dodatkowe metryki).
+    """
+
+    def __init__(self, name: str, run, setup=None, teardown=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+
+
+def strategy_cases(prices: list[float]) -> list[Case]:
+    def make(window_size):
+        def run():
+            strategy = Strategy(window_size=window_size)
+            check = strategy.check_signal
+            started = time.perf_counter()
+            for price in prices:
+                check(price)
+            return (time.perf_counter() - started) / len(prices), {}
+        return Case(f"strategy.check_signal/w{window_size}", run)
+    return [make(window_size) for window_size in (5, 20, 100)]
+
+
+def settlement_cases() -> list[Case]:
+    def add_settle(count):
+        def run():
+            rng = random.Random(count)
+            expiries = list(range(count))
+            rng.shuffle(expiries)
+            sample = make_signals(1)[0]
+            engine = SettlementEngine()
+            started = time.perf_counter()
+            for expiry in expiries:
+                engine.add(Signal(sample.ts, sample.asset, sample.direction, sample.amount,
+                                  sample.entry_price), expiry)
+            settled = engine.settle_due(count, 1.1)
+            elapsed = time.perf_counter() - started
+            assert len(settled) == count
+            return elapsed / count, {}
+        return Case(f"settlement.add_settle/n{count}", run)
+
+    def idle_tick(count):
+        # Koszt ticka, w którym nic nie wygasa, przy count oczekujących transakcjach
+        def run():
+            engine = SettlementEngine()
+            for signal in make_signals(count):
+                engine.add(signal, 1_000_000 + signal.id)
+            ticks = 100_000
+            started = time.perf_counter()
+            for tick in range(ticks):
+                engine.settle_due(tick, 1.1)
+            return (time.perf_counter() - started) / ticks, {}
+        return Case(f"settlement.idle_tick/n{count}", run)
+
+    return [add_settle(count) for count in (100, 10_000)] + [idle_tick(count) for count in (1, 10_000)]
+
+
+def money_cases() -> list[Case]:
+    def make(streak):
+        def run():
+            manager = MoneyManager(base_amount=1.0, use_martingale=True)
+            record = manager.record_result
+            rounds = 20_000
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for _ in range(streak):
+                    record("LOSS")
+                record("WIN")
+            return (time.perf_counter() - started) / (rounds * (streak + 1)), {}
+        return Case(f"money.record_result/streak{streak}", run)
+    return [make(streak) for streak in (1, 10)]
+
+
+class _Buffer:
+    """
+    Podmienia bufor signal_store na bufor o zadanym rozmiarze (przywracany po benchmarku).
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.saved = None
+
+    def setup(self):
+        self.saved = signal_store.signals
+        buffer = deque(make_signals(self.count), maxlen=self.count)
+        for sig in buffer:
+            sig.to_json()
+        with signals_lock:
+            signal_store.signals = buffer
+            signal_store.response_cache.clear()
+
+    def teardown(self):
+        with signals_lock:
+            signal_store.signals = self.saved
+            signal_store.response_cache.clear()
+
+
+def api_cases(sizes) -> list[Case]:
+    def make(count, label, query):
+        buffer = _Buffer(count)
+
+        def run():
+            requests = max(5, min(2_000, 2_000_000 // count))
+            started = time.perf_counter()
+            for _ in range(requests):
+                # Każdy zapis czyści pamięć podręczną – mierzymy odpowiedź budowaną od zera
+                signal_store.response_cache.clear()
+                _, body = signal_store.select_encoded(**query)
+            return (time.perf_counter() - started) / requests, {"bytes": len(body)}
+        return Case(f"api.signals/{label}/n{count}", run, buffer.setup, buffer.teardown)
+
+    cases = []
+    for count in sizes:
+        cases.append(make(count, "latest", {"limit": 20}))
+        cases.append(make(count, "filtered", {"limit": 100, "asset": "EURUSD", "result": "PENDING"}))
+        cases.append(make(count, "since_id", {"limit": 100, "since_id": count - 50}))
+    return cases
+
+
+def contention_cases() -> list[Case]:
+    def make(readers):
+        buffer = _Buffer(10_000)
+        fresh = make_signals(2_000, seed=2)
+
+        def run():
+            stop = threading.Event()
+            served = [0] * readers
+
+            def reader(index):
+                while not stop.is_set():
+                    signal_store.select_encoded(20, asset="EURUSD")
+                    served[index] += 1
+
+            threads = [threading.Thread(target=reader, args=(i,), daemon=True) for i in range(readers)]
+            for thread in threads:
+                thread.start()
+            latencies = []
+            started = time.perf_counter()
+            for offset, sig in enumerate(fresh):
+                sig.id = 10_000_000 + offset
+                sig.to_json()
+                t0 = time.perf_counter()
+                signal_store.buffer_signal(sig)
+                latencies.append(time.perf_counter() - t0)
+                time.sleep(0)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            for thread in threads:
+                thread.join()
+            latencies.sort()
+            return sum(latencies) / len(latencies), {
+                "writer_p99_us": round(1e6 * latencies[int(0.99 * (len(latencies) - 1))], 2),
+                "reader_rps": round(sum(served) / elapsed),
+            }
+        return Case(f"lock.signals_lock/readers{readers}", run, buffer.setup, buffer.teardown)
+    return [make(readers) for readers in (0, 2, 8)]
+
+
+def collect_cases(api_sizes) -> list[Case]:
+    return (strategy_cases(random_walk(100_000)) + settlement_cases() + money_cases()
+            + api_cases(api_sizes) + contention_cases())
+
+
+def run_cases(cases: list[Case], repeat: int) -> dict:
+    """
+    Wykonuje każdy benchmark repeat razy; wynikiem jest najlepszy (najmniej zaszumiony) pomiar.
+    """
+    results = {}
+    for case in cases:
+        if case.setup:
+            case.setup()
+        try:
+            runs = [case.run() for _ in range(repeat)]
+        finally:
+            if case.teardown:
+                case.teardown()
+        values = sorted(value for value, _ in runs)
+        best, extra = min(runs, key=lambda run: run[0])
+        results[case.name] = {"value": best, "median": values[len(values) // 2], "unit": "s/op", **extra}
+        print(f"  {case.name:<42} {format_duration(best):>12}", flush=True)
+    return results
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1e-6:
+        return f"{seconds * 1e9:.1f} ns"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} µs"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+def compare(results: dict, baseline: dict, default_threshold: float) -> list[str]:
+    """
+    Porównuje wyniki z linią bazową.
+    Progi per benchmark można ustawić w pliku baseline: {"thresholds": {"api.signals/latest/n1000": 1.5}}.
+    :return: Nazwy benchmarków, które przekroczyły próg.
+    """
+    thresholds = baseline.get("thresholds", {})
+    base_results = baseline.get("results", {})
+    regressions = []
+    print(f"\n{'benchmark':<42} {'baseline':>12} {'current':>12} {'ratio':>7}  status")
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<42} {'-':>12} {format_duration(result['value']):>12} {'-':>7}  new")
+            continue
+        ratio = result["value"] / base["value"] if base["value"] else float("inf")
+        threshold = thresholds.get(name, default_threshold)
+        status = "ok"
+        if ratio > threshold:
+            status = f"REGRESSION (> {threshold:.2f}x)"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            status = "faster"
+        print(f"{name:<42} {format_duration(base['value']):>12} {format_duration(result['value']):>12} "
+              f"{ratio:>6.2f}x  {status}")
+    return regressions
+
+
+def write_json(path: str, data: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki gorących ścieżek (strategia, rozliczenia, API).")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Plik z wynikami bieżącego przebiegu")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Plik linii bazowej do porównania")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Zapisz wyniki jako nową linię bazową (progi per benchmark są zachowane)")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="Brak linii bazowej to błąd (kod wyjścia 2) – dla CI")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Domyślny dopuszczalny stosunek current/baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="Liczba powtórzeń każdego benchmarku")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(API_SIZES),
+                        help="Rozmiary bufora sygnałów dla /api/signals")
+    parser.add_argument("--filter", nargs="+", default=None, help="Uruchom tylko benchmarki zawierające te frazy")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    cases = collect_cases(args.sizes)
+    if args.filter:
+        cases = [case for case in cases if any(phrase in case.name for phrase in args.filter)]
+    print(f"Uruchamiam {len(cases)} benchmarków (powtórzenia: {args.repeat})...")
+    results = run_cases(cases, args.repeat)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    write_json(args.output, report)
+    print(f"Wyniki zapisane w {args.output}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        merged = dict(baseline.get("results", {})) if baseline else {}
+        merged.update(results)
+        report = dict(report, results=merged, thresholds=baseline.get("thresholds", {}) if baseline else {})
+        write_json(args.baseline, report)
+        print(f"Linia bazowa zapisana w {args.baseline}")
+        return 0
+
+    if baseline is None:
+        # Linia bazowa zależy od maszyny i nie jest w repozytorium – bez niej nic nie zostało porównane
+        print(f"\nNIE PORÓWNANO: brak linii bazowej ({args.baseline}); wynik regresji nieznany. "
+              f"Uruchom z --save-baseline na tej maszynie, aby ją utworzyć.")
+        return 2 if args.require_baseline else 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegresje wydajności: {len(regressions)}")
+        return 1
+    print("\nBrak regresji.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
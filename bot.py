@@ -1,41 +1,121 @@
+import time
+import json
+import queue
+import threading
 import telebot
 from telebot import types
 import logging
-from threading import Lock
 import config
+import metrics
+from broadcast import Broadcaster
+from models import Direction
+from subscriber_store import SubscriberStore
 
-# Инициализация бота с токеном
-bot = telebot.TeleBot(config.TELEGRAM_BOT_TOKEN)
+# Свой сервер Bot API (локальный telegram-bot-api или fake_telegram.py для нагрузочных тестов)
+if config.TELEGRAM_API_URL:
+    telebot.apihelper.API_URL = config.TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
 
-# Множество подписчиков и соответствующая блокировка
-subscribers = set()
-subs_lock = Lock()
+# Инициализация бота с токеном. В режиме webhook обработчики вызывает наш ограниченный пул (UpdatePool),
+# поэтому собственный пул потоков telebot не нужен
+bot = telebot.TeleBot(config.TELEGRAM_BOT_TOKEN, threaded=config.TELEGRAM_MODE != "webhook")
 
-# Загрузка ранее сохранённых подписчиков из файла при запуске бота
-try:
-    with open("subscribers.txt", "r") as f:
-        for line in f:
-            line = line.strip()
-            if line.isdigit():
-                subscribers.add(int(line))
-    logging.info(f"Loaded {len(subscribers)} subscribers from file.")
-except FileNotFoundError:
-    logging.info("No subscribers.txt found – starting with an empty subscribers list.")
+# Подписчики хранятся в журнале config.SUBSCRIBERS_FILE (добавление/удаление за O(1))
+subscribers = SubscriberStore(config.SUBSCRIBERS_FILE, fsync=config.SUBSCRIBERS_FSYNC)
 
+# Число подписчиков считается только при чтении /metrics
+metrics.Gauge("signalbot_subscribers", "Число подписчиков рассылки.").set_function(lambda: len(subscribers))
+
+# Движок параллельной рассылки с учётом лимитов Telegram
+broadcaster = Broadcaster(
+    bot.send_message,
+    workers=config.BROADCAST_WORKERS,
+    global_rate=config.BROADCAST_GLOBAL_RATE,
+    per_chat_interval=config.BROADCAST_PER_CHAT_INTERVAL,
+    max_retries=config.BROADCAST_MAX_RETRIES
+)
+
+
+class UpdatePool:
+    """
+    Ограниченный пул потоков для обновлений, полученных через webhook.
+    Маршрут только кладёт обновление в очередь и сразу отвечает Telegram;
+    если очередь заполнена, submit() возвращает False – маршрут отвечает 503,
+    и Telegram повторит доставку позже.
+    """
+
+    def __init__(self, handler, workers: int = 4, maxsize: int = 256):
+        """
+        :param handler: Функция обработки списка обновлений (bot.process_new_updates).
+        :param workers: Число потоков-обработчиков.
+        :param maxsize: Максимальная длина очереди ожидающих обновлений.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.threads: list[threading.Thread] = []
+        self.lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self.threads:
+            return
+        with self.lock:
+            # Потоки создаются при первом обновлении – процессы без webhook их не держат
+            if not self.threads:
+                self.threads = [threading.Thread(target=self._run, name=f"WebhookWorker-{i}", daemon=True)
+                                for i in range(self.workers)]
+                for thread in self.threads:
+                    thread.start()
+
+    def submit(self, update) -> bool:
+        """
+        Ставит обновление в очередь. Возвращает False, если очередь заполнена.
+        """
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(update)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self) -> None:
+        while True:
+            update = self.queue.get()
+            try:
+                self.handler([update])
+            except Exception:
+                logging.exception("Error while handling Telegram update %s", getattr(update, "update_id", None))
+            finally:
+                self.queue.task_done()
+
+    def join(self) -> None:
+        """
+        Ждёт обработки всех поставленных обновлений (для проверок и корректной остановки).
+        """
+        self.queue.join()
+
+    def __len__(self) -> int:
+        return self.queue.qsize()
 
-# Функция сохранения текущего списка подписчиков в файл
-def save_subscribers():
-    try:
-        with open("subscribers.txt", "w") as f:
-            for user_id in subscribers:
-                f.write(f"{user_id}\n")
-    except Exception as e:
-        logging.error("Failed to save subscribers to file: %s", e)
+
+# Обновления из webhook (app_server: /telegram/webhook)
+updates = UpdatePool(bot.process_new_updates, workers=config.WEBHOOK_WORKERS, maxsize=config.WEBHOOK_QUEUE_SIZE)
+
+
+def set_webhook() -> bool:
+    """
+    Регистрирует webhook (config.WEBHOOK_URL) вместе с секретом – Telegram будет присылать его
+    в заголовке X-Telegram-Bot-Api-Secret-Token каждого запроса.
+    """
+    if not config.WEBHOOK_URL or not config.WEBHOOK_SECRET:
+        raise ValueError("TELEGRAM_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET")
+    return bot.set_webhook(url=config.WEBHOOK_URL, secret_token=config.WEBHOOK_SECRET,
+                           allowed_updates=["message"])
 
 
 def notify_signal(signal):
     """
-    Отправляет сообщение всем подписчикам о новом сигнале.
+    Отправляет сообщение подписчикам, чей фильтр подходит к активу и направлению сигнала.
+    Возвращает BroadcastReport с итогами рассылки.
     """
     message_text = (
         f"⚡ New Signal ⚡\n"
@@ -44,20 +124,24 @@ def notify_signal(signal):
         f"Time: {signal.time}\n"
         f"Amount: ${signal.amount:.2f}"
     )
-    # Рассылка сообщения всем подписчикам
-    with subs_lock:
-        user_ids = list(subscribers)
-    for user_id in user_ids:
+    # Получатели берутся из обратного индекса: O(подходящих подписчиков)
+    user_ids = subscribers.recipients(signal.asset, signal.direction)
+    report = broadcaster.broadcast(user_ids, message_text)
+    metrics.broadcast_seconds.observe(report.duration)
+    if signal.created is not None:
+        metrics.delivery_seconds.observe(time.monotonic() - signal.created)
+    metrics.telegram_messages_total.labels("sent").inc(report.sent)
+    metrics.telegram_messages_total.labels("blocked").inc(len(report.blocked))
+    metrics.telegram_messages_total.labels("failed").inc(report.failed - len(report.blocked))
+    metrics.telegram_retries_total.inc(report.retries)
+    # Пользователей, заблокировавших бота, удаляем одним пакетом
+    if report.blocked:
         try:
-            bot.send_message(user_id, message_text)
+            subscribers.discard_many(report.blocked)
+            logging.info("Removed %d blocked subscribers.", len(report.blocked))
         except Exception as e:
-            logging.error("Error sending signal to user %d: %s", user_id, e)
-            # Если бот заблокирован или не может отправить сообщение – удалить пользователя
-            if "bot was blocked" in str(e) or "Forbidden" in str(e):
-                with subs_lock:
-                    if user_id in subscribers:
-                        subscribers.discard(user_id)
-                        save_subscribers()  # сохранить обновление (удаление подписчика)
+            logging.error("Failed to save subscribers to file: %s", e)
+    return report
 
 
 @bot.message_handler(commands=['start'])
@@ -67,9 +151,10 @@ def handle_start(message):
     """
     chat_id = message.chat.id
     # Добавление пользователя в список подписчиков
-    with subs_lock:
-        subscribers.add(chat_id)
-    save_subscribers()  # сохранение нового подписчика в файл
+    try:
+        subscribers.add(chat_id)  # дописывается в журнал подписчиков
+    except Exception as e:
+        logging.error("Failed to save subscribers to file: %s", e)
 
     welcome_text = (
         "Welcome to the Scalping Signals Bot!\n"
@@ -96,9 +181,10 @@ def handle_stop(message):
     Обработчик команды /stop: отписывает пользователя от рассылки сигналов.
     """
     chat_id = message.chat.id
-    with subs_lock:
-        subscribers.discard(chat_id)
-    save_subscribers()  # сохранение изменения (удаление подписчика)
+    try:
+        subscribers.discard(chat_id)  # дописывается в журнал подписчиков
+    except Exception as e:
+        logging.error("Failed to save subscribers to file: %s", e)
     bot.reply_to(message, "You have been unsubscribed from signals. Send /start to subscribe again.")
     logging.info("User %d unsubscribed (stopped bot).", chat_id)
 
@@ -113,19 +199,116 @@ def handle_help(message):
         "Commands:\n"
         "/start – Subscribe and get the interface link\n"
         "/stop – Stop receiving signals\n"
+        "/assets EURUSD GBPUSD – Receive signals only for these assets (/assets all – every asset)\n"
+        "/direction CALL|PUT|all – Receive only one direction\n"
+        "/filters – Show your filters and open the filter settings\n"
         "/help – Show this help message\n\n"
         "Use the provided interface to view signals in real time."
     )
     bot.reply_to(message, help_text)
 
 
+def describe_filter(chat_id: int) -> str:
+    """
+    Текстовое описание фильтра подписки чата.
+    """
+    assets, direction = subscribers.get_filter(chat_id)
+    return (f"Assets: {', '.join(sorted(assets)) if assets else 'all'}\n"
+            f"Direction: {direction or 'all'}")
+
+
+def parse_direction(value):
+    """
+    "CALL" / "PUT" -> Direction, "all" / пусто -> None; иное – ValueError.
+    """
+    if value is None or str(value).lower() in ("", "all", "*"):
+        return None
+    return Direction(str(value).upper())
+
+
+def apply_filter(chat_id: int, assets=None, direction=None) -> str:
+    """
+    Сохраняет фильтр подписки чата и возвращает текст подтверждения.
+    """
+    try:
+        subscribers.set_filter(chat_id, assets, direction)
+    except Exception as e:
+        logging.error("Failed to save subscribers to file: %s", e)
+    logging.info("User %d changed filters: assets=%s, direction=%s", chat_id, assets, direction)
+    return "✅ Filters updated.\n" + describe_filter(chat_id)
+
+
+@bot.message_handler(commands=['assets'])
+def handle_assets(message):
+    """
+    Обработчик команды /assets: "/assets EURUSD GBPUSD" – только эти активы, "/assets all" – все.
+    Без аргументов показывает текущий фильтр.
+    """
+    chat_id = message.chat.id
+    args = message.text.replace(",", " ").split()[1:]
+    if not args:
+        bot.reply_to(message, describe_filter(chat_id))
+        return
+    assets = None if args[0].lower() in ("all", "*") else args
+    _, direction = subscribers.get_filter(chat_id)
+    bot.reply_to(message, apply_filter(chat_id, assets, direction))
+
+
+@bot.message_handler(commands=['direction'])
+def handle_direction(message):
+    """
+    Обработчик команды /direction: "/direction CALL", "/direction PUT" или "/direction all".
+    """
+    chat_id = message.chat.id
+    args = message.text.split()[1:]
+    if not args:
+        bot.reply_to(message, describe_filter(chat_id))
+        return
+    try:
+        direction = parse_direction(args[0])
+    except ValueError:
+        bot.reply_to(message, "Usage: /direction CALL|PUT|all")
+        return
+    assets, _ = subscribers.get_filter(chat_id)
+    bot.reply_to(message, apply_filter(chat_id, assets, direction))
+
+
+@bot.message_handler(commands=['filters'])
+def handle_filters(message):
+    """
+    Обработчик команды /filters: показывает фильтр и кнопку клавиатуры, открывающую Mini App.
+    Данные из Mini App (sendData) Telegram присылает только для приложений, открытых кнопкой клавиатуры.
+    """
+    chat_id = message.chat.id
+    text = describe_filter(chat_id)
+    if config.WEBAPP_URL:
+        keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
+        keyboard.add(types.KeyboardButton(text="⚙️ Signal filters", web_app=types.WebAppInfo(url=config.WEBAPP_URL)))
+        bot.send_message(chat_id, text, reply_markup=keyboard)
+    else:
+        bot.send_message(chat_id, text)
+
+
 @bot.message_handler(content_types=['web_app_data'])
 def handle_web_app_data(message):
     """
     Обработчик данных, присланных из веб-приложения (Telegram Web App).
+    Mini App присылает фильтр подписки: {"action": "filters", "assets": [...] | null, "direction": "CALL" | "PUT" | null}.
     """
     chat_id = message.chat.id
     data = message.web_app_data.data if message.web_app_data else None
     logging.info("Received WebApp data from user %d: %s", chat_id, data)
-    if data:
+    if not data:
+        return
+    try:
+        payload = json.loads(data)
+        if not isinstance(payload, dict) or payload.get("action") != "filters":
+            raise ValueError(data)
+        assets = payload.get("assets") or None
+        if assets is not None and (not isinstance(assets, list) or not all(isinstance(a, str) for a in assets)):
+            raise ValueError(data)
+        direction = parse_direction(payload.get("direction"))
+    except ValueError:
         bot.send_message(chat_id, f"✅ Received data from web app: {data}")
+        return
+    bot.send_message(chat_id, apply_filter(chat_id, assets, direction), reply_markup=types.ReplyKeyboardRemove())
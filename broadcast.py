@@ -0,0 +1,267 @@
+# broadcast.py – Параллельная рассылка сообщений с учётом лимитов Telegram
+
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot.apihelper import ApiTelegramException
+
+
+class TokenBucket:
+    """
+    Потокобезопасный «ведро токенов»: не более rate операций в секунду
+    с допустимым всплеском capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: Скорость пополнения (токенов в секунду).
+        :param capacity: Ёмкость ведра (по умолчанию = rate).
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Резервирует один токен и возвращает время ожидания (в секундах),
+        после которого его можно использовать.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self) -> None:
+        """
+        Блокирует вызывающий поток, пока не появится свободный токен.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает выдачу токенов (например, после ответа 429 от Telegram).
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+@dataclass
+class BroadcastReport:
+    """
+    Итог одной рассылки.
+    :param total: Количество получателей.
+    :param sent: Успешно доставлено.
+    :param failed: Не доставлено (включая заблокировавших бота).
+    :param retries: Количество повторов после ответа 429.
+    :param blocked: Чаты, заблокировавшие бота (для пакетного удаления).
+    :param duration: Длительность рассылки в секундах.
+    """
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    blocked: list[int] = field(default_factory=list)
+    duration: float = 0.0
+
+
+# Описания ошибок Telegram, после которых чат уже не получит сообщений – его подписку можно удалить.
+# Прочие 403 (например, нет прав писать в группу) – обычная ошибка доставки.
+GONE_CHAT_ERRORS = (
+    "bot was blocked by the user",
+    "bot was kicked from",
+    "user is deactivated",
+    "chat not found",
+    "group chat was deleted",
+)
+
+
+def is_blocked_error(error: Exception) -> bool:
+    """
+    Проверяет, означает ли ошибка, что чат для бота потерян навсегда
+    (бот заблокирован или исключён, аккаунт удалён, чат не найден).
+    """
+    if isinstance(error, ApiTelegramException):
+        if error.error_code not in (400, 403):
+            return False
+        description = str(error.description)
+    else:
+        description = str(error)
+    description = description.lower()
+    return any(text in description for text in GONE_CHAT_ERRORS)
+
+
+def retry_after_of(error: Exception) -> float | None:
+    """
+    Возвращает значение retry_after из ответа 429 или None для прочих ошибок.
+    """
+    if not isinstance(error, ApiTelegramException) or error.error_code != 429:
+        return None
+    parameters = error.result_json.get("parameters") or {}
+    return float(parameters.get("retry_after", 1))
+
+
+class Broadcaster:
+    """
+    Рассылает одно сообщение множеству чатов через пул потоков.
+    Соблюдает глобальный лимит (global_rate сообщений в секунду) и
+    лимит на чат (не чаще одного сообщения в per_chat_interval секунд).
+    """
+
+    def __init__(self, send_func, workers: int = 8, global_rate: float = 30.0,
+                 per_chat_interval: float = 1.0, max_retries: int = 3):
+        """
+        :param send_func: Функция отправки, например bot.send_message(chat_id, text).
+        :param workers: Размер пула потоков.
+        :param global_rate: Максимум сообщений в секунду для всего бота.
+        :param per_chat_interval: Минимальный интервал между сообщениями в один чат.
+        :param max_retries: Сколько раз повторять отправку после ответа 429.
+        """
+        self.send_func = send_func
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Broadcast")
+        # Время, раньше которого нельзя писать в конкретный чат
+        self.chat_next_send: dict[int, float] = {}
+        self.chat_lock = threading.Lock()
+
+    def _wait_for_chat(self, chat_id: int) -> None:
+        with self.chat_lock:
+            now = time.monotonic()
+            send_at = max(now, self.chat_next_send.get(chat_id, 0.0))
+            self.chat_next_send[chat_id] = send_at + self.per_chat_interval
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def _prune_chats(self) -> None:
+        """
+        Удаляет из chat_next_send прошедшие отметки – они ничего не ограничивают,
+        а словарь иначе растёт с каждым когда-либо получавшим сообщение чатом.
+        """
+        with self.chat_lock:
+            now = time.monotonic()
+            self.chat_next_send = {chat_id: send_at for chat_id, send_at in self.chat_next_send.items()
+                                   if send_at > now}
+
+    def _send_one(self, chat_id: int, text: str, kwargs: dict) -> tuple[int, str, int]:
+        """
+        Отправляет сообщение одному чату.
+        :return: (chat_id, статус "sent" / "blocked" / "failed", количество повторов).
+        """
+        retries = 0
+        while True:
+            self._wait_for_chat(chat_id)
+            self.global_bucket.acquire()
+            try:
+                self.send_func(chat_id, text, **kwargs)
+                return chat_id, "sent", retries
+            except Exception as e:
+                retry_after = retry_after_of(e)
+                if retry_after is not None and retries < self.max_retries:
+                    # Telegram просит подождать – притормаживаем всех отправителей
+                    retries += 1
+                    self.global_bucket.pause(retry_after)
+                    time.sleep(retry_after)
+                    continue
+                if is_blocked_error(e):
+                    return chat_id, "blocked", retries
+                logging.error("Error sending message to chat %d: %s", chat_id, e)
+                return chat_id, "failed", retries
+
+    def broadcast(self, chat_ids, text: str, **kwargs) -> BroadcastReport:
+        """
+        Рассылает текст всем chat_ids и дожидается завершения.
+        :return: BroadcastReport со статистикой и списком заблокировавших бота.
+        """
+        chat_ids = list(chat_ids)
+        report = BroadcastReport(total=len(chat_ids))
+        started = time.monotonic()
+        for chat_id, status, retries in self.executor.map(
+                lambda cid: self._send_one(cid, text, kwargs), chat_ids):
+            report.retries += retries
+            if status == "sent":
+                report.sent += 1
+            else:
+                report.failed += 1
+                if status == "blocked":
+                    report.blocked.append(chat_id)
+        report.duration = time.monotonic() - started
+        self._prune_chats()
+        logging.info("Broadcast finished: %d/%d sent in %.2fs (retries=%d, blocked=%d)",
+                     report.sent, report.total, report.duration, report.retries, len(report.blocked))
+        return report
+
+
+def self_check(chats: int = 200, seed_chat: int = 1000) -> None:
+    """
+    Проверка без сети: отправка через подставную функцию с ответами Telegram.
+    - «заблокировал бота», «исключён из группы», «аккаунт удалён», «чат не найден» – в report.blocked;
+    - прочие 403 (нет прав) – обычная ошибка доставки, подписка остаётся;
+    - 429 с retry_after – повтор после паузы всех отправителей, сообщение доставляется;
+    - интервал между сообщениями в один чат соблюдается, прошедшие отметки удаляются.
+    """
+    def error(code: int, description: str, **parameters) -> ApiTelegramException:
+        result = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            result["parameters"] = parameters
+        return ApiTelegramException("sendMessage", None, result)
+
+    gone = {
+        seed_chat: error(403, "Forbidden: bot was blocked by the user"),
+        seed_chat + 1: error(403, "Forbidden: bot was kicked from the supergroup chat"),
+        seed_chat + 2: error(403, "Forbidden: user is deactivated"),
+        seed_chat + 3: error(400, "Bad Request: chat not found"),
+    }
+    no_rights = seed_chat + 4
+    limited = {seed_chat + 5: 2, seed_chat + 6: 1}  # чат -> сколько раз ответить 429
+    lock = threading.Lock()
+    sent: dict[int, list[float]] = {}
+
+    def send(chat_id, text):
+        if chat_id in gone:
+            raise gone[chat_id]
+        if chat_id == no_rights:
+            raise error(403, "Forbidden: not enough rights to send text messages to the chat")
+        with lock:
+            if limited.get(chat_id):
+                limited[chat_id] -= 1
+                raise error(429, "Too Many Requests: retry after 0", retry_after=0.01)
+            sent.setdefault(chat_id, []).append(time.monotonic())
+
+    broadcaster = Broadcaster(send, workers=8, global_rate=10_000, per_chat_interval=0.05, max_retries=3)
+    chat_ids = list(range(seed_chat, seed_chat + chats))
+    report = broadcaster.broadcast(chat_ids, "check")
+    assert sorted(report.blocked) == sorted(gone), report.blocked
+    assert report.sent == chats - len(gone) - 1 and report.failed == len(gone) + 1, report
+    assert report.retries == 3 and not any(limited.values()), report.retries
+    report = broadcaster.broadcast(chat_ids[-10:], "check")
+    assert report.sent == 10, report
+    for chat_id in chat_ids[-10:]:
+        first, second = sent[chat_id]
+        assert second - first >= 0.05 * 0.99, (chat_id, second - first)
+    time.sleep(0.06)
+    broadcaster.broadcast([], "check")
+    assert not broadcaster.chat_next_send, len(broadcaster.chat_next_send)
+    broadcaster.executor.shutdown()
+    print(f"OK: {chats} чатов, удалено {len(gone)} потерянных, 1 ошибка доставки (403 без прав), "
+          f"3 повтора после 429, интервал на чат соблюдён.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка рассылки: 429, заблокированные чаты, лимит на чат.")
+    parser.add_argument("--chats", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    self_check(args.chats)
@@ -0,0 +1,319 @@
+# checkpoint.py – Punkty kontrolne stanu silnika: okna strategii, krok Martingale, oczekujące transakcje i serie cen
+#   python checkpoint.py              # sprawdzenie offline: przebieg z restartem = przebieg bez restartu
+
+import os
+import time
+import zlib
+import pickle
+import struct
+import logging
+import argparse
+import tempfile
+
+import config
+import metrics
+import event_bus
+import clock as clock_module
+from event_bus import TOPIC_CHECKPOINT, COALESCE
+
+# Nagłówek pliku: magia, wersja formatu, CRC32 i długość skompresowanych danych
+MAGIC = b"SBCK"
+VERSION = 1
+HEADER = struct.Struct("<4sHII")
+
+checkpoint_write_seconds = metrics.Histogram("signalbot_checkpoint_write_seconds",
+                                             "Czas serializacji i atomowego zapisu punktu kontrolnego.")
+checkpoint_bytes = metrics.Gauge("signalbot_checkpoint_bytes", "Rozmiar ostatniego punktu kontrolnego na dysku.")
+checkpoint_age_seconds = metrics.Gauge("signalbot_checkpoint_age_seconds",
+                                       "Wiek stanu zapisanego w ostatnim punkcie kontrolnym.")
+
+
+def stream_keys(names: list[str]) -> list[str]:
+    """
+    Klucze strumieni w punkcie kontrolnym: nazwa strumienia, a przy powtórzeniach nazwa z sufiksem "#n".
+    """
+    seen: dict[str, int] = {}
+    keys = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        keys.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+    return keys
+
+
+def capture(streams: dict, at: float) -> dict:
+    """
+    Migawka stanu strumieni – wywoływana w wątku ticka, między tickami, więc nie potrzebuje blokad.
+    Wynik nie dzieli pamięci z dostawcami: serializacja i zapis mogą trwać w innym wątku.
+    :param streams: {klucz strumienia: DataProvider}.
+    :param at: Czas migawki (epoka).
+    :return: {"time", "streams": {klucz: stan dostawcy}, "series": {klucz właściciela: stan serii}}.
+    """
+    state = {"time": at, "streams": {}, "series": {}}
+    owners: dict[int, str] = {}
+    for key, provider in streams.items():
+        stream_state = provider.checkpoint()
+        # Strumienie tego samego aktywa mogą dzielić serię – zapisujemy ją raz, pod kluczem pierwszego z nich
+        owner = owners.setdefault(id(provider.series), key)
+        if owner == key:
+            state["series"][key] = provider.series.checkpoint()
+        stream_state["series"] = owner
+        state["streams"][key] = stream_state
+    return state
+
+
+def merge(parts: list[dict]) -> dict:
+    """
+    Łączy migawki z procesów roboczych silnika w jeden punkt kontrolny.
+    """
+    # Najstarsza część wyznacza czas migawki – sygnały późniejsze od niej mogą nie mieć stanu
+    state = {"time": min(part["time"] for part in parts), "streams": {}, "series": {}}
+    for part in parts:
+        state["streams"].update(part["streams"])
+        state["series"].update(part["series"])
+    return state
+
+
+def select(state: dict, keys: list[str]) -> dict:
+    """
+    Część punktu kontrolnego dla podanych strumieni (np. dla jednego procesu roboczego).
+    """
+    streams = {key: state["streams"][key] for key in keys if key in state["streams"]}
+    owners = {stream_state["series"] for stream_state in streams.values()}
+    return {"time": state["time"], "streams": streams,
+            "series": {key: series for key, series in state["series"].items() if key in owners}}
+
+
+def restore(streams: dict, state: dict) -> list[str]:
+    """
+    Odtwarza stan strumieni przed ich uruchomieniem. Strumień, którego stan nie pasuje
+    (inna strategia, okno, pojemność serii), startuje od zera – reszta i tak jest odtwarzana.
+    :return: Klucze odtworzonych strumieni.
+    """
+    restored = []
+    done: set[int] = set()
+    for key, provider in streams.items():
+        stream_state = state["streams"].get(key)
+        if stream_state is None:
+            continue
+        try:
+            series_state = state["series"].get(stream_state["series"])
+            if series_state is not None and id(provider.series) not in done:
+                provider.series.restore(series_state)
+                done.add(id(provider.series))
+            provider.restore(stream_state)
+        except (ValueError, KeyError) as e:
+            logging.warning("Pominięto punkt kontrolny strumienia %s: %s", key, e)
+            continue
+        restored.append(key)
+    return restored
+
+
+def resolve_pending(state: dict, history) -> int:
+    """
+    Uzgadnia oczekujące transakcje punktu kontrolnego z historią sygnałów (przed restore()).
+    - Sygnał bez id (migawka wyprzedziła zapis do historii) dostaje id pasującego wiersza.
+    - Sygnał rozliczony już po migawce dostaje wynik z historii – restore() nie rozliczy go drugi raz.
+    - Sygnał, którego w historii nie ma (przerwa przed zapisem), jest w niej zapisywany teraz.
+    :param history: signal_store.SignalHistory.
+    :return: Liczba oczekujących transakcji.
+    """
+    count = 0
+    taken: set[int] = set()
+    for stream_state in state["streams"].values():
+        for _, signal in stream_state["pending"]:
+            count += 1
+            match = None
+            for row in history.query(signal.asset, signal.time, signal.time):
+                if row.id in taken:
+                    continue
+                if signal.id is not None and row.id == signal.id or signal.id is None and (
+                        row.direction == signal.direction and row.ts == signal.ts
+                        and row.entry_price == signal.entry_price):
+                    match = row
+                    break
+            if match is None:
+                history.insert(signal)
+                logging.warning("Sygnał %s %s z punktu kontrolnego nie był zapisany – zapisano go z id %d.",
+                                signal.asset, signal.direction, signal.id)
+            else:
+                signal.id = match.id
+                signal.result = match.result
+            taken.add(signal.id)
+    # Sygnały otwarte po ostatniej migawce nie mają stanu do odtworzenia – nikt ich nie rozliczy
+    orphans = [sig for sig in history.unsettled() if sig.id not in taken and sig.ts > state["time"]]
+    if orphans:
+        logging.warning("%d sygnał(ów) otwartych po ostatnim punkcie kontrolnym pozostanie bez rozliczenia: %s",
+                        len(orphans), ", ".join(str(sig.id) for sig in orphans))
+    return count
+
+
+class Checkpointer:
+    """
+    Okresowe punkty kontrolne stanu silnika.
+    Wątek ticka robi tylko migawkę (kopie okien, pierścieni i sygnałów) i publikuje ją na szynie;
+    serializację, kompresję i atomowy zapis wykonuje konsument szyny z polityką COALESCE – jeśli zapis
+    nie nadąża, starsza niezapisana migawka jest zastępowana nowszą, a tick nigdy nie czeka na dysk.
+    """
+
+    def __init__(self, path: str = None, interval: float = None, bus=None, clock=None):
+        """
+        :param path: Plik punktu kontrolnego (domyślnie config.CHECKPOINT_FILE).
+        :param interval: Minimalny odstęp między migawkami w sekundach zegara (domyślnie config.CHECKPOINT_INTERVAL).
+        :param bus: Szyna zdarzeń (domyślnie globalna).
+        :param clock: Zegar (domyślnie globalny clock.clock).
+        """
+        self.path = path if path is not None else config.CHECKPOINT_FILE
+        self.interval = interval if interval is not None else config.CHECKPOINT_INTERVAL
+        self.bus = bus if bus is not None else event_bus.bus
+        self.clock = clock if clock is not None else clock_module.clock
+        self.last_capture = None
+        self.written_at = None  # czas zegara ostatniej zapisanej migawki
+        checkpoint_age_seconds.set_function(
+            lambda: self.clock.now() - self.written_at if self.written_at is not None else 0)
+
+    def subscribe(self):
+        """
+        Rejestruje konsumenta zapisującego migawki (kolejka na jedną, scalaną migawkę).
+        """
+        return self.bus.subscribe("checkpoint", {TOPIC_CHECKPOINT: self.write}, maxsize=1, policy=COALESCE)
+
+    def due(self) -> bool:
+        """
+        Czy minął odstęp od ostatniej migawki (pierwsze wywołanie – zawsze).
+        """
+        now = self.clock.now()
+        if self.last_capture is not None and now - self.last_capture < self.interval:
+            return False
+        self.last_capture = now
+        return True
+
+    def maybe_capture(self, streams: dict) -> None:
+        """
+        Robi migawkę strumieni i przekazuje ją do zapisu, jeśli nadszedł czas (wątek ticka).
+        """
+        if self.due():
+            self.publish(capture(streams, self.clock.now()))
+
+    def publish(self, state: dict) -> None:
+        self.bus.publish(TOPIC_CHECKPOINT, state)
+
+    def write(self, state: dict) -> int:
+        """
+        Zapisuje migawkę atomowo: plik tymczasowy w tym samym katalogu, fsync, os.replace i fsync katalogu.
+        Po awarii na dysku jest albo poprzedni, albo nowy punkt kontrolny – nigdy połowa.
+        :return: Rozmiar pliku w bajtach.
+        """
+        with checkpoint_write_seconds.time():
+            payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            data = HEADER.pack(MAGIC, VERSION, zlib.crc32(payload), len(payload)) + payload
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            if hasattr(os, "O_DIRECTORY"):
+                dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+        self.written_at = state["time"]
+        checkpoint_bytes.set(len(data))
+        return len(data)
+
+    def load(self) -> dict | None:
+        """
+        Wczytuje ostatni punkt kontrolny.
+        :return: Stan zapisany przez write() albo None (brak pliku, inna wersja formatu lub uszkodzony plik).
+        """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            magic, version, crc, length = HEADER.unpack_from(data)
+            payload = data[HEADER.size:]
+            if magic != MAGIC or version != VERSION or length != len(payload) or zlib.crc32(payload) != crc:
+                raise ValueError("nieprawidłowy nagłówek lub suma kontrolna")
+            state = pickle.loads(zlib.decompress(payload))
+        except Exception as e:
+            logging.warning("Pominięto punkt kontrolny %s: %s", self.path, e)
+            return None
+        self.written_at = state["time"]
+        return state
+
+
+def self_check(steps: int = 3000, restart_every: int = 271, seed: int = 7) -> None:
+    """
+    Sprawdzenie offline na zegarze wirtualnym: symulator restartowany co restart_every ticków
+    (zapis punktu kontrolnego, nowe obiekty, odtworzenie) musi wygenerować dokładnie te same sygnały,
+    kwoty i wyniki co przebieg bez restartów.
+    """
+    from data_provider import DummyDataProvider
+    from strategy import Strategy, RSIStrategy
+    from money import MoneyManager
+    from series import AssetSeries
+
+    class _Bus:
+        def __init__(self):
+            self.events = []
+
+        def publish(self, topic, payload):
+            if topic != TOPIC_CHECKPOINT:
+                self.events.append((topic, payload.asset, str(payload.direction), payload.amount,
+                                    payload.entry_price, str(payload.result)))
+
+    def build(bus, virtual_clock):
+        streams = {}
+        for i, name in enumerate(("extremum", "rsi")):
+            series = AssetSeries("CHECK", timeframes=(60,), capacity=50, tick_capacity=200)
+            strategy = Strategy(5) if name == "extremum" else RSIStrategy(series, period=14, oversold=40,
+                                                                          overbought=60)
+            streams[name] = DummyDataProvider("CHECK", strategy, MoneyManager(1.0), bus=bus, clock=virtual_clock,
+                                              seed=seed + i, trade_duration_steps=5, series=series)
+        return streams
+
+    def run(restarts: bool) -> list:
+        bus = _Bus()
+        virtual_clock = clock_module.VirtualClock(1_700_000_000)
+        streams = build(bus, virtual_clock)
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(os.path.join(directory, "engine.ckpt"), interval=0,
+                                        bus=bus, clock=virtual_clock)
+            for i in range(1, steps + 1):
+                for provider in streams.values():
+                    provider.step()
+                virtual_clock.sleep(1)
+                if restarts and i % restart_every == 0:
+                    checkpointer.write(capture(streams, virtual_clock.now()))
+                    streams = build(bus, virtual_clock)
+                    assert restore(streams, checkpointer.load()) == list(streams)
+        return bus.events
+
+    started = time.perf_counter()
+    expected = run(False)
+    actual = run(True)
+    assert actual == expected, "przebieg z restartami różni się od przebiegu bez restartów"
+    print(f"OK: {len(actual)} zdarzeń identycznych przy {steps // restart_every} restartach "
+          f"({time.perf_counter() - started:.2f}s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sprawdzenie punktów kontrolnych silnika.")
+    parser.add_argument("--steps", type=int, default=3000)
+    parser.add_argument("--restart-every", type=int, default=271)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    self_check(args.steps, args.restart_every, args.seed)
@@ -0,0 +1,106 @@
+# clock.py – Wymienny zegar: rzeczywisty, wirtualny lub przyspieszony (symulacje i testy obciążeniowe)
+
+import time
+import threading
+from datetime import datetime
+
+import config
+
+
+class Clock:
+    """
+    Interfejs zegara używanego przez dostawców danych i silnik.
+    now() zwraca czas epoki w sekundach, sleep() czeka według tego zegara.
+    """
+
+    def now(self) -> float:
+        raise NotImplementedError
+
+    def sleep(self, seconds: float) -> None:
+        raise NotImplementedError
+
+    def strftime(self, fmt: str = "%Y-%m-%d %H:%M:%S") -> str:
+        """
+        Formatuje bieżący czas zegara (czas lokalny).
+        """
+        return datetime.fromtimestamp(self.now()).strftime(fmt)
+
+
+class RealClock(Clock):
+    """
+    Zegar ścienny – zachowanie produkcyjne.
+    """
+
+    def now(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Zegar wirtualny: sleep() natychmiast przesuwa czas, więc symulacja biegnie tak szybko,
+    jak pozwala CPU. Przeznaczony dla jednego wątku sterującego (harmonogramu/dostawcy).
+    """
+
+    def __init__(self, start: float = None):
+        """
+        :param start: Czas początkowy (epoka); domyślnie bieżący czas rzeczywisty.
+        """
+        self.current = start if start is not None else time.time()
+        self.lock = threading.Lock()
+
+    def now(self) -> float:
+        return self.current
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self.lock:
+                self.current += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+
+class AcceleratedClock(Clock):
+    """
+    Zegar przyspieszony factor razy: jedna sekunda rzeczywista to factor sekund symulacji.
+    """
+
+    def __init__(self, factor: float, start: float = None):
+        """
+        :param factor: Współczynnik przyspieszenia (np. 1000).
+        :param start: Czas początkowy (epoka); domyślnie bieżący czas rzeczywisty.
+        """
+        if factor <= 0:
+            raise ValueError("Współczynnik przyspieszenia musi być dodatni.")
+        self.factor = factor
+        self.start = start if start is not None else time.time()
+        self.origin = time.monotonic()
+
+    def now(self) -> float:
+        return self.start + (time.monotonic() - self.origin) * self.factor
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds / self.factor)
+
+
+def make_clock(mode: str = "real", speed: float = 1.0, start: float = None) -> Clock:
+    """
+    Tworzy zegar wg trybu: "real", "virtual" lub "accelerated" (ze współczynnikiem speed).
+    """
+    mode = mode.lower()
+    if mode == "real":
+        return RealClock()
+    if mode == "virtual":
+        return VirtualClock(start)
+    if mode == "accelerated":
+        return AcceleratedClock(speed, start)
+    raise ValueError(f"Nieznany tryb zegara: {mode}")
+
+
+# Globalny zegar aplikacji (CLOCK_MODE / CLOCK_SPEED w config.py)
+clock = make_clock(config.CLOCK_MODE, config.CLOCK_SPEED)
@@ -9,26 +9,123 @@ load_dotenv()
 # Token bota Telegram uzyskany od BotFather
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "WSTAW_TUTAJ_SWÓJ_TOKEN")
 
+# Adres serwera Bot API (puste = oficjalny api.telegram.org), np. lokalny telegram-bot-api
+# albo fake_telegram.py do testów obciążeniowych: "http://127.0.0.1:8081"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
 # URL do interfejsu strony web (Telegram Web App), np. "https://yourdomain.com"
 WEBAPP_URL = os.getenv("WEBAPP_URL", "")
 
+# Odbiór aktualizacji Telegram: "polling" (infinity_polling w osobnym wątku) lub "webhook" (trasa /telegram/webhook)
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling")
+# Publiczny adres trasy webhooka rejestrowany przy starcie, np. https://example.com/telegram/webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Sekret porównywany z nagłówkiem X-Telegram-Bot-Api-Secret-Token (1–256 znaków: A-Z, a-z, 0-9, _ i -)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Pula obsługi aktualizacji webhooka: liczba wątków i długość kolejki (pełna kolejka = 503, Telegram ponowi)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 256))
+
 # FLAGA: czy używać prawdziwych danych z PocketOption, czy symulacji
 USE_REAL_DATA = os.getenv("USE_REAL_DATA", "False").lower() in ("1", "true", "yes")
 
 # Jeśli USE_REAL_DATA == True: dane API PocketOption
 POCKETOPTION_SSID = os.getenv("POCKETOPTION_SSID", "")
 USE_DEMO_BALANCE = os.getenv("USE_DEMO_BALANCE", "True").lower() in ("1", "true", "yes")
+# Atrapa PocketOption (fake_pocketoption.py) zamiast prawdziwego API – testy bez sieci
+POCKETOPTION_FAKE = os.getenv("POCKETOPTION_FAKE", "False").lower() in ("1", "true", "yes")
+# Okres świecy przekazywany do start_candles_stream / get_candles (w sekundach)
+CANDLE_PERIOD = int(os.getenv("CANDLE_PERIOD", 2))
+# Ponowne łączenie: wykładnicze opóźnienie z losowym rozrzutem (base × 2^próba, maks. max)
+RECONNECT_BASE_DELAY = float(os.getenv("RECONNECT_BASE_DELAY", 1.0))
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", 60.0))
+# Maksymalna liczba świec dociąganych po ponownym połączeniu (uzupełnianie luki)
+BACKFILL_MAX_CANDLES = int(os.getenv("BACKFILL_MAX_CANDLES", 1000))
 
 # Parametry handlu
 ASSET = os.getenv("ASSET", "EURUSD")         # Para walutowa
 BASE_AMOUNT = float(os.getenv("BASE_AMOUNT", 1.0))  # Bazowa kwota w dolarach
 USE_MARTINGALE = os.getenv("USE_MARTINGALE", "True").lower() in ("1", "true", "yes")
 
+# Zegar: "real" (rzeczywisty), "virtual" (symulacja z maksymalną prędkością) lub "accelerated"
+CLOCK_MODE = os.getenv("CLOCK_MODE", "real")
+CLOCK_SPEED = float(os.getenv("CLOCK_SPEED", 1.0))  # przyspieszenie dla trybu "accelerated"
+
+# Tryb wielu aktywów: plik JSON z listą strumieni (np. assets.example.json); pusty = tylko ASSET
+ASSETS_FILE = os.getenv("ASSETS_FILE", "")
+# Liczba procesów roboczych silnika wielu aktywów (1 = wszystko w jednym wątku)
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", 1))
+
 # Ustawienia symulacji (gdy USE_REAL_DATA=False)
 DUMMY_INITIAL_PRICE = float(os.getenv("DUMMY_INITIAL_PRICE", 1.10000))
 DUMMY_VOLATILITY = float(os.getenv("DUMMY_VOLATILITY", 0.0005))
 DATA_UPDATE_INTERVAL = int(os.getenv("DATA_UPDATE_INTERVAL", 5))      # w sekundach
+SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None  # ziarno RNG symulatora (None = losowe)
 TRADE_DURATION_STEPS = int(os.getenv("TRADE_DURATION_STEPS", 12))     # liczba „ticków” (np. 12 ticków × 5s = 60s)
+# Czas trwania transakcji w trybie realnych danych (w sekundach)
+TRADE_DURATION_SECONDS = float(os.getenv("TRADE_DURATION_SECONDS", TRADE_DURATION_STEPS * DATA_UPDATE_INTERVAL))
+# Historia cen aktywów (series.py): interwały świec w sekundach, liczba świec i ticków w pamięci
+SERIES_TIMEFRAMES = tuple(int(s) for s in os.getenv("SERIES_TIMEFRAMES", "60,300,900").split(","))
+SERIES_CAPACITY = int(os.getenv("SERIES_CAPACITY", 1000))
+SERIES_TICK_CAPACITY = int(os.getenv("SERIES_TICK_CAPACITY", 10000))
+# Maksymalna liczba jednocześnie oczekujących transakcji na aktywo (1 = nowy sygnał dopiero po rozliczeniu)
+MAX_PENDING_PER_ASSET = int(os.getenv("MAX_PENDING_PER_ASSET", 1))
+# Punkty kontrolne stanu silnika (okna strategii, krok Martingale, oczekujące transakcje, serie cen):
+# plik (pusty = wyłączone) i minimalny odstęp między migawkami w sekundach (domyślnie co tick)
+CHECKPOINT_FILE = os.getenv("CHECKPOINT_FILE", "db/engine.ckpt")
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", DATA_UPDATE_INTERVAL))
+# Archiwum ticków (tick_archive.py): katalog nagrywania (pusty = wyłączone), rekordy w segmencie
+# (16 bajtów każdy) i co ile sekund opróżniać bufory zapisu
+TICK_ARCHIVE_DIR = os.getenv("TICK_ARCHIVE_DIR", "")
+TICK_SEGMENT_RECORDS = int(os.getenv("TICK_SEGMENT_RECORDS", 1 << 20))
+TICK_FLUSH_INTERVAL = float(os.getenv("TICK_FLUSH_INTERVAL", 1.0))
+# Odtwarzanie archiwum zamiast danych na żywo: katalog archiwum (pusty = wyłączone), zakres czasu (epoka)
+# i tempo (sekundy archiwum na sekundę zegara; maksymalna prędkość – CLOCK_MODE=virtual)
+REPLAY_DIR = os.getenv("REPLAY_DIR", "")
+REPLAY_START = float(os.getenv("REPLAY_START")) if os.getenv("REPLAY_START") else None
+REPLAY_END = float(os.getenv("REPLAY_END")) if os.getenv("REPLAY_END") else None
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", 1.0))
+PAYOUT = float(os.getenv("PAYOUT", 0.8))                              # wypłata za wygraną (ułamek stawki) – do backtestów
 
 # Plik, w którym zapisywani są subskrybenci (identyfikatory użytkowników Telegram)
 SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE", "subscribers.txt")
+# Czy wykonywać fsync po każdej zmianie listy subskrybentów (wolniej, ale odporne na awarię zasilania)
+SUBSCRIBERS_FSYNC = os.getenv("SUBSCRIBERS_FSYNC", "False").lower() in ("1", "true", "yes")
+
+# Rozsyłanie sygnałów: liczba wątków i limity Telegram (globalny i na czat)
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", 8))
+BROADCAST_GLOBAL_RATE = float(os.getenv("BROADCAST_GLOBAL_RATE", 30))              # wiadomości na sekundę
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv("BROADCAST_PER_CHAT_INTERVAL", 1.0))  # w sekundach
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", 3))                  # ponowienia po błędzie 429
+
+# Maksymalna długość kolejki każdego konsumenta szyny zdarzeń
+BUS_QUEUE_SIZE = int(os.getenv("BUS_QUEUE_SIZE", 1000))
+# Próg alarmowy kolejki magazynu sygnałów (SQLite). Kolejka nie blokuje pętli ticków i nie gubi zdarzeń –
+# ponad progiem rośnie dalej, a nadmiar widać w statystyce overflowed i w signalbot_bus_overflowed_events_total
+SIGNAL_STORE_QUEUE_SIZE = int(os.getenv("SIGNAL_STORE_QUEUE_SIZE", 10000))
+
+# Liczba ostatnich sygnałów trzymanych w pamięci; starsze są tylko w historii SQLite
+SIGNALS_BUFFER_SIZE = int(os.getenv("SIGNALS_BUFFER_SIZE", 1000))
+# Plik bazy SQLite z historią sygnałów
+SIGNALS_DB = os.getenv("SIGNALS_DB", "db/signals.db")
+
+# Serwer WWW: "builtin" (Flask w procesie silnika) lub "none" (tylko silnik i bot; Mini App i API
+# serwują osobno workery gunicorna gevent: gunicorn wsgi:app, ustawienia w gunicorn.conf.py)
+WEB_SERVER = os.getenv("WEB_SERVER", "builtin")
+# Przy WEB_SERVER=none proces silnika wystawia metryki pod http://METRICS_HOST:METRICS_PORT/metrics (0 = wyłączone)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+# Co ile sekund workery WWW odczytują nowe i rozliczone sygnały z historii SQLite
+FEED_POLL_INTERVAL = float(os.getenv("FEED_POLL_INTERVAL", 0.5))
+
+# Strumień zdarzeń (Server-Sent Events) dla Mini App
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))      # co ile sekund wysyłać heartbeat
+SSE_BACKLOG = int(os.getenv("SSE_BACKLOG", 500))           # liczba zdarzeń do wznowienia po Last-Event-ID
+SSE_CLIENT_QUEUE = int(os.getenv("SSE_CLIENT_QUEUE", 100)) # kolejka jednego klienta
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", 1000))  # maksymalna liczba połączeń
+# Limit połączeń SSE na worker gunicorna gevent (połączenie to greenlet): poniżej worker_connections,
+# reszta zostaje dla /api/signals i /api/stats; gunicorn.conf.py wylicza go z worker_connections
+SSE_WORKER_CLIENTS = int(os.getenv("SSE_WORKER_CLIENTS", 900))
+# Limit dla workerów wątkowych (sync/gthread): każde połączenie zajmuje wątek na cały czas trwania,
+# więc musi być mniejszy niż --threads – to tryb awaryjny, wsgi.py ostrzega o nim przy starcie
+SSE_THREAD_CLIENTS = int(os.getenv("SSE_THREAD_CLIENTS", 4))
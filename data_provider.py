@@ -3,30 +3,80 @@
 import time
 import logging
 import random
-from datetime import datetime
 
-from models import Signal, signals, signals_lock
-from bot import notify_signal
+from models import Signal
+import event_bus
+import metrics
+import series as series_module
+import clock as clock_module
+from event_bus import TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED
 import config
 from strategy import Strategy
 from money import MoneyManager
+from settlement import SettlementEngine
 
 class DataProvider:
     """
     Bazowa klasa dostawcy danych. Implementuje wspólne elementy
     dla różnych typów dostawców (symulacja vs. PocketOption).
     """
-    def __init__(self, asset: str, strategy: Strategy, money_manager: MoneyManager, update_interval: float):
+    def __init__(self, asset: str, strategy: Strategy, money_manager: MoneyManager, update_interval: float,
+                 bus=None, clock=None, series=None):
         """
         :param asset: Symbol aktywa (np. "EURUSD").
         :param strategy: Instancja strategii do wykrywania sygnałów.
         :param money_manager: Manager kwot (np. Martingale).
         :param update_interval: Interwał (w sekundach) pomiędzy kolejnymi odczytami ceny.
+        :param bus: Szyna zdarzeń dla nowych i rozliczonych sygnałów (domyślnie globalna event_bus.bus).
+        :param clock: Zegar (czas sygnałów, rozliczeń i pauz); domyślnie globalny clock.clock.
+        :param series: Historia cen aktywa (ticki i świece); domyślnie wspólna series.store.get(asset).
         """
         self.asset = asset
         self.strategy = strategy
         self.money_manager = money_manager
         self.update_interval = update_interval
+        self.bus = bus if bus is not None else event_bus.bus
+        self.clock = clock if clock is not None else clock_module.clock
+        self.series = series if series is not None else series_module.store.get(asset)
+        # Oczekujące transakcje uporządkowane według wygaśnięcia (tick lub znacznik czasu)
+        self.settlement = SettlementEngine()
+        self.max_pending = config.MAX_PENDING_PER_ASSET
+        self.tick_metric = metrics.tick_seconds.labels(asset)
+        self.error_metric = metrics.provider_errors_total.labels(asset)
+        # Punkty kontrolne stanu (checkpoint.Checkpointer); None = wyłączone
+        self.checkpointer = None
+        # Nagrywanie ticków do archiwum (tick_archive.TickRecorder); None = wyłączone
+        self.recorder = None
+
+    def start(self) -> bool:
+        """
+        Przygotowuje dostawcę do pracy (np. połączenie z API). Zwraca False, jeśli się nie udało.
+        """
+        return True
+
+    def step(self) -> Signal | None:
+        """
+        Wykonuje jeden tick: odczyt ceny, rozliczenia i sprawdzenie strategii.
+        Nie czeka na kolejny tick – o tempie decyduje run() lub zewnętrzny harmonogram.
+        :return: Nowy sygnał albo None.
+        """
+        raise NotImplementedError("Metoda step() musi być zaimplementowana w podklasie.")
+
+    # Czy nieudany start() można ponawiać (schedule_recovery / try_recover łączą się ponownie)
+    reconnects = False
+
+    def schedule_recovery(self) -> None:
+        """
+        Wywoływane po błędzie ticka przez harmonogram wielu strumieni. Dostawca bez połączenia
+        (symulator, odtworzenie archiwum) nie ma czego odnawiać – kolejny tick po prostu próbuje ponownie.
+        """
+
+    def try_recover(self) -> bool:
+        """
+        Nieblokująca próba powrotu do pracy po schedule_recovery().
+        :return: True, jeśli dostawca może wykonać tick.
+        """
+        return True
 
     def run(self):
         """
@@ -34,6 +84,95 @@ class DataProvider:
         """
         raise NotImplementedError("Metoda run() musi być zaimplementowana w podklasie.")
 
+    def timed_step(self) -> Signal | None:
+        """
+        step() z pomiarem czasu ticka (metryka signalbot_tick_seconds).
+        """
+        started = time.perf_counter()
+        try:
+            return self.step()
+        finally:
+            self.tick_metric.observe(time.perf_counter() - started)
+            if self.checkpointer is not None:
+                # Migawka stanu między tickami; zapis na dysk odbywa się w wątku konsumenta szyny
+                self.checkpointer.maybe_capture({self.asset: self})
+
+    def open_signal(self, direction: str, price: float, at: float = None) -> Signal:
+        """
+        Tworzy nowy sygnał z kwotą od managera pieniędzy i publikuje go na szynie
+        (magazyn sygnałów, Telegram, API web).
+        :param at: Czas sygnału (epoka), np. czas świecy; domyślnie bieżący czas zegara.
+        """
+        new_signal = Signal(
+            ts=at if at is not None else self.clock.now(),
+            asset=self.asset,
+            direction=direction,
+            amount=self.money_manager.get_amount(),
+            entry_price=price,
+            result=None,
+            created=time.monotonic()
+        )
+        self.bus.publish(TOPIC_SIGNAL_NEW, new_signal)
+        return new_signal
+
+    def settle(self, now, price: float) -> list[Signal]:
+        """
+        Rozlicza transakcje wygasłe do chwili now po cenie price, aktualizuje managera
+        pieniędzy i publikuje wyniki na szynie.
+        """
+        settled = self.settlement.settle_due(now, price)
+        for sig in settled:
+            logging.info("Transakcja rozliczona: %s %s → %s", sig.asset, sig.direction, sig.result)
+            # Aktualizacja managera pieniędzy na podstawie wyniku
+            self.money_manager.record_result(sig.result)
+            self.bus.publish(TOPIC_SIGNAL_SETTLED, sig)
+        return settled
+
+    def can_open(self) -> bool:
+        """
+        Czy można otworzyć kolejną transakcję (limit MAX_PENDING_PER_ASSET oczekujących).
+        """
+        return len(self.settlement) < self.max_pending
+
+    @property
+    def pending_signals(self) -> list[tuple[Signal, float]]:
+        """
+        Oczekujące transakcje w formacie [(Signal, expiry)].
+        """
+        return self.settlement.pending()
+
+    def checkpoint(self) -> dict:
+        """
+        Stan dostawcy do punktu kontrolnego: strategia, manager pieniędzy i oczekujące transakcje.
+        Serię cen zapisuje checkpoint.capture() osobno, bo bywa wspólna dla kilku strumieni.
+        Wywoływana w wątku ticka, między tickami.
+        """
+        return {
+            "kind": type(self).__name__,
+            "strategy": self.strategy.checkpoint(),
+            "money": self.money_manager.checkpoint(),
+            "pending": self.settlement.checkpoint(),
+        }
+
+    def restore(self, state: dict) -> None:
+        """
+        Odtwarza stan z checkpoint() (przed start()). Transakcje rozliczone już po zapisie punktu
+        kontrolnego (sygnał ma wynik – patrz checkpoint.resolve_pending) nie wracają do oczekujących,
+        a ich wynik trafia do managera pieniędzy.
+        :raises ValueError: Punkt kontrolny pochodzi z innego typu dostawcy lub innej strategii.
+        """
+        if state["kind"] != type(self).__name__:
+            raise ValueError(f"Punkt kontrolny dostawcy {state['kind']} nie pasuje do {type(self).__name__}")
+        self.strategy.restore(state["strategy"])
+        self.money_manager.restore(state["money"])
+        pending = []
+        for expiry, signal in state["pending"]:
+            if signal.result is None:
+                pending.append((expiry, signal))
+            else:
+                self.money_manager.record_result(signal.result)
+        self.settlement.restore(pending)
+
 
 class DummyDataProvider(DataProvider):
     """
@@ -41,22 +180,27 @@ class DummyDataProvider(DataProvider):
     Generuje sygnały na podstawie strategii przy lokalnych ekstremach.
     """
     def __init__(self, asset: str, strategy: Strategy, money_manager: MoneyManager,
-                 initial_price: float = None, volatility: float = None):
+                 initial_price: float = None, volatility: float = None, bus=None,
+                 trade_duration_steps: int = None, clock=None, seed: int = None, series=None):
         # Ustawienie domyślnych wartości, jeśli nie przekazano argumentów
         initial_price = initial_price if initial_price is not None else config.DUMMY_INITIAL_PRICE
         volatility = volatility if volatility is not None else config.DUMMY_VOLATILITY
-        super().__init__(asset, strategy, money_manager, update_interval=config.DATA_UPDATE_INTERVAL)
+        seed = seed if seed is not None else config.SIM_SEED
+        super().__init__(asset, strategy, money_manager, update_interval=config.DATA_UPDATE_INTERVAL,
+                         bus=bus, clock=clock, series=series)
         self.price = initial_price
         self.volatility = volatility
+        # Własny generator liczb losowych – z ziarnem przebieg jest w pełni powtarzalny
+        self.rng = random.Random(seed)
+        self.trade_duration_steps = (trade_duration_steps if trade_duration_steps is not None
+                                     else config.TRADE_DURATION_STEPS)
         self.current_tick = 0
-        # Lista oczekujących sygnałów w formacie [(Signal, expiry_tick)]
-        self.pending_signals: list[tuple[Signal, int]] = []
 
     def generate_price(self) -> float:
         """
         Generuje następną cenę metodą losowego spaceru wokół bieżącej ceny.
         """
-        change = random.uniform(-self.volatility, self.volatility)
+        change = self.rng.uniform(-self.volatility, self.volatility)
         self.price += change
         # Zapobiegamy sytuacji, gdy cena byłaby ujemna lub zerowa
         if self.price <= 0:
@@ -65,95 +209,148 @@ class DummyDataProvider(DataProvider):
         self.price = round(self.price, 5)
         return self.price
 
+    def checkpoint(self) -> dict:
+        state = super().checkpoint()
+        # Cena i stan generatora – po odtworzeniu losowy spacer biegnie dalej tą samą ścieżką
+        state.update(price=self.price, rng=self.rng.getstate(), current_tick=self.current_tick)
+        return state
+
+    def restore(self, state: dict) -> None:
+        super().restore(state)
+        self.price = state["price"]
+        self.rng.setstate(state["rng"])
+        self.current_tick = state["current_tick"]
+
+    def step(self) -> Signal | None:
+        """
+        Jeden tick symulatora:
+        - Generuje nową cenę.
+        - Rozlicza oczekujące transakcje, które wygasły w tym ticku.
+        - Sprawdza strategię pod kątem nowych sygnałów, jeśli limit oczekujących na to pozwala.
+        """
+        price = self.generate_price()
+        self.current_tick += 1
+        now = self.clock.now()
+        self.series.on_tick(now, price)
+        if self.recorder is not None:
+            self.recorder.record(self.asset, now, price)
+
+        # Rozliczenie oczekujących sygnałów (expiry_tick <= current_tick) – tylko tych, które wygasły
+        self.settle(self.current_tick, price)
+
+        # Jeśli jest miejsce na nową transakcję, sprawdzamy, czy pojawi się nowy sygnał
+        if self.can_open():
+            direction = self.strategy.check_signal(price)
+            if direction:  # Zwróci "CALL" lub "PUT", albo None
+                new_signal = self.open_signal(direction, price)
+                # Tick wygaśnięcia: trade_duration_steps (TRADE_DURATION_STEPS) ticków od teraz
+                self.settlement.add(new_signal, self.current_tick + self.trade_duration_steps)
+                logging.info("Nowy sygnał: %s %s o godzinie %s (kwota = %.2f USD)",
+                             new_signal.asset, new_signal.direction, new_signal.time, new_signal.amount)
+                return new_signal
+        return None
+
     def run(self) -> None:
         """
-        Główna pętla symulatora:
-        - Generuje nowe ceny co update_interval sekund.
-        - Sprawdza, czy wygasły oczekujące transakcje (pending_signals) i rozlicza je.
-        - Sprawdza strategię pod kątem nowych sygnałów, jeśli nie ma aktywnych oczekujących.
+        Główna pętla symulatora: wykonuje step() co update_interval sekund.
         """
         logging.info("Uruchomienie DummyDataProvider dla aktywa %s (początkowa cena = %.5f)", self.asset, self.price)
         while True:
             try:
-                price = self.generate_price()
-                now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.current_tick += 1
-
-                # Rozliczenie oczekujących sygnałów (jeśli expiry_tick <= current_tick)
-                if self.pending_signals:
-                    updated_pending: list[tuple[Signal, int]] = []
-                    for sig, expiry_tick in self.pending_signals:
-                        if self.current_tick >= expiry_tick:
-                            # Określenie wyniku na podstawie porównania cen
-                            if sig.direction == "CALL":
-                                sig.result = "WIN" if price > sig.entry_price else "LOSS"
-                            else:  # PUT
-                                sig.result = "WIN" if price < sig.entry_price else "LOSS"
-                            logging.info("Transakcja rozliczona: %s %s → %s", sig.asset, sig.direction, sig.result)
-                            # Aktualizacja managera pieniędzy na podstawie wyniku
-                            self.money_manager.record_result(sig.result)
-                        else:
-                            updated_pending.append((sig, expiry_tick))
-                    self.pending_signals = updated_pending
-
-                # Jeśli brak oczekujących sygnałów, sprawdzamy, czy pojawi się nowy sygnał
-                if not self.pending_signals:
-                    direction = self.strategy.check_signal(price)
-                    if direction:  # Zwróci "CALL" lub "PUT", albo None
-                        amount = self.money_manager.get_amount()
-                        new_signal = Signal(
-                            time=now_time,
-                            asset=self.asset,
-                            direction=direction,
-                            amount=amount,
-                            entry_price=price,
-                            result=None
-                        )
-                        # Obliczamy tick wygaśnięcia: TRADE_DURATION_STEPS ticków od teraz
-                        expiry_tick = self.current_tick + config.TRADE_DURATION_STEPS
-                        # Dodajemy sygnał do globalnej listy wątkowo bezpiecznie
-                        with signals_lock:
-                            signals.append(new_signal)
-                        # Dodajemy do listy oczekujących sygnałów
-                        self.pending_signals.append((new_signal, expiry_tick))
-                        logging.info("Nowy sygnał: %s %s o godzinie %s (kwota = %.2f USD)",
-                                     new_signal.asset, new_signal.direction, new_signal.time, new_signal.amount)
-                        # Powiadamiamy subskrybentów Telegram o nowym sygnale
-                        notify_signal(new_signal)
-
-                # Pauza przed następną iteracją
-                time.sleep(self.update_interval)
+                self.timed_step()
+                # Pauza przed następną iteracją (według zegara – wirtualny nie czeka wcale)
+                self.clock.sleep(self.update_interval)
 
             except Exception as e:
+                self.error_metric.inc()
                 logging.error("Błąd w pętli DummyDataProvider: %s", str(e), exc_info=True)
                 # Jeśli wystąpi błąd, czekamy sekundę i próbujemy ponownie
                 time.sleep(1)
 
 
+def backoff_delay(attempt: int, base: float, cap: float, rng=random) -> float:
+    """
+    Wykładnicze opóźnienie z rozrzutem („equal jitter”): połowa stała, połowa losowa,
+    żeby wiele procesów nie łączyło się ponownie w tej samej chwili.
+    :param attempt: Numer kolejnej nieudanej próby (od 0).
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+def parse_candles(raw) -> list[tuple[float, float]]:
+    """
+    Normalizuje świece z API do posortowanej listy (czas świecy, cena zamknięcia) bez duplikatów.
+    Akceptuje listę słowników, słownik {czas: świeca} oraz DataFrame (to_dict("records")).
+    Świece bez czasu lub z ceną 0 (błędne dane) są pomijane.
+    """
+    if raw is None:
+        return []
+    if hasattr(raw, "to_dict"):
+        raw = raw.to_dict("records")
+    if isinstance(raw, dict):
+        raw = [dict(candle, time=candle.get("time", key)) for key, candle in raw.items()]
+    by_time = {}
+    for candle in raw:
+        candle_time = candle.get("time", candle.get("from", candle.get("timestamp")))
+        # W API PocketOption klucz może być "close" lub "close_price"
+        price = float(candle.get("close") or candle.get("close_price") or 0)
+        if candle_time is None or price == 0:
+            continue
+        by_time[float(candle_time)] = price
+    return sorted(by_time.items())
+
+
 class PocketOptionDataProvider(DataProvider):
     """
     Dostawca danych z rzeczywistego API PocketOption.
-    Wymaga poprawnego POCKETOPTION_SSID w config.py.
+    Wymaga poprawnego POCKETOPTION_SSID w config.py (albo POCKETOPTION_FAKE=True do testów offline).
+    Każda zamknięta świeca trafia do strategii dokładnie raz (kluczem jest czas świecy);
+    po zerwaniu połączenia luka jest uzupełniana historią świec.
     """
+    reconnects = True
+
     def __init__(self, asset: str, strategy: Strategy, money_manager: MoneyManager,
-                 session_id: str, use_demo: bool = True):
-        super().__init__(asset, strategy, money_manager, update_interval=config.DATA_UPDATE_INTERVAL)
+                 session_id: str, use_demo: bool = True, bus=None, clock=None, api_factory=None, series=None):
+        """
+        :param api_factory: Funkcja session_id -> obiekt API (domyślnie pocketoptionapi lub atrapa).
+        """
+        super().__init__(asset, strategy, money_manager, update_interval=config.DATA_UPDATE_INTERVAL,
+                         bus=bus, clock=clock, series=series)
         self.session_id = session_id
         self.use_demo = use_demo
+        self.api_factory = api_factory
         self.account = None  # Obiekt połączenia z PocketOption API
+        # Czas trwania transakcji w sekundach (wygaśnięcie liczone od czasu świecy)
+        self.trade_duration = config.TRADE_DURATION_SECONDS
+        self.candle_period = config.CANDLE_PERIOD
+        # Czas ostatniej przetworzonej świecy (None = jeszcze żadnej)
+        self.last_candle_time = None
+        self.failures = 0  # kolejne nieudane próby połączenia (do wyliczenia opóźnienia)
+        self.retry_at = None  # czas zegara najbliższej próby ponownego połączenia (None = połączony)
+        self.rng = random.Random()
+
+    def _create_api(self):
+        if self.api_factory is not None:
+            return self.api_factory(self.session_id)
+        if config.POCKETOPTION_FAKE:
+            import fake_pocketoption
+            return fake_pocketoption.FakePocketOption(self.session_id, fake_pocketoption.shared_market(self.clock))
+        try:
+            from pocketoptionapi.stable_api import PocketOption
+        except ImportError:
+            logging.error("Biblioteka pocketoptionapi nie jest zainstalowana.")
+            return None
+        return PocketOption(self.session_id)
 
     def connect(self) -> bool:
         """
         Próbuje połączyć się z API PocketOption za pomocą session_id.
         Zwraca True, jeśli połączenie OK, False w przeciwnym razie.
         """
-        try:
-            from pocketoptionapi.stable_api import PocketOption
-        except ImportError:
-            logging.error("Biblioteka pocketoptionapi nie jest zainstalowana.")
+        self.account = self._create_api()
+        if self.account is None:
             return False
-
-        self.account = PocketOption(self.session_id)
         success, msg = self.account.connect()
         if not success:
             logging.error("Nie udało się połączyć z PocketOption: %s", msg)
@@ -168,75 +365,292 @@ class PocketOptionDataProvider(DataProvider):
 
         return True
 
-    def run(self) -> None:
+    def start(self) -> bool:
         """
-        Główna pętla dostawcy realnych danych:
-        - Łączy się z PocketOption API.
-        - Odbiera strumień świec co update_interval sekund.
-        - Generuje sygnały na podstawie strategii (rozliczenie transakcji wymaga dodatkowej logiki).
+        Łączy się z PocketOption API i uruchamia strumień świec.
         """
-        logging.info("Uruchomienie PocketOptionDataProvider dla %s...", self.asset)
         if not self.connect():
-            logging.error("PocketOptionDataProvider nie połączony – zakończono działanie.")
-            return
-
+            logging.error("PocketOptionDataProvider (%s) nie połączony z PocketOption.", self.asset)
+            return False
         try:
-            # Uruchom strumień świec (interwał 2 minuty – przykład; dostosuj w razie potrzeby)
-            self.account.start_candles_stream(self.asset, 2)
+            self.account.start_candles_stream(self.asset, self.candle_period)
         except Exception as e:
             logging.error("Nie można uruchomić strumienia świec dla %s: %s", self.asset, e)
-            return
+            return False
+        return True
+
+    def checkpoint(self) -> dict:
+        state = super().checkpoint()
+        state["last_candle_time"] = self.last_candle_time
+        return state
+
+    def restore(self, state: dict) -> None:
+        """
+        Po odtworzeniu pierwszy odczyt strumienia dociąga z historii świece zamknięte w czasie przestoju
+        (jak po zerwaniu połączenia), więc transakcje oczekujące rozliczają się po właściwych cenach.
+        """
+        super().restore(state)
+        self.last_candle_time = state["last_candle_time"]
+
+    def closed_candles(self, candles: list[tuple[float, float]]) -> list[tuple[float, float]]:
+        """
+        Wybiera świece jeszcze nieprzetworzone i już zamknięte. Najnowsza świeca w odczycie
+        wciąż się formuje (jej cena zamknięcia się zmienia), więc czeka na następny odczyt.
+        """
+        if not candles:
+            return []
+        forming_time = candles[-1][0]
+        if self.last_candle_time is None:
+            # Pierwszy odczyt: historia sprzed startu nie generuje sygnałów
+            self.last_candle_time = candles[-2][0] if len(candles) > 1 else forming_time - self.candle_period
+            return []
+        return [(candle_time, price) for candle_time, price in candles
+                if self.last_candle_time < candle_time < forming_time]
+
+    def process_candle(self, candle_time: float, price: float) -> Signal | None:
+        """
+        Przetwarza jedną zamkniętą świecę: rozlicza transakcje wygasłe do czasu świecy
+        i sprawdza strategię.
+        """
+        self.last_candle_time = candle_time
+        self.series.on_tick(candle_time, price)
+        if self.recorder is not None:
+            self.recorder.record(self.asset, candle_time, price)
+        self.settle(candle_time, price)
+        if not self.can_open():
+            return None
+        direction = self.strategy.check_signal(price)
+        if direction:
+            new_signal = self.open_signal(direction, price, at=candle_time)
+            self.settlement.add(new_signal, candle_time + self.trade_duration)
+            logging.info("Nowy sygnał (realne dane): %s %s o godzinie %s (kwota = %.2f USD)",
+                         new_signal.asset, new_signal.direction, new_signal.time, new_signal.amount)
+            return new_signal
+        return None
+
+    def step(self) -> Signal | None:
+        """
+        Jeden odczyt strumienia świec: przetwarza wszystkie nowe zamknięte świece po kolei
+        (jeśli między odczytami przepadły świece, najpierw uzupełnia je z historii).
+        :return: Ostatni nowy sygnał albo None.
+        """
+        candles = parse_candles(self.account.get_realtime_candles(self.asset))
+        if (candles and self.last_candle_time is not None
+                and candles[0][0] > self.last_candle_time + self.candle_period):
+            # Bufor strumienia nie sięga już ostatniej przetworzonej świecy – dociągamy brakujące z historii
+            self.backfill()
+        new_signal = None
+        for candle_time, price in self.closed_candles(candles):
+            new_signal = self.process_candle(candle_time, price) or new_signal
+        return new_signal
+
+    def backfill(self) -> int:
+        """
+        Po ponownym połączeniu dociąga historię świec od ostatniej przetworzonej
+        i przetwarza te, które przepadły w czasie przerwy.
+        :return: Liczba uzupełnionych świec.
+        """
+        if self.last_candle_time is None:
+            return 0
+        now = self.clock.now()
+        count = min(config.BACKFILL_MAX_CANDLES, int((now - self.last_candle_time) / self.candle_period) + 2)
+        try:
+            history = parse_candles(self.account.get_candles(self.asset, self.candle_period, now, count))
+        except Exception as e:
+            logging.warning("Nie można pobrać historii świec %s do uzupełnienia luki: %s", self.asset, e)
+            return 0
+        missed = self.closed_candles(history)
+        if missed and missed[0][0] - self.last_candle_time > self.candle_period:
+            logging.warning("Luka w świecach %s większa niż dostępna historia (od %s do %s).",
+                            self.asset, self.last_candle_time, missed[0][0])
+        for candle_time, price in missed:
+            self.process_candle(candle_time, price)
+        if missed:
+            logging.info("Uzupełniono %d świec %s po ponownym połączeniu.", len(missed), self.asset)
+        return len(missed)
+
+    def reconnect(self) -> bool:
+        """
+        Zamyka bieżące połączenie, łączy się ponownie i uzupełnia lukę w świecach.
+        """
+        try:
+            if self.account:
+                self.account.close()
+        except Exception:
+            pass
+        ok = self.start()
+        metrics.provider_reconnects_total.labels(self.asset, "ok" if ok else "failed").inc()
+        if ok:
+            self.backfill()
+        return ok
+
+    def schedule_recovery(self) -> None:
+        """
+        Planuje kolejną próbę ponownego połączenia: wykładnicze opóźnienie z rozrzutem między próbami.
+        """
+        delay = backoff_delay(self.failures, config.RECONNECT_BASE_DELAY, config.RECONNECT_MAX_DELAY, self.rng)
+        self.failures += 1
+        self.retry_at = self.clock.now() + delay
+        logging.warning("Ponowne połączenie z PocketOption (%s) za %.1fs, próba %d.",
+                        self.asset, delay, self.failures)
+
+    def try_recover(self) -> bool:
+        """
+        Łączy się ponownie, jeśli nadszedł czas zaplanowanej próby; po porażce planuje następną.
+        Nie czeka – harmonogram wielu strumieni wywołuje ją co tick, nie wstrzymując pozostałych aktywów.
+        """
+        if self.retry_at is None:
+            return True
+        if self.clock.now() < self.retry_at:
+            return False
+        if self.reconnect():
+            self.failures = 0
+            self.retry_at = None
+            return True
+        self.schedule_recovery()
+        return False
+
+    def recover(self) -> None:
+        """
+        Łączy się ponownie aż do skutku (wariant blokujący dla run() jednego aktywa).
+        """
+        self.schedule_recovery()
+        while not self.try_recover():
+            self.clock.sleep(max(0.0, self.retry_at - self.clock.now()))
+
+    def run(self) -> None:
+        """
+        Główna pętla dostawcy realnych danych:
+        - Łączy się z PocketOption API.
+        - Co update_interval sekund odczytuje strumień świec i przetwarza nowe zamknięte świece.
+        - Po błędzie łączy się ponownie (backoff z rozrzutem) i uzupełnia brakujące świece.
+        """
+        logging.info("Uruchomienie PocketOptionDataProvider dla %s...", self.asset)
+        if not self.start():
+            # Pierwsze połączenie podlega temu samemu backoffowi co zerwane
+            self.recover()
 
         while True:
             try:
-                # Pobieranie najnowszych świec
-                candles = self.account.get_realtime_candles(self.asset)
-                if not candles:
-                    time.sleep(self.update_interval)
-                    continue
-
-                latest_candle = candles[-1]
-                # W API PocketOption klucz może być "close" lub "close_price"
-                price = float(latest_candle.get("close") or latest_candle.get("close_price") or 0)
-                if price == 0:
-                    # Jeśli cena = 0 (błędne dane), odczekaj i pobierz ponownie
-                    time.sleep(self.update_interval)
-                    continue
-
-                now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                # Sprawdź, czy generujemy nowy sygnał
-                direction = self.strategy.check_signal(price)
-                if direction:
-                    amount = self.money_manager.get_amount()
-                    new_signal = Signal(
-                        time=now_time,
-                        asset=self.asset,
-                        direction=direction,
-                        amount=amount,
-                        entry_price=price,
-                        result=None
-                    )
-                    # Dodajemy sygnał do listy globalnej
-                    with signals_lock:
-                        signals.append(new_signal)
-                    logging.info("Nowy sygnał (realne dane): %s %s o godzinie %s (kwota = %.2f USD)",
-                                 new_signal.asset, new_signal.direction, new_signal.time, new_signal.amount)
-                    # Powiadamiamy subskrybentów Telegram
-                    notify_signal(new_signal)
-                    # UWAGA: rozliczenie transakcji w realnym trybie wymaga dodatkowej logiki
-
+                self.timed_step()
                 # Przerwa przed kolejnym odczytem
-                time.sleep(self.update_interval)
+                self.clock.sleep(self.update_interval)
 
             except Exception as e:
+                self.error_metric.inc()
                 logging.error("Błąd w pętli PocketOptionDataProvider: %s", str(e), exc_info=True)
-                # Próba ponownego połączenia w razie błędu
-                try:
-                    if self.account:
-                        self.account.close()
-                except Exception:
-                    pass
-                time.sleep(5)
-                if not self.connect():
-                    logging.error("Ponowne połączenie do PocketOption nie powiodło się, ponawiam w 5s...")
-                    continue
+                self.recover()
+
+
+class ReplayDataProvider(DataProvider):
+    """
+    Odtwarza ticki nagrane w archiwum (tick_archive.TickArchive) przez ten sam potok co dane na żywo:
+    seria cen, rozliczenia według czasu ticka (jak w PocketOptionDataProvider) i strategia.
+    Czas archiwum biegnie speed razy szybciej niż zegar dostawcy – z zegarem wirtualnym
+    (CLOCK_MODE=virtual) odtworzenie trwa tyle, ile obliczenia.
+    """
+    def __init__(self, asset: str, strategy: Strategy, money_manager: MoneyManager, archive,
+                 start: float = None, end: float = None, speed: float = None, bus=None, clock=None, series=None):
+        """
+        :param archive: tick_archive.TickArchive z tickami aktywa.
+        :param start: Początek odtwarzanego zakresu (epoka; None = od pierwszego ticka).
+        :param end: Koniec zakresu, wyłącznie (None = do ostatniego ticka).
+        :param speed: Ile sekund archiwum przypada na sekundę zegara (domyślnie config.REPLAY_SPEED).
+        """
+        super().__init__(asset, strategy, money_manager, update_interval=config.DATA_UPDATE_INTERVAL,
+                         bus=bus, clock=clock, series=series)
+        self.archive = archive
+        self.start_time = start
+        self.end_time = end
+        self.speed = speed if speed is not None else config.REPLAY_SPEED
+        if self.speed <= 0:
+            raise ValueError("Tempo odtwarzania musi być dodatnie.")
+        self.trade_duration = config.TRADE_DURATION_SECONDS
+        self.last_time = None    # czas ostatniego odtworzonego ticka
+        self.ticks = None        # generator (ts, cena) z archiwum
+        self.next_tick = None    # pierwszy jeszcze nieodtworzony tick
+        self.origin = None       # (czas zegara, czas archiwum) pierwszego kroku
+        self.finished = False
+
+    def checkpoint(self) -> dict:
+        state = super().checkpoint()
+        state["last_time"] = self.last_time
+        return state
+
+    def restore(self, state: dict) -> None:
+        """
+        Po odtworzeniu archiwum jest czytane dalej od ticka następnego po ostatnim przetworzonym.
+        """
+        super().restore(state)
+        self.last_time = state["last_time"]
+        if self.last_time is not None:
+            self.start_time = max(self.start_time or self.last_time, self.last_time)
+
+    def start(self) -> bool:
+        self.ticks = self.archive.ticks(self.asset, self.start_time, self.end_time)
+        self.next_tick = next(self.ticks, None)
+        if self.next_tick is None:
+            logging.error("Archiwum %s nie zawiera ticków %s w zadanym zakresie.", self.archive.root, self.asset)
+            return False
+        return True
+
+    def process_tick(self, ts: float, price: float) -> Signal | None:
+        """
+        Przetwarza jeden tick z archiwum: rozlicza transakcje wygasłe do jego czasu i sprawdza strategię.
+        """
+        self.last_time = ts
+        self.series.on_tick(ts, price)
+        self.settle(ts, price)
+        if not self.can_open():
+            return None
+        direction = self.strategy.check_signal(price)
+        if direction:
+            new_signal = self.open_signal(direction, price, at=ts)
+            self.settlement.add(new_signal, ts + self.trade_duration)
+            logging.info("Nowy sygnał (odtworzenie): %s %s o godzinie %s (kwota = %.2f USD)",
+                         new_signal.asset, new_signal.direction, new_signal.time, new_signal.amount)
+            return new_signal
+        return None
+
+    def step(self) -> Signal | None:
+        """
+        Odtwarza wszystkie ticki archiwum do bieżącej chwili odtworzenia
+        (czas pierwszego ticka + speed × czas zegara od pierwszego kroku).
+        :return: Ostatni nowy sygnał albo None.
+        """
+        if self.ticks is None and not self.start():
+            self.finished = True
+            return None
+        now = self.clock.now()
+        if self.origin is None:
+            self.origin = (now, self.next_tick[0])
+        until = self.origin[1] + (now - self.origin[0]) * self.speed
+        new_signal = None
+        while self.next_tick is not None and self.next_tick[0] <= until:
+            ts, price = self.next_tick
+            self.next_tick = next(self.ticks, None)
+            if self.last_time is not None and ts <= self.last_time:
+                continue
+            new_signal = self.process_tick(ts, price) or new_signal
+        if self.next_tick is None:
+            self.finished = True
+        return new_signal
+
+    def run(self) -> None:
+        """
+        Główna pętla odtwarzania: step() co update_interval sekund zegara, aż do końca archiwum.
+        """
+        logging.info("Uruchomienie ReplayDataProvider dla %s z %s (tempo ×%g).",
+                     self.asset, self.archive.root, self.speed)
+        if not self.start():
+            return
+        while not self.finished:
+            try:
+                self.timed_step()
+                self.clock.sleep(self.update_interval)
+
+            except Exception as e:
+                self.error_metric.inc()
+                logging.error("Błąd w pętli ReplayDataProvider: %s", str(e), exc_info=True)
+                time.sleep(1)
+        logging.info("Koniec archiwum %s – odtworzono ticki do %s.", self.asset, self.last_time)
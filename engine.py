@@ -0,0 +1,447 @@
+# engine.py – Silnik wielu aktywów: jeden harmonogram, wiele par (Strategy, MoneyManager) i pula procesów
+
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from dataclasses import dataclass
+
+import config
+import event_bus
+import metrics
+import clock as clock_module
+import checkpoint
+import tick_archive
+from event_bus import TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED
+from strategy import make_strategy
+import series as series_module
+from money import MoneyManager
+from data_provider import DataProvider, DummyDataProvider, PocketOptionDataProvider, ReplayDataProvider
+
+
+@dataclass
+class AssetConfig:
+    """
+    Konfiguracja jednego strumienia (aktywo + parametry strategii i stawek).
+    :param asset: Symbol aktywa, np. "EURUSD".
+    :param window_size: Okno strategii ekstremów.
+    :param base_amount: Bazowa kwota transakcji.
+    :param use_martingale: Czy stosować Martingale.
+    :param initial_price: Cena początkowa symulatora (None = config.DUMMY_INITIAL_PRICE).
+    :param volatility: Zmienność symulatora (None = config.DUMMY_VOLATILITY).
+    :param seed: Ziarno RNG symulatora (None = config.SIM_SEED przesunięte o numer strumienia).
+    :param strategy: "extremum" (domyślnie, okno window_size), "rsi", "ma_cross" lub "bollinger".
+    :param params: Parametry strategii wskaźnikowej, np. {"period": 14, "timeframe": 60}.
+    """
+    asset: str
+    window_size: int = 5
+    base_amount: float = config.BASE_AMOUNT
+    use_martingale: bool = config.USE_MARTINGALE
+    initial_price: float = None
+    volatility: float = None
+    seed: int = None
+    strategy: str = "extremum"
+    params: dict = None
+
+    @property
+    def name(self) -> str:
+        if self.strategy == "extremum":
+            return f"{self.asset}/w{self.window_size}"
+        params = ",".join(f"{key}={value}" for key, value in sorted((self.params or {}).items()))
+        return f"{self.asset}/{self.strategy}({params})"
+
+
+def load_asset_configs(path: str) -> list[AssetConfig]:
+    """
+    Wczytuje listę aktywów z pliku JSON, np.:
+    [{"asset": "EURUSD", "window_size": 5}, {"asset": "GBPUSD", "window_size": 7, "base_amount": 2}]
+    Ten sam symbol może wystąpić wielokrotnie z różnymi parametrami.
+    """
+    with open(path, "r") as f:
+        entries = json.load(f)
+    return [AssetConfig(**entry) for entry in entries]
+
+
+def build_provider(asset_config: AssetConfig, bus, clock=None, index: int = 0) -> DataProvider:
+    """
+    Tworzy dostawcę danych (symulacja, PocketOption lub odtworzenie archiwum) z własną strategią i managerem pieniędzy.
+    :param index: Numer strumienia – różnicuje ziarno RNG, gdy ustawiono tylko SIM_SEED.
+    """
+    # Realne dane i odtworzenie archiwum: strumienie tego samego aktywa dzielą serię cen i wskaźniki.
+    # Symulacja: każdy strumień ma własny losowy spacer, więc i własną serię.
+    if config.USE_REAL_DATA or config.REPLAY_DIR:
+        series = series_module.store.get(asset_config.asset)
+    else:
+        series = series_module.AssetSeries(asset_config.asset)
+    strategy = make_strategy(asset_config.strategy, asset_config.window_size, series,
+                             **(asset_config.params or {}))
+    money_manager = MoneyManager(base_amount=asset_config.base_amount,
+                                 use_martingale=asset_config.use_martingale)
+    if config.REPLAY_DIR:
+        return ReplayDataProvider(asset_config.asset, strategy, money_manager,
+                                  tick_archive.TickArchive(config.REPLAY_DIR), start=config.REPLAY_START,
+                                  end=config.REPLAY_END, bus=bus, clock=clock, series=series)
+    if config.USE_REAL_DATA:
+        return PocketOptionDataProvider(asset_config.asset, strategy, money_manager,
+                                        config.POCKETOPTION_SSID, use_demo=config.USE_DEMO_BALANCE,
+                                        bus=bus, clock=clock, series=series)
+    seed = asset_config.seed
+    if seed is None and config.SIM_SEED is not None:
+        seed = config.SIM_SEED + index
+    return DummyDataProvider(asset_config.asset, strategy, money_manager,
+                             initial_price=asset_config.initial_price,
+                             volatility=asset_config.volatility, bus=bus, clock=clock, seed=seed,
+                             series=series)
+
+
+def recorded_streams(asset_configs: list[AssetConfig]) -> list[int]:
+    """
+    Strumienie, których ticki trafiają do archiwum (TICK_ARCHIVE_DIR): pierwszy strumień każdego aktywa –
+    przy realnych danych pozostałe widzą te same ceny, a aktywo może nagrywać tylko jeden proces.
+    Odtwarzane archiwum nie jest nagrywane ponownie.
+    """
+    if not config.TICK_ARCHIVE_DIR or config.REPLAY_DIR:
+        return []
+    first: dict[str, int] = {}
+    for index, asset_config in enumerate(asset_configs):
+        first.setdefault(asset_config.asset, index)
+    return sorted(first.values())
+
+
+def attach_recorder(providers: list[DataProvider], positions: list[int]):
+    """
+    Podłącza wspólny tick_archive.TickRecorder do dostawców na podanych pozycjach.
+    :return: Rejestrator albo None, gdy nic nie jest nagrywane.
+    """
+    if not positions:
+        return None
+    recorder = tick_archive.TickRecorder()
+    for position in positions:
+        providers[position].recorder = recorder
+    return recorder
+
+
+class TickTimer:
+    """
+    Statystyki czasu obsługi ticków jednego strumienia.
+    """
+    __slots__ = ("ticks", "total", "max", "last", "errors")
+
+    def __init__(self):
+        self.ticks = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.errors = 0
+
+    def record(self, duration: float) -> None:
+        self.ticks += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+
+    def to_dict(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "avg_ms": round(1000 * self.total / self.ticks, 3) if self.ticks else None,
+            "max_ms": round(1000 * self.max, 3),
+            "last_ms": round(1000 * self.last, 3),
+            "errors": self.errors,
+        }
+
+
+def start_all(providers: list[DataProvider]) -> list[int]:
+    """
+    Uruchamia dostawców – tak samo w trybie lokalnym i w procesach roboczych.
+    Dostawca z połączeniem (reconnects), którego start się nie udał, zostaje i łączy się ponownie z backoffem;
+    pozostałe (np. odtworzenie z pustego archiwum) są pomijane z błędem w logu.
+    :return: Indeksy (w providers) strumieni biorących udział w tickach.
+    """
+    active = []
+    for index, provider in enumerate(providers):
+        if provider.start():
+            active.append(index)
+        elif provider.reconnects:
+            provider.schedule_recovery()
+            active.append(index)
+        else:
+            logging.error("Strumień %s pominięty: nie udało się uruchomić dostawcy.", provider.asset)
+    return active
+
+
+def step_all(providers: list[DataProvider], active: list[int] = None) -> list[tuple[int, float, bool]]:
+    """
+    Wykonuje jeden tick każdego dostawcy (albo tylko strumieni active z start_all).
+    Dostawca, którego tick się nie udał, łączy się ponownie z backoffem (schedule_recovery / try_recover)
+    – do tego czasu jego ticki są pomijane, a pozostałe strumienie działają bez przerwy.
+    :return: Lista (indeks strumienia w providers, czas obsługi w sekundach, czy wystąpił błąd).
+    """
+    timings = []
+    for index in (active if active is not None else range(len(providers))):
+        provider = providers[index]
+        started = time.perf_counter()
+        failed = False
+        try:
+            if not provider.try_recover():
+                continue
+            provider.step()
+        except Exception as e:
+            failed = True
+            logging.error("Błąd ticka dla %s: %s", provider.asset, e, exc_info=True)
+            provider.schedule_recovery()
+        timings.append((index, time.perf_counter() - started, failed))
+    return timings
+
+
+# Ile poleceń ticka może czekać na proces roboczy, zanim harmonogram wstrzyma się przy wysyłaniu kolejnego
+SHARD_QUEUE_SIZE = 2
+
+# Zdarzenie procesu roboczego: transakcja odtworzona z punktu kontrolnego (bez ponownej publikacji nowego sygnału)
+SHARD_RESTORED = "shard.restored"
+
+
+class _ShardBus:
+    """
+    Szyna procesu roboczego: zbiera zdarzenia dostawców do odesłania procesowi głównemu.
+    Sygnały są identyfikowane lokalnym numerem, bo po przesłaniu do innego procesu są kopiami.
+    """
+
+    def __init__(self):
+        self.events: list[tuple] = []
+        self.keys: dict[int, int] = {}
+        self.next_key = 0
+
+    def publish(self, topic: str, signal) -> None:
+        if topic in (TOPIC_SIGNAL_NEW, SHARD_RESTORED):
+            self.next_key += 1
+            self.keys[id(signal)] = self.next_key
+            self.events.append((topic, self.next_key, signal))
+        elif topic == TOPIC_SIGNAL_SETTLED:
+            self.events.append((topic, self.keys.pop(id(signal)), signal.result))
+
+    def drain(self) -> list[tuple]:
+        events, self.events = self.events, []
+        return events
+
+
+def _shard_main(shard_index: int, asset_configs: list[AssetConfig], indexes: list[int],
+                commands, results, keys: list[str] = None, state: dict = None,
+                recorded: list[int] = ()) -> None:
+    """
+    Proces roboczy: trzyma stan swoich strumieni i wykonuje tick na polecenie harmonogramu.
+    Czas sygnałów pochodzi z polecenia ticka, więc wszystkie procesy dzielą zegar harmonogramu.
+    Polecenie to (czas, czy zrobić migawkę) albo None (koniec); migawka wraca razem z wynikiem ticka.
+    :param keys: Klucze strumieni w punkcie kontrolnym (checkpoint.stream_keys).
+    :param state: Część punktu kontrolnego dla tego procesu (None = start od zera).
+    :param recorded: Indeksy strumieni (jak indexes), których ticki nagrywać do archiwum.
+    """
+    shard_bus = _ShardBus()
+    shard_clock = clock_module.VirtualClock()
+    keys = keys if keys is not None else [asset_config.name for asset_config in asset_configs]
+    providers = [build_provider(asset_config, shard_bus, shard_clock, index)
+                 for asset_config, index in zip(asset_configs, indexes)]
+    streams = dict(zip(keys, providers))
+    if state is not None:
+        checkpoint.restore(streams, state)
+        # Proces główny dostaje odtworzone transakcje, żeby móc opublikować ich rozliczenie
+        for provider in providers:
+            for signal, _ in provider.pending_signals:
+                shard_bus.publish(SHARD_RESTORED, signal)
+    recorder = attach_recorder(providers, [indexes.index(i) for i in recorded])
+    # Indeksy w czasach ticków odnoszą się do pełnej listy strumieni procesu (jak self.shards[shard_index])
+    active = start_all(providers)
+    keys = list(streams)
+    streams = {keys[index]: providers[index] for index in active}
+    while True:
+        command = commands.get()
+        if command is None:
+            if recorder is not None:
+                recorder.close()
+            return
+        shard_clock.current, capture = command
+        timings = step_all(providers, active)
+        state = checkpoint.capture(streams, shard_clock.current) if capture else None
+        results.put((shard_index, timings, shard_bus.drain(), state))
+
+
+class MultiAssetEngine:
+    """
+    Obsługuje wiele aktywów i zestawów parametrów z jednego harmonogramu.
+    - workers <= 1: wszystkie strumienie w wątku harmonogramu.
+    - workers > 1: strumienie są dzielone między procesy robocze (osobne rdzenie CPU);
+      harmonogram rozsyła polecenie ticka, a zdarzenia wracają i trafiają na szynę procesu głównego.
+    """
+
+    def __init__(self, asset_configs: list[AssetConfig], interval: float = None, workers: int = 1,
+                 bus=None, report_interval: float = 60.0, clock=None, checkpointer=None):
+        """
+        :param asset_configs: Lista strumieni do obsługi.
+        :param interval: Odstęp między tickami w sekundach (domyślnie config.DATA_UPDATE_INTERVAL).
+        :param workers: Liczba procesów roboczych.
+        :param bus: Szyna zdarzeń (domyślnie globalna).
+        :param report_interval: Co ile sekund logować statystyki czasów ticków.
+        :param clock: Zegar harmonogramu (domyślnie globalny clock.clock).
+        :param checkpointer: checkpoint.Checkpointer – okresowe migawki stanu strumieni (None = wyłączone).
+        """
+        self.asset_configs = asset_configs
+        self.interval = interval if interval is not None else config.DATA_UPDATE_INTERVAL
+        self.workers = max(1, min(workers, len(asset_configs)))
+        self.bus = bus if bus is not None else event_bus.bus
+        self.clock = clock if clock is not None else clock_module.clock
+        self.report_interval = report_interval
+        self.timers = {asset_config.name: TickTimer() for asset_config in asset_configs}
+        self.keys = checkpoint.stream_keys([asset_config.name for asset_config in asset_configs])
+        self.recorded = recorded_streams(asset_configs)
+        self.checkpointer = checkpointer
+        # Punkt kontrolny do odtworzenia przy starcie (restore()); migawki procesów roboczych w trakcie łączenia
+        self.restored_state = None
+        self.checkpoint_parts: dict[int, dict] = {}
+        self.lag = 0.0  # o ile harmonogram spóźnia się względem planu (sekundy)
+        # Strumienie przypisane do procesów: shard -> lista indeksów w asset_configs
+        self.shards = [list(range(i, len(asset_configs), self.workers)) for i in range(self.workers)]
+        # Sygnały oczekujące na rozliczenie z procesów roboczych: (shard, lokalny klucz) -> Signal
+        self.remote_pending: dict[tuple[int, int], object] = {}
+
+    def restore(self, state: dict) -> None:
+        """
+        Ustawia punkt kontrolny, od którego strumienie wystartują w run() (po checkpoint.resolve_pending).
+        """
+        self.restored_state = state
+
+    def stats(self) -> dict:
+        """
+        Zwraca czasy obsługi ticków dla każdego strumienia oraz opóźnienie harmonogramu.
+        """
+        return {
+            "lag_ms": round(1000 * self.lag, 3),
+            "streams": {name: timer.to_dict() for name, timer in self.timers.items()},
+        }
+
+    def _record(self, shard_configs: list[AssetConfig], timings) -> None:
+        for index, duration, failed in timings:
+            asset_config = shard_configs[index]
+            timer = self.timers[asset_config.name]
+            timer.record(duration)
+            metrics.tick_seconds.labels(asset_config.asset).observe(duration)
+            if failed:
+                timer.errors += 1
+                metrics.provider_errors_total.labels(asset_config.asset).inc()
+
+    def _schedule(self, tick) -> None:
+        """
+        Pętla harmonogramu: wywołuje tick() co interval sekund, bez kumulowania dryfu.
+        """
+        next_tick = self.clock.now()
+        last_report = time.monotonic()
+        while True:
+            tick()
+            next_tick += self.interval
+            now = self.clock.now()
+            self.lag = max(0.0, now - next_tick)
+            if self.lag > self.interval:
+                # Nie nadrabiamy zaległych ticków seriami – przesuwamy plan
+                next_tick = now
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                logging.info("Statystyki silnika: %s", self.stats())
+            self.clock.sleep(next_tick - self.clock.now())
+
+    def run(self) -> None:
+        """
+        Uruchamia silnik (blokuje wątek wywołujący).
+        """
+        logging.info("Uruchomienie silnika dla %d strumieni (%d proces(y) roboczy(e), interwał %.2fs).",
+                     len(self.asset_configs), self.workers, self.interval)
+        if self.workers == 1:
+            self._run_local()
+        else:
+            self._run_sharded()
+
+    def _run_local(self) -> None:
+        providers = [build_provider(asset_config, self.bus, self.clock, index)
+                     for index, asset_config in enumerate(self.asset_configs)]
+        streams = dict(zip(self.keys, providers))
+        if self.restored_state is not None:
+            restored = checkpoint.restore(streams, self.restored_state)
+            logging.info("Odtworzono stan %d z %d strumieni z punktu kontrolnego.", len(restored), len(streams))
+        recorder = attach_recorder(providers, self.recorded)
+        active = start_all(providers)
+        streams = {self.keys[index]: providers[index] for index in active}
+
+        def tick():
+            self._record(self.asset_configs, step_all(providers, active))
+            if self.checkpointer is not None:
+                self.checkpointer.maybe_capture(streams)
+
+        try:
+            self._schedule(tick)
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+    def _run_sharded(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        command_queues = []
+        for shard_index, indexes in enumerate(self.shards):
+            # Kolejka poleceń jest ograniczona: gdy proces roboczy nie nadąża, harmonogram czeka przy put().
+            # Z zegarem wirtualnym (sleep() wraca od razu) to jedyne, co wyznacza tempo – czas wirtualny
+            # biegnie w rytmie najwolniejszego procesu zamiast zalewać kolejki poleceniami ticka
+            commands = context.Queue(maxsize=SHARD_QUEUE_SIZE)
+            shard_configs = [self.asset_configs[i] for i in indexes]
+            shard_keys = [self.keys[i] for i in indexes]
+            state = (checkpoint.select(self.restored_state, shard_keys)
+                     if self.restored_state is not None else None)
+            process = context.Process(target=_shard_main, name=f"EngineShard-{shard_index}",
+                                      args=(shard_index, shard_configs, indexes, commands, results,
+                                            shard_keys, state, [i for i in indexes if i in self.recorded]),
+                                      daemon=True)
+            process.start()
+            command_queues.append(commands)
+
+        collector = threading.Thread(target=self._collect, args=(results,), name="EngineCollector", daemon=True)
+        collector.start()
+
+        def tick():
+            # Polecenie ticka niesie czas harmonogramu i prośbę o migawkę stanu
+            now = self.clock.now()
+            capture = self.checkpointer is not None and self.checkpointer.due()
+            for commands in command_queues:
+                commands.put((now, capture))
+
+        try:
+            self._schedule(tick)
+        finally:
+            for commands in command_queues:
+                commands.put(None)
+
+    def _collect(self, results) -> None:
+        """
+        Odbiera wyniki procesów roboczych: zapisuje czasy ticków, publikuje zdarzenia na szynie
+        i składa migawki wszystkich procesów w jeden punkt kontrolny.
+        """
+        while True:
+            shard_index, timings, events, state = results.get()
+            self._record([self.asset_configs[i] for i in self.shards[shard_index]], timings)
+            for topic, key, payload in events:
+                if topic == TOPIC_SIGNAL_NEW:
+                    self.remote_pending[(shard_index, key)] = payload
+                    self.bus.publish(TOPIC_SIGNAL_NEW, payload)
+                elif topic == SHARD_RESTORED:
+                    # Sygnał jest już w historii (id nadane w checkpoint.resolve_pending) – czeka tylko na wynik
+                    self.remote_pending[(shard_index, key)] = payload
+                else:
+                    signal = self.remote_pending.pop((shard_index, key), None)
+                    if signal is None:
+                        continue
+                    signal.result = payload
+                    self.bus.publish(TOPIC_SIGNAL_SETTLED, signal)
+            if state is not None:
+                # Strumienie są niezależne, więc części z różnych ticków tworzą poprawny punkt kontrolny –
+                # szybszy proces po prostu nadpisuje swoją starszą część
+                self.checkpoint_parts[shard_index] = state
+                if len(self.checkpoint_parts) == self.workers:
+                    self.checkpointer.publish(checkpoint.merge(list(self.checkpoint_parts.values())))
+                    self.checkpoint_parts = {}
@@ -0,0 +1,190 @@
+# event_bus.py – Wewnątrzprocesowa szyna zdarzeń (publish/subscribe) z ograniczonymi kolejkami
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+
+# Tematy zdarzeń publikowanych przez dostawców danych
+TOPIC_SIGNAL_NEW = "signal.new"
+TOPIC_SIGNAL_SETTLED = "signal.settled"
+# Tematy publikowane przez magazyn sygnałów po utrwaleniu (sygnał ma już nadane id)
+TOPIC_SIGNAL_STORED = "signal.stored"
+TOPIC_SIGNAL_UPDATED = "signal.updated"
+# Migawka stanu silnika do zapisania w punkcie kontrolnym (checkpoint.py)
+TOPIC_CHECKPOINT = "engine.checkpoint"
+
+# Polityki przeciążenia (co robić, gdy kolejka konsumenta jest pełna)
+BLOCK = "block"              # wydawca czeka na wolne miejsce
+DROP_OLDEST = "drop_oldest"  # najstarsze zdarzenie jest odrzucane
+COALESCE = "coalesce"        # zdarzenia o tym samym kluczu są scalane (zostaje najnowsze)
+SPILL = "spill"              # wydawca nigdy nie czeka; ponad maxsize kolejka rośnie dalej (bez utraty, overflowed)
+
+
+class Subscription:
+    """
+    Konsument szyny: własna ograniczona kolejka i własny wątek obsługi.
+    Zdarzenia z wielu tematów trafiają do jednej kolejki, więc ich kolejność jest zachowana.
+    """
+
+    def __init__(self, name: str, handlers: dict, maxsize: int, policy: str, key=None):
+        """
+        :param name: Nazwa konsumenta (widoczna w statystykach i w nazwie wątku).
+        :param handlers: Słownik {temat: funkcja(payload)}.
+        :param maxsize: Maksymalna liczba zdarzeń w kolejce.
+        :param policy: BLOCK, DROP_OLDEST, COALESCE lub SPILL.
+        :param key: Funkcja (topic, payload) -> klucz scalania dla COALESCE (domyślnie temat).
+        :param maxsize: Dla SPILL – próg alarmowy: zdarzenia ponad nim są liczone w overflowed.
+        """
+        if policy not in (BLOCK, DROP_OLDEST, COALESCE, SPILL):
+            raise ValueError(f"Nieznana polityka kolejki: {policy}")
+        self.name = name
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key or (lambda topic, payload: topic)
+        self.spilling = False
+        self.queue = OrderedDict() if policy == COALESCE else deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflowed = 0
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self._run, name=f"Bus-{name}", daemon=True)
+
+    def offer(self, topic: str, payload) -> None:
+        """
+        Wstawia zdarzenie do kolejki zgodnie z polityką przeciążenia.
+        """
+        event = (topic, payload, time.monotonic())
+        with self.cond:
+            if self.policy == COALESCE:
+                key = self.key(topic, payload)
+                if key in self.queue:
+                    del self.queue[key]
+                    self.coalesced += 1
+                elif len(self.queue) >= self.maxsize:
+                    self.queue.popitem(last=False)
+                    self.dropped += 1
+                self.queue[key] = event
+            else:
+                if self.policy == BLOCK:
+                    while len(self.queue) >= self.maxsize and not self.closed:
+                        self.cond.wait()
+                elif self.policy == SPILL:
+                    if len(self.queue) >= self.maxsize:
+                        self.overflowed += 1
+                        if not self.spilling:
+                            # Ostrzeżenie raz na epizod przepełnienia – dalej rośnie tylko licznik
+                            self.spilling = True
+                            logging.warning("Kolejka %s przekroczyła %d zdarzeń – konsument nie nadąża.",
+                                            self.name, self.maxsize)
+                elif len(self.queue) >= self.maxsize:
+                    self.queue.popleft()
+                    self.dropped += 1
+                    logging.warning("Kolejka %s pełna – odrzucono najstarsze zdarzenie (łącznie %d).",
+                                    self.name, self.dropped)
+                self.queue.append(event)
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.cond.notify_all()
+
+    def _next_event(self):
+        with self.cond:
+            while not self.queue and not self.closed:
+                self.cond.wait()
+            if not self.queue:
+                return None
+            if self.policy == COALESCE:
+                _, event = self.queue.popitem(last=False)
+            else:
+                event = self.queue.popleft()
+                if self.spilling and len(self.queue) < self.maxsize:
+                    self.spilling = False
+                    logging.info("Kolejka %s wróciła poniżej %d zdarzeń.", self.name, self.maxsize)
+            self.cond.notify_all()
+            return event
+
+    def _run(self) -> None:
+        while True:
+            event = self._next_event()
+            if event is None:
+                return
+            topic, payload, _ = event
+            try:
+                self.handlers[topic](payload)
+            except Exception as e:
+                logging.error("Błąd konsumenta %s dla zdarzenia %s: %s", self.name, topic, e, exc_info=True)
+            self.delivered += 1
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Zwraca bieżący stan kolejki konsumenta.
+        """
+        with self.cond:
+            depth = len(self.queue)
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "depth": depth,
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "overflowed": self.overflowed,
+        }
+
+
+class EventBus:
+    """
+    Szyna zdarzeń między dostawcami danych a konsumentami (Telegram, magazyn sygnałów, API web).
+    publish() nigdy nie wykonuje I/O – jedynie wstawia zdarzenie do kolejek konsumentów.
+    """
+
+    def __init__(self):
+        self.subscriptions: list[Subscription] = []
+        self.by_topic: dict[str, list[Subscription]] = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, name: str, handlers: dict, maxsize: int = 1000,
+                  policy: str = BLOCK, key=None) -> Subscription:
+        """
+        Rejestruje konsumenta i uruchamia jego wątek.
+        :return: Obiekt Subscription (np. do odczytu statystyk).
+        """
+        subscription = Subscription(name, handlers, maxsize, policy, key)
+        with self.lock:
+            self.subscriptions.append(subscription)
+            for topic in handlers:
+                # Kopia listy – publish() iteruje bez blokady
+                self.by_topic[topic] = self.by_topic.get(topic, []) + [subscription]
+        subscription.thread.start()
+        return subscription
+
+    def publish(self, topic: str, payload) -> None:
+        """
+        Publikuje zdarzenie do wszystkich konsumentów danego tematu.
+        """
+        for subscription in self.by_topic.get(topic, ()):
+            subscription.offer(topic, payload)
+
+    def stats(self) -> list[dict]:
+        """
+        Zwraca statystyki (m.in. głębokość kolejek) wszystkich konsumentów.
+        """
+        return [subscription.stats() for subscription in self.subscriptions]
+
+    def close(self) -> None:
+        for subscription in self.subscriptions:
+            subscription.close()
+
+
+# Globalna szyna zdarzeń aplikacji
+bus = EventBus()
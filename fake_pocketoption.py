@@ -0,0 +1,186 @@
+# fake_pocketoption.py – Atrapa API PocketOption: deterministyczne świece, zrywanie połączeń, historia do backfillu
+
+import random
+import logging
+import argparse
+
+import clock as clock_module
+
+
+class FakeMarket:
+    """
+    Wspólny „rynek” atrapy: seria świec wyznaczona przez ziarno i zegar.
+    Trwa dłużej niż pojedyncze połączenie, więc po ponownym połączeniu historia jest spójna.
+    """
+
+    def __init__(self, clock=None, period: int = 2, seed: int = 0, initial_price: float = 1.1,
+                 volatility: float = 0.0005, realtime_window: int = 3):
+        """
+        :param clock: Zegar wyznaczający, które świece już istnieją (domyślnie globalny).
+        :param period: Okres świecy w sekundach.
+        :param realtime_window: Ile ostatnich świec zwraca get_realtime_candles (jak bufor strumienia).
+        """
+        self.clock = clock if clock is not None else clock_module.clock
+        self.period = period
+        self.rng = random.Random(seed)
+        self.volatility = volatility
+        self.realtime_window = realtime_window
+        self.origin = int(self.clock.now() // period) * period
+        self.closes = [initial_price]  # cena zamknięcia świecy o indeksie i (czas origin + i × period)
+        self.fail_connects = 0  # ile kolejnych prób connect() ma się nie udać
+        self.generation = 0     # zwiększana przez drop() – unieważnia otwarte połączenia
+
+    def _extend(self, index: int) -> None:
+        while len(self.closes) <= index:
+            price = self.closes[-1] + self.rng.uniform(-self.volatility, self.volatility)
+            self.closes.append(round(max(price, 0.00001), 5))
+
+    def candle(self, index: int, forming: bool = False) -> dict:
+        self._extend(index)
+        close = self.closes[index]
+        open_price = self.closes[index - 1] if index > 0 else close
+        return {
+            "time": self.origin + index * self.period,
+            "open": open_price,
+            # Formująca się świeca ma jeszcze tymczasową cenę zamknięcia
+            "close": open_price if forming else close,
+        }
+
+    def current_index(self) -> int:
+        return int((self.clock.now() - self.origin) // self.period)
+
+    def closed_times(self, start: float, end: float) -> list[float]:
+        """
+        Czasy zamkniętych świec z przedziału (start, end) – do sprawdzania kompletności przetwarzania.
+        """
+        last_closed = self.current_index() - 1
+        return [self.origin + i * self.period for i in range(last_closed + 1)
+                if start < self.origin + i * self.period < end]
+
+    def drop(self) -> None:
+        """
+        Zrywa wszystkie otwarte połączenia.
+        """
+        self.generation += 1
+
+
+class FakePocketOption:
+    """
+    Połączenie z atrapą – ten sam interfejs, którego używa PocketOptionDataProvider.
+    """
+
+    def __init__(self, ssid: str, market: FakeMarket):
+        self.ssid = ssid
+        self.market = market
+        self.generation = None
+        self.streams = set()
+
+    def connect(self) -> tuple[bool, str]:
+        if self.market.fail_connects > 0:
+            self.market.fail_connects -= 1
+            return False, "fake: connection refused"
+        self.generation = self.market.generation
+        return True, "ok"
+
+    def _check(self) -> None:
+        if self.generation is None or self.generation != self.market.generation:
+            raise ConnectionError("fake: connection lost")
+
+    def change_balance(self, balance_type: str) -> None:
+        self._check()
+
+    def start_candles_stream(self, asset: str, period: int) -> None:
+        self._check()
+        self.streams.add(asset)
+
+    def get_realtime_candles(self, asset: str) -> list[dict]:
+        self._check()
+        if asset not in self.streams:
+            return []
+        current = self.market.current_index()
+        first = max(0, current - self.market.realtime_window + 1)
+        return [self.market.candle(i, forming=(i == current)) for i in range(first, current + 1)]
+
+    def get_candles(self, asset: str, period: int, end_time: float, count: int) -> list[dict]:
+        self._check()
+        current = self.market.current_index()
+        last = min(current, int((end_time - self.market.origin) // self.market.period))
+        first = max(0, last - count + 1)
+        return [self.market.candle(i, forming=(i == current)) for i in range(first, last + 1)]
+
+    def close(self) -> None:
+        self.generation = None
+
+
+_markets: dict[int, FakeMarket] = {}
+
+
+def shared_market(clock=None, seed: int = 0) -> FakeMarket:
+    """
+    Zwraca rynek współdzielony przez kolejne połączenia w procesie (POCKETOPTION_FAKE=True).
+    """
+    if seed not in _markets:
+        _markets[seed] = FakeMarket(clock, seed=seed)
+    return _markets[seed]
+
+
+def self_check(steps: int = 2000, drop_every: int = 97, seed: int = 1) -> None:
+    """
+    Sprawdzenie offline na zegarze wirtualnym: zrywa połączenie co drop_every odczytów
+    (czasem z odmową kilku kolejnych połączeń) i weryfikuje, że każda zamknięta świeca
+    została przetworzona dokładnie raz.
+    """
+    from data_provider import PocketOptionDataProvider
+    from strategy import Strategy
+    from money import MoneyManager
+
+    class _Bus:
+        def publish(self, topic, payload):
+            pass
+
+    from engine import step_all
+
+    class _Provider(PocketOptionDataProvider):
+        def process_candle(self, candle_time, price):
+            self.processed.append(candle_time)
+            return super().process_candle(candle_time, price)
+
+    # Pętla run() jednego aktywa (blokujące recover()) i harmonogram wielu strumieni (step_all z backoffem
+    # bez blokowania) – w obu przypadkach po zerwaniach każda świeca musi być przetworzona dokładnie raz
+    for scheduled in (False, True):
+        virtual_clock = clock_module.VirtualClock(1_700_000_000)
+        market = FakeMarket(virtual_clock, seed=seed)
+        provider = _Provider("EURUSD", Strategy(), MoneyManager(1.0), "fake", bus=_Bus(), clock=virtual_clock,
+                             api_factory=lambda ssid: FakePocketOption(ssid, market))
+        provider.processed = []
+        provider.rng.seed(seed)
+        assert provider.start()
+        rng = random.Random(seed)
+        for i in range(1, steps + 1):
+            if i % drop_every == 0:
+                market.drop()
+                market.fail_connects = rng.randrange(4)
+            if scheduled:
+                step_all([provider])
+            else:
+                try:
+                    provider.step()
+                except ConnectionError:
+                    provider.recover()
+            virtual_clock.sleep(provider.update_interval)
+
+        processed = provider.processed
+        expected = market.closed_times(processed[0] - market.period, processed[-1] + market.period)
+        assert processed == expected, "świece pominięte lub przetworzone wielokrotnie"
+        print(f"OK ({'step_all' if scheduled else 'run'}): {len(processed)} świec przetworzonych dokładnie raz, "
+              f"{steps // drop_every} zerwań połączenia.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sprawdzenie pobierania świec na atrapie PocketOption.")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--drop-every", type=int, default=97)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    self_check(args.steps, args.drop_every, args.seed)
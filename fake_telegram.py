@@ -0,0 +1,258 @@
+# fake_telegram.py - Локальный фейковый сервер Telegram Bot API для нагрузочных тестов без сети
+#   python fake_telegram.py --port 8081 --latency 0.05 --blocked 0.01
+#   TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py        # бот отправляет всё сюда
+# Имитирует задержку ответа, лимиты Telegram (ответ 429 с retry_after) и чаты, заблокировавшие бота (403).
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTelegram:
+    """
+    Состояние фейкового Bot API: лимиты, заблокированные чаты, счётчики и очередь обновлений для getUpdates.
+    Методы вызываются из потоков HTTP-сервера, поэтому всё общее состояние под одной блокировкой.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, global_rate: float = 30.0,
+                 per_chat_interval: float = 1.0, blocked_ratio: float = 0.0, seed: int = 0, on_message=None):
+        """
+        :param latency: Базовая задержка ответа в секундах.
+        :param jitter: Случайная добавка к задержке (равномерно от 0 до jitter).
+        :param global_rate: Сообщений в секунду на всего бота, сверх – 429 (0 = без лимита).
+        :param per_chat_interval: Минимальный интервал между сообщениями в один чат, чаще – 429 (0 = без лимита).
+        :param blocked_ratio: Доля чатов, «заблокировавших бота» – им sendMessage отвечает 403.
+        :param seed: Зерно выбора заблокированных чатов и задержек.
+        :param on_message: Необязательная функция (время monotonic, chat_id, текст) для каждого принятого сообщения.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.blocked_ratio = blocked_ratio
+        self.seed = seed
+        self.on_message = on_message
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = global_rate
+        self.refilled = time.monotonic()
+        self.chat_last_sent: dict[int, float] = {}
+        self.next_message_id = 1
+        self.counts = {"requests": 0, "sent": 0, "rate_limited": 0, "blocked": 0, "not_found": 0}
+        self.methods: dict[str, int] = {}
+        # Обновления для getUpdates (режим long polling)
+        self.updates: list[dict] = []
+        self.next_update_id = 1
+        self.updates_cond = threading.Condition(self.lock)
+
+    def is_blocked(self, chat_id: int) -> bool:
+        """
+        Заблокировал ли чат бота. Выбор детерминирован (зерно + chat_id), так что повтор даёт тот же ответ.
+        """
+        return self.blocked_ratio > 0 and random.Random(chat_id * 1_000_003 + self.seed).random() < self.blocked_ratio
+
+    def _delay(self) -> None:
+        if self.latency or self.jitter:
+            with self.lock:
+                extra = self.rng.uniform(0, self.jitter) if self.jitter else 0.0
+            time.sleep(self.latency + extra)
+
+    def _rate_limit(self, chat_id: int, now: float) -> float:
+        """
+        Проверяет лимиты и резервирует отправку. Вызывается под self.lock.
+        :return: 0, если отправка разрешена, иначе retry_after в секундах.
+        """
+        if self.per_chat_interval > 0:
+            last = self.chat_last_sent.get(chat_id)
+            if last is not None and now - last < self.per_chat_interval:
+                return self.per_chat_interval - (now - last)
+        if self.global_rate > 0:
+            self.tokens = min(self.global_rate, self.tokens + (now - self.refilled) * self.global_rate)
+            self.refilled = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.global_rate
+            self.tokens -= 1
+        self.chat_last_sent[chat_id] = now
+        return 0.0
+
+    def call(self, method: str, params: dict) -> tuple[int, dict]:
+        """
+        Выполняет метод Bot API.
+        :return: (HTTP-статус, JSON-ответ в формате Telegram).
+        """
+        with self.lock:
+            self.counts["requests"] += 1
+            self.methods[method] = self.methods.get(method, 0) + 1
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self.get_updates(int(params.get("offset") or 0),
+                                                              float(params.get("timeout") or 0))}
+        self._delay()
+        if method == "sendMessage":
+            return self.send_message(params)
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}}
+        if method in ("setWebhook", "deleteWebhook", "answerWebAppQuery"):
+            return 200, {"ok": True, "result": True}
+        with self.lock:
+            self.counts["not_found"] += 1
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+    def send_message(self, params: dict) -> tuple[int, dict]:
+        chat_id = int(params["chat_id"])
+        text = str(params.get("text", ""))
+        if self.is_blocked(chat_id):
+            with self.lock:
+                self.counts["blocked"] += 1
+            return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+        now = time.monotonic()
+        with self.lock:
+            retry_after = self._rate_limit(chat_id, now)
+            if retry_after:
+                self.counts["rate_limited"] += 1
+            else:
+                self.counts["sent"] += 1
+                message_id = self.next_message_id
+                self.next_message_id += 1
+        if retry_after:
+            # Telegram отдаёт целое число секунд
+            retry_after = max(1, math.ceil(retry_after))
+            return 429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                         "parameters": {"retry_after": retry_after}}
+        if self.on_message is not None:
+            self.on_message(now, chat_id, text)
+        return 200, {"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Fake"},
+            "text": text,
+        }}
+
+    def push_update(self, update: dict) -> int:
+        """
+        Добавляет обновление для getUpdates (update_id назначается, если не задан).
+        :return: update_id.
+        """
+        with self.updates_cond:
+            if "update_id" not in update:
+                update = dict(update, update_id=self.next_update_id)
+            self.next_update_id = max(self.next_update_id, update["update_id"] + 1)
+            self.updates.append(update)
+            self.updates_cond.notify_all()
+            return update["update_id"]
+
+    def get_updates(self, offset: int, timeout: float) -> list[dict]:
+        """
+        Long polling: обновления с update_id >= offset; при пустой очереди ждёт до timeout секунд.
+        Подтверждённые (update_id < offset) удаляются, как в Telegram.
+        """
+        deadline = time.monotonic() + timeout
+        with self.updates_cond:
+            while True:
+                self.updates = [update for update in self.updates if update["update_id"] >= offset]
+                remaining = deadline - time.monotonic()
+                if self.updates or remaining <= 0:
+                    return list(self.updates[:100])
+                self.updates_cond.wait(remaining)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts, methods=dict(self.methods))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive: telebot держит сессию requests на поток, без переподключения на каждое сообщение
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными write – без TCP_NODELAY Nagle + delayed ACK дают ~40 мс на ответ
+    disable_nagle_algorithm = True
+
+    def _handle(self) -> None:
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")
+        params = dict(parse_qsl(parts.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params.update(json.loads(body or b"{}"))
+            else:
+                params.update(parse_qsl(body.decode()))
+        if len(segments) != 2 or not segments[0].startswith("bot"):
+            status, payload = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        else:
+            try:
+                status, payload = self.server.telegram.call(segments[1], params)
+            except (KeyError, ValueError) as e:
+                status, payload = 400, {"ok": False, "error_code": 400, "description": f"Bad Request: {e}"}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTelegramServer:
+    """
+    HTTP-сервер фейкового Bot API в фоновом потоке.
+    Адрес для config.TELEGRAM_API_URL – свойство url.
+    """
+
+    def __init__(self, telegram: FakeTelegram = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param port: Порт (0 = любой свободный).
+        """
+        self.telegram = telegram if telegram is not None else FakeTelegram()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.telegram = self.telegram
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegramServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="FakeTelegram", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Фейковый сервер Telegram Bot API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="Базовая задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Случайная добавка к задержке, с")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="Лимит сообщений в секунду (0 = нет)")
+    parser.add_argument("--per-chat-interval", type=float, default=1.0, help="Интервал между сообщениями в чат, с")
+    parser.add_argument("--blocked", type=float, default=0.0, help="Доля чатов, заблокировавших бота")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    telegram = FakeTelegram(args.latency, args.jitter, args.global_rate, args.per_chat_interval, args.blocked, args.seed)
+    server = FakeTelegramServer(telegram, args.host, args.port)
+    print(f"Fake Bot API: {server.url} (TELEGRAM_API_URL={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(telegram.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
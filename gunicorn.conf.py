@@ -0,0 +1,19 @@
+# gunicorn.conf.py - Настройки воркеров Mini App и API при WEB_SERVER=none (gunicorn читает файл сам):
+#   WEB_SERVER=none python main.py        # движок и бот
+#   gunicorn wsgi:app                     # Mini App, API и SSE
+# Соединение SSE висит открытым всё время работы Mini App. В воркере gevent это гринлет, а не поток
+# из --threads, поэтому один воркер держит сотни потоков /api/stream и продолжает отвечать на /api/signals.
+
+import os
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", 4))
+worker_class = "gevent"
+# Одновременные соединения одного воркера (SSE и обычные запросы вместе)
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 1000))
+# Без preload: поток чтения истории (FeedReader) должен стартовать в каждом воркере
+preload_app = False
+
+# Лимит SSE на воркер – ниже worker_connections, часть соединений остаётся для API.
+# Переменная окружения наследуется воркерами и читается config.py
+os.environ.setdefault("SSE_WORKER_CLIENTS", str(max(1, worker_connections - int(os.getenv("WEB_API_CONNECTIONS", 100)))))
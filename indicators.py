@@ -0,0 +1,397 @@
+# indicators.py – Wskaźniki przyrostowe (SMA, EMA, RSI, Bollinger, ATR), wspólna pamięć per aktywo i wersje wsadowe
+
+import math
+import random
+import argparse
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny – wersje wsadowe działają wtedy na listach
+    np = None
+
+
+class SMA:
+    """
+    Prosta średnia krocząca: suma bieżąca okna, O(1) na aktualizację.
+    """
+    fields = ("close",)
+    __slots__ = ("period", "window", "total", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = None
+
+    def update(self, close: float) -> float | None:
+        self.window.append(close)
+        self.total += close
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA:
+    """
+    Wykładnicza średnia krocząca (alfa = 2 / (period + 1)), zainicjowana średnią z pierwszych period wartości.
+    """
+    fields = ("close",)
+    __slots__ = ("period", "alpha", "count", "seed", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.seed = 0.0
+        self.value = None
+
+    def update(self, close: float) -> float | None:
+        if self.value is not None:
+            self.value += self.alpha * (close - self.value)
+            return self.value
+        self.count += 1
+        self.seed += close
+        if self.count == self.period:
+            self.value = self.seed / self.period
+        return self.value
+
+
+class _Wilder:
+    """
+    Wygładzanie Wildera: średnia z pierwszych period wartości, potem (poprzednia × (period − 1) + x) / period.
+    """
+    __slots__ = ("period", "count", "seed", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.seed = 0.0
+        self.value = None
+
+    def update(self, x: float) -> float | None:
+        if self.value is not None:
+            self.value = (self.value * (self.period - 1) + x) / self.period
+            return self.value
+        self.count += 1
+        self.seed += x
+        if self.count == self.period:
+            self.value = self.seed / self.period
+        return self.value
+
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    if avg_loss == 0:
+        return 50.0 if avg_gain == 0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class RSI:
+    """
+    Wskaźnik siły względnej (Wilder), wartości 0–100.
+    """
+    fields = ("close",)
+    __slots__ = ("period", "previous", "gains", "losses", "value")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous = None
+        self.gains = _Wilder(period)
+        self.losses = _Wilder(period)
+        self.value = None
+
+    def update(self, close: float) -> float | None:
+        previous, self.previous = self.previous, close
+        if previous is None:
+            return None
+        change = close - previous
+        avg_gain = self.gains.update(change if change > 0 else 0.0)
+        avg_loss = self.losses.update(-change if change < 0 else 0.0)
+        if avg_gain is not None:
+            self.value = _rsi_value(avg_gain, avg_loss)
+        return self.value
+
+
+class Bollinger:
+    """
+    Wstęgi Bollingera: (dolna, środkowa, górna) = SMA ∓ k × odchylenie standardowe okna (populacyjne).
+    Średnia i suma kwadratów odchyleń są aktualizowane przesuwnym wariantem algorytmu Welforda –
+    wzór „średnia kwadratów − kwadrat średniej” traci precyzję przy cenach rzędu 1 i małej zmienności.
+    """
+    fields = ("close",)
+    __slots__ = ("period", "k", "window", "mean", "m2", "value")
+
+    def __init__(self, period: int = 20, k: float = 2.0):
+        self.period = period
+        self.k = k
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value = None
+
+    def update(self, close: float) -> tuple | None:
+        window = self.window
+        window.append(close)
+        if len(window) > self.period:
+            old = window.popleft()
+            mean = self.mean + (close - old) / self.period
+            self.m2 += (close - old) * (close - mean + old - self.mean)
+            self.mean = mean
+        else:
+            delta = close - self.mean
+            self.mean += delta / len(window)
+            self.m2 += delta * (close - self.mean)
+        if len(window) == self.period:
+            std = math.sqrt(max(self.m2 / self.period, 0.0))
+            self.value = (self.mean - self.k * std, self.mean, self.mean + self.k * std)
+        return self.value
+
+
+class ATR:
+    """
+    Średni rzeczywisty zakres (Wilder). Dla ticków high = low = close, więc TR = |zmiana ceny|.
+    """
+    fields = ("high", "low", "close")
+    __slots__ = ("period", "previous_close", "smooth", "value")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous_close = None
+        self.smooth = _Wilder(period)
+        self.value = None
+
+    def update(self, high: float, low: float, close: float) -> float | None:
+        previous_close, self.previous_close = self.previous_close, close
+        if previous_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - previous_close), abs(low - previous_close))
+        self.value = self.smooth.update(true_range)
+        return self.value
+
+
+INDICATORS = {"sma": SMA, "ema": EMA, "rsi": RSI, "bollinger": Bollinger, "atr": ATR}
+
+
+class SharedIndicator:
+    """
+    Wskaźnik związany z serią cen aktywa (series.AssetSeries) i interwałem.
+    Przy odczycie value() dobiera z pierścienia tylko wiersze, których jeszcze nie widział,
+    więc niezależnie od liczby strategii każdy tick/świeca jest przetwarzany raz.
+    """
+
+    def __init__(self, series, timeframe: int | None, indicator):
+        """
+        :param series: series.AssetSeries aktywa.
+        :param timeframe: Interwał świec w sekundach lub None (ticki).
+        :param indicator: Instancja SMA / EMA / RSI / Bollinger / ATR.
+        """
+        self.series = series
+        self.timeframe = timeframe
+        self.indicator = indicator
+        self.consumed = 0
+        if timeframe is None:
+            # Ticki mają tylko cenę – high, low i close to ta sama kolumna
+            self.columns = tuple("price" for _ in indicator.fields)
+        else:
+            self.columns = indicator.fields
+
+    def _source(self):
+        if self.timeframe is None:
+            return self.series.ticks, self.series.tick_count, self.series.tick_capacity
+        bars = self.series.bars[self.timeframe]
+        return bars.ring, bars.closed, bars.capacity
+
+    def value(self):
+        """
+        Bieżąca wartość wskaźnika (None, dopóki brak danych do rozgrzania).
+        """
+        ring, end, capacity = self._source()
+        if end != self.consumed:
+            # Wiersze starsze niż pojemność pierścienia zostały nadpisane – zaczynamy od najstarszego dostępnego
+            count = min(end - self.consumed, capacity)
+            update = self.indicator.update
+            columns = [ring.window(column, count, end).tolist() for column in self.columns]
+            for row in zip(*columns):
+                update(*row)
+            self.consumed = end
+        return self.indicator.value
+
+    @property
+    def revision(self) -> int:
+        """
+        Liczba wierszy (ticków lub zamkniętych świec) uwzględnionych w wartości.
+        """
+        return self.consumed
+
+
+def shared(series, name: str, *params, timeframe: int = None) -> SharedIndicator:
+    """
+    Zwraca wspólny wskaźnik dla (aktywo, interwał, nazwa, parametry), tworząc go przy pierwszym użyciu.
+    Wszystkie strategie pytające o ten sam klucz dostają ten sam obiekt.
+    :param name: "sma", "ema", "rsi", "bollinger" lub "atr".
+    """
+    key = (timeframe, name, params)
+    indicator = series.indicators.get(key)
+    if indicator is None:
+        indicator = series.indicators.setdefault(key, SharedIndicator(series, timeframe, INDICATORS[name](*params)))
+    return indicator
+
+
+# --- Wersje wsadowe (odtwarzanie historii, backtesty) ---
+# Wynik ma długość wejścia, a pozycje przed rozgrzaniem wskaźnika to NaN.
+# Wyniki są bit w bit równe wersjom przyrostowym (inaczej backtest nie odtworzy sygnałów na żywo).
+# SMA i Bollinger są wektorowe: ich rekurencje to sumy bieżące, a np.cumsum dodaje sekwencyjnie,
+# w tej samej kolejności co update(). EMA, RSI i ATR liczymy jednym przebiegiem pętli.
+
+def _array(values):
+    return np.asarray(values, dtype=float) if np is not None else [float(v) for v in values]
+
+
+def _empty(length: int):
+    return np.full(length, np.nan) if np is not None else [math.nan] * length
+
+
+def _run(indicator, *columns):
+    out = _empty(len(columns[0]))
+    update = indicator.update
+    for i, row in enumerate(zip(*columns)):
+        value = update(*row)
+        if value is not None:
+            out[i] = value
+    return out
+
+
+def _window_sums(values, period: int):
+    """
+    Sumy okien dokładnie jak SMA.total: najpierw += nowa cena, potem −= najstarsza.
+    Kroki przeplatamy w jednym ciągu, więc jedno np.cumsum odtwarza każdą pośrednią sumę.
+    """
+    count = len(values)
+    steps = np.empty(2 * count - period)
+    steps[:period] = values[:period]
+    steps[period::2] = values[period:]
+    steps[period + 1::2] = -values[:count - period]
+    cumulative = np.cumsum(steps)
+    return np.concatenate((cumulative[period - 1:period], cumulative[period + 1::2]))
+
+
+def sma(values, period: int):
+    values = _array(values)
+    if np is None or len(values) < period:
+        return _run(SMA(period), values)
+    out = _empty(len(values))
+    out[period - 1:] = _window_sums(values, period) / period
+    return out
+
+
+def ema(values, period: int):
+    values = _array(values)
+    return _run(EMA(period), values.tolist() if np is not None else values)
+
+
+def rsi(values, period: int = 14):
+    values = _array(values)
+    return _run(RSI(period), values.tolist() if np is not None else values)
+
+
+def bollinger(values, period: int = 20, k: float = 2.0):
+    """
+    :return: (dolna, środkowa, górna) – trzy tablice długości wejścia.
+    """
+    values = _array(values)
+    if np is None or len(values) < period:
+        return _run_bands(values, period, k)
+    # Rozgrzanie (pierwsze period cen) tą samą pętlą co Bollinger.update, dalej przesuwny Welford:
+    # przyrosty średniej i m2 zależą tylko od cen i średnich, a same sumy liczy sekwencyjne np.cumsum
+    warm = Bollinger(period, k)
+    for close in values[:period].tolist():
+        warm.update(close)
+    new, old = values[period:], values[:-period]
+    change = new - old
+    running_mean = np.cumsum(np.concatenate(([warm.mean], change / period)))
+    running_m2 = np.cumsum(np.concatenate(([warm.m2], change * (new - running_mean[1:] + old - running_mean[:-1]))))
+    mean = _empty(len(values))
+    std = _empty(len(values))
+    mean[period - 1:] = running_mean
+    std[period - 1:] = np.sqrt(np.maximum(running_m2 / period, 0.0))
+    return mean - k * std, mean, mean + k * std
+
+
+def _run_bands(values, period: int, k: float):
+    indicator = Bollinger(period, k)
+    lower, middle, upper = _empty(len(values)), _empty(len(values)), _empty(len(values))
+    for i, close in enumerate(values):
+        bands = indicator.update(float(close))
+        if bands is not None:
+            lower[i], middle[i], upper[i] = bands
+    return lower, middle, upper
+
+
+def atr(high, low, close, period: int = 14):
+    columns = [_array(column) for column in (high, low, close)]
+    if np is not None:
+        columns = [column.tolist() for column in columns]
+    return _run(ATR(period), *columns)
+
+
+def self_check(count: int = 20_000, seed: int = 1) -> None:
+    """
+    Porównuje wersje przyrostowe (przez SharedIndicator na serii cen) z wsadowymi – wartości muszą być
+    identyczne – oraz sygnały każdej strategii z strategy.make_strategy: check_signals() na całej serii
+    wobec check_signal() cena po cenie na nowej instancji.
+    """
+    from series import AssetSeries
+    from strategy import STRATEGIES, make_strategy
+
+    rng = random.Random(seed)
+    prices = []
+    price = 1.1
+    for _ in range(count):
+        price = round(max(price + rng.uniform(-0.0005, 0.0005), 0.00001), 5)
+        prices.append(price)
+    asset_series = AssetSeries("CHECK", timeframes=(), tick_capacity=64)
+    checks = {
+        "sma": (shared(asset_series, "sma", 20), sma(prices, 20)),
+        "ema": (shared(asset_series, "ema", 20), ema(prices, 20)),
+        "rsi": (shared(asset_series, "rsi", 14), rsi(prices, 14)),
+        "atr": (shared(asset_series, "atr", 14), atr(prices, prices, prices, 14)),
+        "bollinger": (shared(asset_series, "bollinger", 20, 2.0), bollinger(prices, 20, 2.0)[2]),
+    }
+    assert shared(asset_series, "sma", 20) is checks["sma"][0]
+    worst = {name: 0.0 for name in checks}
+    for i, price in enumerate(prices):
+        asset_series.on_tick(i + 1, price)
+        if i % 7:
+            continue  # odczyt co kilka ticków – wskaźnik nadrabia zaległe wiersze
+        for name, (indicator, expected) in checks.items():
+            value = indicator.value()
+            if name == "bollinger" and value is not None:
+                value = value[2]
+            if value is None:
+                assert math.isnan(expected[i]), (name, i)
+            else:
+                worst[name] = max(worst[name], abs(value - expected[i]))
+    for name, error in worst.items():
+        assert error == 0.0, (name, error)
+
+    variants = [(name, {}) for name in STRATEGIES] + [("ma_cross", {"kind": "sma"})]
+    signals = 0
+    for name, params in variants:
+        expected = make_strategy(name, **params).check_signals(prices)
+        live = make_strategy(name, **params)
+        for i, price in enumerate(prices):
+            assert live.check_signal(price) == expected[i], (name, params, i)
+        signals += sum(signal is not None for signal in expected)
+    print("OK: " + ", ".join(f"{name} max |Δ| = {error:.1e}" for name, error in worst.items())
+          + f"; sygnały {len(variants)} strategii zgodne ({signals} sygnałów)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zgodność wskaźników przyrostowych i wsadowych.")
+    parser.add_argument("--count", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    self_check(args.count, args.seed)
@@ -0,0 +1,195 @@
+# live_feed.py – Трансляция событий (новые сигналы и расчёты) клиентам через Server-Sent Events
+
+import re
+import queue
+import logging
+import argparse
+import threading
+from collections import deque
+
+import config
+from models import Signal
+
+
+class LiveFeed:
+    """
+    Широковещатель SSE на уровне процесса: каждое событие кодируется один раз,
+    а готовый кадр кладётся в очередь каждого открытого соединения.
+    Последние события хранятся в буфере для возобновления по Last-Event-ID.
+    """
+
+    def __init__(self, backlog: int = 500, client_queue: int = 100, max_clients: int = 1000):
+        """
+        :param backlog: Сколько последних событий хранить для возобновления.
+        :param client_queue: Размер очереди одного клиента; медленный клиент отключается
+                             и переподключается с Last-Event-ID.
+        :param max_clients: Максимум одновременных соединений.
+        """
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.backlog: deque[tuple[int, bytes]] = deque(maxlen=backlog)
+        self.client_queue = client_queue
+        self.max_clients = max_clients
+        self.clients: dict[queue.Queue, bool] = {}
+
+    def publish(self, event: str, data: bytes) -> None:
+        """
+        Рассылает событие всем подключённым клиентам.
+        :param event: Тип события SSE (например "signal" или "settled").
+        :param data: Данные события (JSON в байтах).
+        """
+        with self.lock:
+            self.seq += 1
+            frame = b"id: %d\nevent: %s\ndata: %s\n\n" % (self.seq, event.encode(), data)
+            self.backlog.append((self.seq, frame))
+            overflowed = []
+            for client in self.clients:
+                try:
+                    client.put_nowait(frame)
+                except queue.Full:
+                    overflowed.append(client)
+            for client in overflowed:
+                # Клиент не успевает читать – закрываем поток, он переподключится с Last-Event-ID
+                self.clients[client] = True
+
+    def publish_signal(self, signal: Signal) -> None:
+        """Потребитель шины событий: новый сигнал."""
+        self.publish("signal", signal.to_json())
+
+    def publish_settlement(self, signal: Signal) -> None:
+        """Потребитель шины событий: сигнал рассчитан (WIN/LOSS)."""
+        self.publish("settled", signal.to_json())
+
+    def connect(self, last_event_id: int = None):
+        """
+        Регистрирует клиента. Возвращает (очередь, кадры для повторной отправки)
+        или None, если достигнут лимит соединений.
+        """
+        with self.lock:
+            if len(self.clients) >= self.max_clients:
+                return None
+            client = queue.Queue(maxsize=self.client_queue)
+            replay = []
+            if last_event_id is not None:
+                if (self.backlog and last_event_id < self.backlog[0][0] - 1) or last_event_id > self.seq:
+                    # Пропущенные события уже вытеснены из буфера (или идентификатор выдан другим
+                    # воркером gunicorn) – клиенту нужно перечитать данные
+                    replay.append(b"event: reset\ndata: {}\n\n")
+                replay.extend(frame for seq, frame in self.backlog if seq > last_event_id)
+            self.clients[client] = False
+            return client, replay
+
+    def disconnect(self, client: queue.Queue) -> None:
+        with self.lock:
+            self.clients.pop(client, None)
+
+    def stream(self, client: queue.Queue, replay: list[bytes], heartbeat: float = 15.0):
+        """
+        Генератор кадров SSE для одного соединения (с периодическими heartbeat-комментариями).
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            for frame in replay:
+                yield frame
+            while True:
+                try:
+                    yield client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield b": ping\n\n"
+                if self.clients.get(client) and client.empty():
+                    logging.info("Closing slow SSE client (queue overflow).")
+                    return
+        finally:
+            self.disconnect(client)
+
+    def client_count(self) -> int:
+        with self.lock:
+            return len(self.clients)
+
+
+# Широковещатель процесса веб-сервера
+feed = LiveFeed(
+    backlog=config.SSE_BACKLOG,
+    client_queue=config.SSE_CLIENT_QUEUE,
+    max_clients=config.SSE_MAX_CLIENTS
+)
+
+
+def _frame_ids(frames) -> list:
+    """
+    Идентификаторы кадров SSE по порядку ("reset" – для кадра сброса, служебные кадры пропускаются).
+    """
+    ids = []
+    for frame in frames:
+        match = re.match(rb"id: (\d+)\n", frame)
+        if match:
+            ids.append(int(match.group(1)))
+        elif frame.startswith(b"event: reset"):
+            ids.append("reset")
+    return ids
+
+
+def self_check(backlog: int = 5) -> None:
+    """
+    Проверка возобновления по Last-Event-ID: повтор только пропущенных событий, кадр reset, когда
+    они вытеснены из буфера (или идентификатор выдан другим воркером), отключение медленного клиента
+    и лимит соединений; затем то же через /api/stream с заголовком Last-Event-ID.
+    """
+    test_feed = LiveFeed(backlog=backlog, client_queue=3, max_clients=2)
+    for i in range(3):
+        test_feed.publish("signal", b'{"id":%d}' % i)
+
+    # Клиент читал до события 1 – получает 2 и 3, без сброса
+    client, replay = test_feed.connect(1)
+    assert _frame_ids(replay) == [2, 3], _frame_ids(replay)
+    stream = test_feed.stream(client, replay, heartbeat=0.01)
+    received = _frame_ids(next(stream) for _ in range(3))
+    assert received == [2, 3], received
+    last_id = received[-1]
+    assert test_feed.connect(None) is not None and test_feed.connect(None) is None, "лимит соединений"
+
+    # Клиент не читает – очередь переполнена, поток отдаёт накопленное и закрывается
+    for i in range(3, 10):  # события 4–10; в буфере остаются 6–10
+        test_feed.publish("settled", b'{"id":%d}' % i)
+    tail = list(stream)
+    assert _frame_ids(tail) == [4, 5, 6], _frame_ids(tail)
+    last_id = _frame_ids(tail)[-1]
+    assert client not in test_feed.clients, "медленный клиент не отключён"
+
+    # Переподключение с последним полученным id: события 7–10 ещё в буфере – повтор без сброса
+    client, replay = test_feed.connect(last_id)
+    assert _frame_ids(replay) == [7, 8, 9, 10], _frame_ids(replay)
+    test_feed.disconnect(client)
+    # Пропущенные события вытеснены из буфера – сначала reset, затем всё, что осталось
+    client, replay = test_feed.connect(2)
+    assert _frame_ids(replay) == ["reset", 6, 7, 8, 9, 10], _frame_ids(replay)
+    test_feed.disconnect(client)
+    # Идентификатор из другого процесса (больше текущего) – только reset
+    client, replay = test_feed.connect(10_000)
+    assert _frame_ids(replay) == ["reset"], _frame_ids(replay)
+    test_feed.disconnect(client)
+
+    # То же через HTTP: /api/stream с Last-Event-ID после вытеснения
+    import app_server
+
+    original, app_server.feed = app_server.feed, test_feed
+    try:
+        test_feed.clients.clear()
+        response = app_server.app.test_client().get("/api/stream", headers={"Last-Event-ID": "2"})
+        chunks = iter(response.response)
+        frames = [next(chunks) for _ in range(1 + 1 + 5)]  # retry, reset, 5 кадров буфера
+        response.close()
+    finally:
+        app_server.feed = original
+    assert frames[0].startswith(b"retry:") and _frame_ids(frames[1:]) == ["reset", 6, 7, 8, 9, 10], frames
+    assert not test_feed.clients, "соединение не освобождено после закрытия"
+    print("OK: Last-Event-ID – повтор пропущенных событий, reset после вытеснения, медленный клиент "
+          "отключён, /api/stream возобновляет поток.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка возобновления SSE по Last-Event-ID.")
+    parser.add_argument("--backlog", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    self_check(args.backlog)
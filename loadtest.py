@@ -0,0 +1,536 @@
+# loadtest.py – Test obciążeniowy end-to-end: syntetyczni subskrybenci, lokalny fake Bot API, sygnały i klienci HTTP
+#   python loadtest.py                                           # 100k subskrybentów, limity jak w Telegramie
+#   python loadtest.py --subscribers 20000 --rate-limit 0 --per-chat-interval 0 --broadcast-rate 5000 \
+#                      --signal-rate 2 --duration 20            # przepustowość samego potoku, bez limitów Telegrama
+#   python loadtest.py --start-burst 2000 --clients 300 --output loadtests/latest.json
+# telebot wysyła wszystko do fake_telegram.FakeTelegramServer (opóźnienia, 429, „bot was blocked”),
+# a klienci Mini App odpytują app_server uruchomiony w tym samym procesie.
+
+import os
+import re
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows – zostaje tylko RSS z /proc (też niedostępny)
+    resource = None
+
+from fake_telegram import FakeTelegram, FakeTelegramServer
+
+DEFAULT_ASSETS = ("EURUSD", "GBPUSD", "USDJPY", "AUDUSD")
+AMOUNT_PATTERN = re.compile(r"Amount: \$(\d+)\.")
+START_CHAT_BASE = 2_000_000_000  # czaty z /start nie nakładają się na syntetycznych subskrybentów
+
+
+def rss_bytes() -> int:
+    """
+    Bieżący RSS procesu (Linux: /proc/self/statm), a w razie braku – szczytowy RSS z getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    # Linux podaje ru_maxrss w KiB, macOS w bajtach
+    scale = 1 if platform.system() == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentiles(values: list[float]) -> dict:
+    """
+    Percentyle (metoda najbliższej rangi) w milisekundach.
+    """
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "count": len(values),
+        "p50_ms": round(1e3 * pick(0.50), 2),
+        "p95_ms": round(1e3 * pick(0.95), 2),
+        "p99_ms": round(1e3 * pick(0.99), 2),
+        "max_ms": round(1e3 * values[-1], 2),
+    }
+
+
+def write_subscribers(path: str, count: int, filtered: float, assets, seed: int) -> int:
+    """
+    Zapisuje dziennik subskrybentów w formacie po kompakcji (subscriber_store): "<id>" albo
+    "filter <id> <aktywa> <kierunek>" dla części filtered subskrybentów.
+    :return: Liczba subskrybentów z filtrem.
+    """
+    rng = random.Random(seed)
+    with_filter = 0
+    lines = []
+    for chat_id in range(1_000_000, 1_000_000 + count):
+        if rng.random() < filtered:
+            chosen = ",".join(sorted(rng.sample(assets, rng.randint(1, len(assets)))))
+            lines.append(f"filter {chat_id} {chosen} {rng.choice(('CALL', 'PUT', '*'))}\n")
+            with_filter += 1
+        else:
+            lines.append(f"{chat_id}\n")
+    with open(path, "w") as f:
+        f.writelines(lines)
+    return with_filter
+
+
+class LogCounter(logging.Handler):
+    """
+    Liczy ostrzeżenia i błędy według szablonu komunikatu – przy limitach Telegrama są ich setki,
+    więc pełne logi (ze śladami stosu) wypisujemy tylko z --verbose.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts: dict[str, int] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        key = f"{record.levelname} {str(record.msg).splitlines()[0] if record.msg else ''}"
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class Deliveries:
+    """
+    Odbiornik wiadomości przyjętych przez fake Bot API (wywoływany z wątków serwera).
+    Sygnał rozpoznaje po kwocie – harness nadaje kwotę równą numerowi sygnału.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.welcome: dict[int, float] = {}
+        self.created: dict[int, float] = {}
+        self.expected: dict[int, int] = {}
+        self.received: dict[int, int] = {}
+        self.latencies: list[float] = []
+        self.last_arrival: dict[int, float] = {}
+        self.first_arrival = None
+        self.final_arrival = None
+
+    def __call__(self, now: float, chat_id: int, text: str) -> None:
+        match = AMOUNT_PATTERN.search(text)
+        with self.lock:
+            if match is None:
+                if text.startswith("Welcome"):
+                    self.welcome.setdefault(chat_id, now)
+                return
+            seq = int(match.group(1))
+            created = self.created.get(seq)
+            if created is None:
+                return
+            self.latencies.append(now - created)
+            self.last_arrival[seq] = now
+            self.received[seq] = self.received.get(seq, 0) + 1
+            if self.first_arrival is None:
+                self.first_arrival = now
+            self.final_arrival = now
+
+    @property
+    def delivered(self) -> int:
+        with self.lock:
+            return len(self.latencies)
+
+
+def run_start_burst(args, telegram: FakeTelegram, deliveries: Deliveries, webhook_url: str) -> dict:
+    """
+    Faza 1: lawina /start od nowych czatów – przez /telegram/webhook (z ponowieniem po 503, jak robi Telegram)
+    albo przez getUpdates w trybie polling. Mierzy czas od wysłania aktualizacji do powitania w fake API.
+    """
+    import config
+    import webhook_replay
+
+    count = args.start_burst
+    if not count:
+        return {}
+    sent_at: dict[int, float] = {}
+    http_latencies = []
+    statuses: dict[int, int] = {}
+    lock = threading.Lock()
+    pending = list(range(count))
+
+    def make_update(index: int) -> dict:
+        update = webhook_replay.sample_updates(START_CHAT_BASE + index)[0]
+        update["update_id"] = index + 1
+        return update
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index = pending.pop()
+            update = make_update(index)
+            chat_id = START_CHAT_BASE + index
+            sent_at[chat_id] = time.monotonic()
+            while True:
+                started = time.perf_counter()
+                status = webhook_replay.post(webhook_url, config.WEBHOOK_SECRET, update)
+                with lock:
+                    http_latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+                if status != 503:
+                    break
+                time.sleep(0.05)
+
+    started = time.monotonic()
+    if args.mode == "webhook":
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.start_concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for index in range(count):
+            sent_at[START_CHAT_BASE + index] = time.monotonic()
+            telegram.push_update(make_update(index))
+    accepted = time.monotonic() - started
+
+    # Czaty, które „zablokowały bota”, powitania nie dostaną (fake API odpowiada im 403)
+    expected = sum(not telegram.is_blocked(chat_id) for chat_id in sent_at)
+    deadline = time.monotonic() + args.drain_timeout
+    while len(deliveries.welcome) < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with deliveries.lock:
+        welcome = [deliveries.welcome[chat_id] - sent_at[chat_id] for chat_id in deliveries.welcome
+                   if chat_id in sent_at]
+    report = {
+        "updates": count,
+        "expected_welcomes": expected,
+        "accepted_seconds": round(accepted, 3),
+        "welcomed": len(welcome),
+        "welcome_latency": percentiles(welcome),
+    }
+    if args.mode == "webhook":
+        report["http_status"] = {str(status): n for status, n in sorted(statuses.items())}
+        report["http_latency"] = percentiles(http_latencies)
+    return report
+
+
+class PollingClients:
+    """
+    Faza 2 (równolegle z sygnałami): klienci Mini App odpytujący app_server z If-None-Match,
+    każdy z własną sesją HTTP keep-alive.
+    """
+
+    def __init__(self, base_url: str, clients: int, paths: list[str], interval: float, seed: int):
+        self.base_url = base_url
+        self.paths = paths
+        self.interval = interval
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.statuses: dict[int, int] = {}
+        self.errors = 0
+        self.rng = random.Random(seed)
+        self.threads = [threading.Thread(target=self._run, args=(self.rng.random(),), daemon=True)
+                        for _ in range(clients)]
+        self.started = None
+        self.elapsed = 0.0
+
+    def _run(self, phase: float) -> None:
+        import requests
+
+        session = requests.Session()
+        etags: dict[str, str] = {}
+        # Rozkładamy pierwsze zapytania w czasie, żeby nie mierzyć sztucznej lawiny na starcie
+        if self.stop.wait(phase * self.interval):
+            return
+        while not self.stop.is_set():
+            for path in self.paths:
+                headers = {"If-None-Match": etags[path]} if path in etags else {}
+                started = time.perf_counter()
+                try:
+                    response = session.get(self.base_url + path, headers=headers, timeout=30)
+                except requests.RequestException:
+                    with self.lock:
+                        self.errors += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                if response.headers.get("ETag"):
+                    etags[path] = response.headers["ETag"]
+                with self.lock:
+                    self.latencies.append(elapsed)
+                    self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+            if self.interval:
+                self.stop.wait(self.interval)
+        session.close()
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        for thread in self.threads:
+            thread.start()
+
+    def finish(self) -> dict:
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+        self.elapsed = time.monotonic() - self.started
+        return {
+            "clients": len(self.threads),
+            "requests": len(self.latencies),
+            "requests_per_second": round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0.0,
+            "status": {str(status): n for status, n in sorted(self.statuses.items())},
+            "errors": self.errors,
+            "latency": percentiles(self.latencies),
+        }
+
+
+def run_signals(args, telegram: FakeTelegram, deliveries: Deliveries, base_url: str) -> dict:
+    """
+    Faza 2: sygnały publikowane na szynę ze stałą częstotliwością, równolegle z klientami HTTP.
+    Po zakończeniu publikacji czeka, aż rozsyłka ucichnie (lub minie drain_timeout).
+    """
+    import bot
+    from models import Signal
+    from event_bus import bus, TOPIC_SIGNAL_NEW
+
+    rng = random.Random(args.seed)
+    clients = PollingClients(base_url, args.clients, args.paths, args.poll_interval, args.seed)
+    clients.start()
+    # Zablokowanych liczymy raz z góry: z indeksu znikają dopiero po pierwszej rozsyłce z 403,
+    # więc sygnały opublikowane wcześniej wciąż ich obejmują
+    blocked = {chat_id for chat_id in bot.subscribers.snapshot() if telegram.is_blocked(chat_id)}
+    expected = 0
+    published = 0
+    interval = 1.0 / args.signal_rate
+    started = time.monotonic()
+    next_at = started
+    while next_at < started + args.duration:
+        time.sleep(max(0.0, next_at - time.monotonic()))
+        published += 1
+        asset = rng.choice(args.assets)
+        direction = rng.choice(("CALL", "PUT"))
+        recipients = bot.subscribers.recipients(asset, direction)
+        reachable = len(recipients) - len(blocked.intersection(recipients))
+        expected += reachable
+        now = time.monotonic()
+        with deliveries.lock:
+            deliveries.created[published] = now
+            deliveries.expected[published] = reachable
+        bus.publish(TOPIC_SIGNAL_NEW, Signal(ts=time.time(), asset=asset, direction=direction,
+                                             amount=float(published), entry_price=1.1, created=now))
+        next_at += interval
+    publish_seconds = time.monotonic() - started
+
+    # Rozsyłka skończona, gdy kolejka konsumenta „telegram” jest pusta, a liczniki fake API stoją przez settle sekund
+    deadline = time.monotonic() + args.drain_timeout
+    quiet_since, last_requests = time.monotonic(), -1
+    while time.monotonic() < deadline:
+        requests_seen = telegram.snapshot()["requests"]
+        depth = next(s["depth"] for s in bus.stats() if s["name"] == "telegram")
+        if requests_seen != last_requests or depth:
+            quiet_since, last_requests = time.monotonic(), requests_seen
+        elif time.monotonic() - quiet_since >= args.settle:
+            break
+        time.sleep(0.1)
+    http = clients.finish()
+
+    delivered = deliveries.delivered
+    with deliveries.lock:
+        span = (deliveries.final_arrival - started) if deliveries.final_arrival else 0.0
+        # Czas rozsyłki liczymy tylko dla sygnałów dostarczonych wszystkim osiągalnym odbiorcom
+        completion = [deliveries.last_arrival[seq] - deliveries.created[seq] for seq in deliveries.last_arrival
+                      if deliveries.received[seq] >= deliveries.expected[seq]]
+        latencies = list(deliveries.latencies)
+    telegram_stats = next(s for s in bus.stats() if s["name"] == "telegram")
+    return {
+        "signals": {
+            "published": published,
+            "publish_seconds": round(publish_seconds, 3),
+            "expected_messages": expected,
+            "delivered_messages": delivered,
+            "undelivered_messages": max(0, expected - delivered),
+            "throughput_per_second": round(delivered / span, 1) if span else 0.0,
+            "delivery_latency": percentiles(latencies),
+            "completed_signals": len(completion),
+            "signal_completion": percentiles(completion),
+            "bus_dropped": telegram_stats["dropped"],
+            "bus_max_depth": telegram_stats["max_depth"],
+            "subscribers_left": len(bot.subscribers),
+        },
+        "http": http,
+    }
+
+
+def format_report(report: dict) -> str:
+    def latency(stats: dict) -> str:
+        if not stats.get("count"):
+            return "-"
+        return f"p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms, max {stats['max_ms']} ms"
+
+    lines = []
+    start = report.get("start")
+    if start:
+        lines.append(f"/start: {start['welcomed']}/{start['expected_welcomes']} powitań, przyjęte w {start['accepted_seconds']} s")
+        lines.append(f"  powitanie: {latency(start['welcome_latency'])}")
+        if "http_status" in start:
+            lines.append(f"  webhook HTTP {start['http_status']}: {latency(start['http_latency'])}")
+    signals = report["signals"]
+    lines.append(f"Sygnały: {signals['published']} opublikowanych, wiadomości {signals['delivered_messages']}"
+                 f"/{signals['expected_messages']} (niedostarczone: {signals['undelivered_messages']}, "
+                 f"odrzucone przez szynę sygnały: {signals['bus_dropped']})")
+    lines.append(f"  przepustowość: {signals['throughput_per_second']} wiad./s")
+    lines.append(f"  opóźnienie wiadomości: {latency(signals['delivery_latency'])}")
+    lines.append(f"  rozsyłka całego sygnału ({signals['completed_signals']}/{signals['published']} kompletnych): "
+                 f"{latency(signals['signal_completion'])}")
+    telegram = report["telegram"]
+    lines.append(f"Fake Bot API: {telegram['requests']} zapytań, 429: {telegram['rate_limited']}, "
+                 f"403 (zablokowani): {telegram['blocked']}; subskrybentów zostało {signals['subscribers_left']}")
+    http = report["http"]
+    lines.append(f"HTTP: {http['clients']} klientów, {http['requests']} zapytań ({http['requests_per_second']}/s), "
+                 f"statusy {http['status']}, błędy {http['errors']}")
+    lines.append(f"  opóźnienie: {latency(http['latency'])}")
+    for message, count in sorted(report["log"].items(), key=lambda item: -item[1]):
+        lines.append(f"Log ×{count}: {message}")
+    memory = report["memory"]
+    lines.append("Pamięć RSS: " + ", ".join(f"{name} {value / 2 ** 20:.1f} MiB" for name, value in memory.items()))
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test obciążeniowy end-to-end z lokalnym fake Bot API.")
+    parser.add_argument("--subscribers", type=int, default=100_000, help="Liczba syntetycznych subskrybentów")
+    parser.add_argument("--filtered", type=float, default=0.2, help="Odsetek subskrybentów z filtrem aktywów/kierunku")
+    parser.add_argument("--assets", nargs="+", default=list(DEFAULT_ASSETS))
+    parser.add_argument("--mode", choices=("webhook", "polling"), default="webhook", help="Odbiór aktualizacji bota")
+    parser.add_argument("--start-burst", type=int, default=500, help="Liczba /start od nowych czatów (0 = pomiń)")
+    parser.add_argument("--start-concurrency", type=int, default=32, help="Równoległe POST-y na webhook")
+    parser.add_argument("--signal-rate", type=float, default=0.2, help="Sygnałów na sekundę")
+    parser.add_argument("--duration", type=float, default=30.0, help="Czas publikowania sygnałów, s")
+    parser.add_argument("--clients", type=int, default=200, help="Równolegli klienci HTTP Mini App")
+    parser.add_argument("--paths", nargs="+", default=["/api/signals?limit=20", "/api/stats"],
+                        help="Ścieżki odpytywane przez każdego klienta")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Odstęp między odpytaniami klienta, s")
+    parser.add_argument("--latency", type=float, default=0.03, help="Bazowe opóźnienie fake API, s")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Losowa część opóźnienia fake API, s")
+    parser.add_argument("--rate-limit", type=float, default=30.0, help="Globalny limit fake API, wiad./s (0 = brak)")
+    parser.add_argument("--per-chat-interval", type=float, default=1.0, help="Limit na czat w fake API, s (0 = brak)")
+    parser.add_argument("--blocked", type=float, default=0.01, help="Odsetek czatów, które zablokowały bota")
+    parser.add_argument("--broadcast-rate", type=float, default=None,
+                        help="BROADCAST_GLOBAL_RATE bota (domyślnie z konfiguracji)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Maksymalne czekanie na dokończenie rozsyłki, s")
+    parser.add_argument("--settle", type=float, default=2.0, help="Cisza w fake API oznaczająca koniec rozsyłki, s")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Zapisz raport JSON do pliku")
+    parser.add_argument("--verbose", action="store_true", help="Wypisuj logi aplikacji zamiast samych liczników")
+    parser.add_argument("--keep", action="store_true", help="Nie usuwaj katalogu roboczego (dziennik, SQLite)")
+    args = parser.parse_args()
+
+    memory = {"baseline": rss_bytes()}
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    deliveries = Deliveries()
+    telegram = FakeTelegram(args.latency, args.jitter, args.rate_limit, args.per_chat_interval,
+                            args.blocked, args.seed, on_message=deliveries)
+    fake = FakeTelegramServer(telegram).start()
+    subscribers_file = os.path.join(workdir, "subscribers.txt")
+    with_filter = write_subscribers(subscribers_file, args.subscribers, args.filtered, args.assets, args.seed)
+
+    # config jest czytany przy imporcie – środowisko testu ustawiamy przed importem modułów aplikacji,
+    # nie dotykając produkcyjnego dziennika subskrybentów, historii sygnałów ani snapshotu silnika
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "123456:LOADTEST",
+        "TELEGRAM_API_URL": fake.url,
+        "TELEGRAM_MODE": args.mode,
+        "WEBHOOK_SECRET": "loadtest",
+        "SUBSCRIBERS_FILE": subscribers_file,
+        "SIGNALS_DB": os.path.join(workdir, "signals.db"),
+        "CHECKPOINT_FILE": "",
+        "TICK_ARCHIVE_DIR": "",
+    })
+    if args.broadcast_rate is not None:
+        os.environ["BROADCAST_GLOBAL_RATE"] = str(args.broadcast_rate)
+    if args.verbose:
+        logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    log_counter = LogCounter()
+    logging.getLogger().addHandler(log_counter)
+    logging.getLogger().setLevel(logging.WARNING)
+    # Serwer deweloperski werkzeug loguje każde zapytanie na poziomie INFO
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    import config
+    import bot
+    import signal_store
+    import app_server
+    from stats import stats
+    from event_bus import bus, TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED, SPILL, DROP_OLDEST
+    from werkzeug.serving import make_server
+
+    memory["subscribers_loaded"] = rss_bytes()
+    print(f"Subskrybenci: {len(bot.subscribers)} ({with_filter} z filtrem), fake Bot API: {fake.url}, "
+          f"katalog roboczy: {workdir}")
+
+    # Ci sami konsumenci szyny co w main.py
+    bus.subscribe("signal-store", {TOPIC_SIGNAL_NEW: signal_store.store_signal,
+                                   TOPIC_SIGNAL_SETTLED: signal_store.store_settlement},
+                  maxsize=config.SIGNAL_STORE_QUEUE_SIZE, policy=SPILL)
+    bus.subscribe("telegram", {TOPIC_SIGNAL_NEW: bot.notify_signal},
+                  maxsize=config.BUS_QUEUE_SIZE, policy=DROP_OLDEST)
+    signal_store.load_recent()
+    stats.load(signal_store.history.iter_all())
+    app_server.subscribe_consumers()
+
+    server = make_server("127.0.0.1", 0, app_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="LoadtestWeb", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    if args.mode == "polling":
+        threading.Thread(target=bot.bot.infinity_polling, kwargs={"long_polling_timeout": 5},
+                         name="TelegramBotThread", daemon=True).start()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+    }
+    try:
+        print(f"Faza 1: {args.start_burst} × /start ({args.mode})...", flush=True)
+        report["start"] = run_start_burst(args, telegram, deliveries, base_url + "/telegram/webhook")
+        memory["after_start"] = rss_bytes()
+        print(f"Faza 2: sygnały {args.signal_rate}/s przez {args.duration} s, {args.clients} klientów HTTP...",
+              flush=True)
+        report.update(run_signals(args, telegram, deliveries, base_url))
+        memory["after_signals"] = rss_bytes()
+        memory["peak"] = peak_rss_bytes()
+        memory["growth"] = memory["after_signals"] - memory["subscribers_loaded"]
+        report["memory"] = memory
+        report["telegram"] = telegram.snapshot()
+        report["bus"] = bus.stats()
+        report["log"] = dict(log_counter.counts)
+    finally:
+        # Rozsyłka niedokończona w drain_timeout jest porzucana: wynik jest już policzony,
+        # a błędy wysyłek przerwanych zamknięciem fake API zaśmiecałyby raport
+        logging.disable(logging.CRITICAL)
+        bot.broadcaster.executor.shutdown(wait=False, cancel_futures=True)
+        server.shutdown()
+        bus.close()
+        fake.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_report(report))
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Raport zapisany w {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
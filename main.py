@@ -1,50 +1,120 @@
 # main.py - Точка входа: запускает бота, провайдера данных и веб-сервер
 
+import atexit
 import threading
 import logging
 
 import config
+import metrics
 from strategy import Strategy
 from money import MoneyManager
-from data_provider import DummyDataProvider, PocketOptionDataProvider
+from data_provider import DummyDataProvider, PocketOptionDataProvider, ReplayDataProvider
+from engine import MultiAssetEngine, load_asset_configs
+import checkpoint
+import tick_archive
 import bot
+import signal_store
 import app_server
+from stats import stats
+from event_bus import bus, TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED, SPILL, DROP_OLDEST
 
 if __name__ == "__main__":
     # Настройка логирования для всего приложения
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
-    # Инициализируем стратегию и менеджер денег
-    strategy = Strategy(window_size=5)
-    money_manager = MoneyManager(
-        base_amount=config.BASE_AMOUNT,
-        use_martingale=config.USE_MARTINGALE
-    )
+    # Контрольные точки состояния движка: снимок в треде тика, запись на диск в потребителе шины
+    checkpointer = checkpoint.Checkpointer() if config.CHECKPOINT_FILE else None
 
-    # Выбираем провайдера данных в зависимости от конфигурации
-    if config.USE_REAL_DATA:
-        provider = PocketOptionDataProvider(
-            config.ASSET,
-            strategy,
-            money_manager,
-            config.POCKETOPTION_SSID,
-            use_demo=config.USE_DEMO_BALANCE
+    if config.ASSETS_FILE:
+        # Много активов и наборов параметров – один планировщик и пул процессов
+        provider = MultiAssetEngine(
+            load_asset_configs(config.ASSETS_FILE),
+            workers=config.ENGINE_WORKERS,
+            checkpointer=checkpointer
         )
     else:
-        provider = DummyDataProvider(
-            config.ASSET,
-            strategy,
-            money_manager
+        # Инициализируем стратегию и менеджер денег
+        strategy = Strategy(window_size=5)
+        money_manager = MoneyManager(
+            base_amount=config.BASE_AMOUNT,
+            use_martingale=config.USE_MARTINGALE
         )
 
-    # Запускаем Telegram-бота в отдельном треде
-    bot_thread = threading.Thread(
-        target=bot.bot.infinity_polling,
-        name="TelegramBotThread",
-        daemon=True
-    )
-    bot_thread.start()
-    logging.info("Telegram bot polling started.")
+        # Выбираем провайдера данных в зависимости от конфигурации
+        if config.REPLAY_DIR:
+            # Воспроизведение записанного архива тиков через тот же конвейер
+            provider = ReplayDataProvider(
+                config.ASSET,
+                strategy,
+                money_manager,
+                tick_archive.TickArchive(config.REPLAY_DIR),
+                start=config.REPLAY_START,
+                end=config.REPLAY_END
+            )
+        elif config.USE_REAL_DATA:
+            provider = PocketOptionDataProvider(
+                config.ASSET,
+                strategy,
+                money_manager,
+                config.POCKETOPTION_SSID,
+                use_demo=config.USE_DEMO_BALANCE
+            )
+        else:
+            provider = DummyDataProvider(
+                config.ASSET,
+                strategy,
+                money_manager
+            )
+        provider.checkpointer = checkpointer
+        if config.TICK_ARCHIVE_DIR and not config.REPLAY_DIR:
+            # Каждый тик пишется в архив; буферы сбрасываются раз в TICK_FLUSH_INTERVAL и при выходе
+            provider.recorder = tick_archive.TickRecorder()
+            atexit.register(provider.recorder.flush)
+
+    if checkpointer is not None:
+        checkpointer.subscribe()
+        state = checkpointer.load()
+        if state is not None:
+            # Сверяем открытые сделки с историей до загрузки буфера сигналов: id, результаты после снимка
+            pending = checkpoint.resolve_pending(state, signal_store.history)
+            if isinstance(provider, MultiAssetEngine):
+                provider.restore(state)
+            else:
+                checkpoint.restore({provider.asset: provider}, state)
+            logging.info("Engine state restored from %s (%d pending trades).", config.CHECKPOINT_FILE, pending)
+
+    # Подписываем потребителей на шину событий: хранилище сигналов не теряет событий,
+    # а медленная рассылка в Telegram отбрасывает самые старые сигналы.
+    # Запись в SQLite не должна останавливать цикл тиков: publish() в очередь хранилища никогда не ждёт,
+    # а сверх SIGNAL_STORE_QUEUE_SIZE события копятся дальше и учитываются в overflowed (метрика для алерта)
+    bus.subscribe("signal-store", {TOPIC_SIGNAL_NEW: signal_store.store_signal,
+                                   TOPIC_SIGNAL_SETTLED: signal_store.store_settlement},
+                  maxsize=config.SIGNAL_STORE_QUEUE_SIZE, policy=SPILL)
+    bus.subscribe("telegram", {TOPIC_SIGNAL_NEW: bot.notify_signal},
+                  maxsize=config.BUS_QUEUE_SIZE, policy=DROP_OLDEST)
+    serve_web = config.WEB_SERVER == "builtin"
+    if serve_web:
+        # Буфер, статистика и SSE нужны только встроенному веб-серверу;
+        # при WEB_SERVER=none их ведёт каждый воркер gunicorn (wsgi.py)
+        signal_store.load_recent()
+        stats.load(signal_store.history.iter_all())
+        app_server.subscribe_consumers()
+
+    if config.TELEGRAM_MODE == "webhook":
+        # Обновления приходят на /telegram/webhook (встроенный сервер или воркеры gunicorn)
+        bot.set_webhook()
+        logging.info("Telegram webhook registered: %s", config.WEBHOOK_URL)
+    else:
+        # Long polling не работает, пока зарегистрирован webhook
+        bot.bot.remove_webhook()
+        # Запускаем Telegram-бота в отдельном треде
+        bot_thread = threading.Thread(
+            target=bot.bot.infinity_polling,
+            name="TelegramBotThread",
+            daemon=True
+        )
+        bot_thread.start()
+        logging.info("Telegram bot polling started.")
 
     # Запускаем провайдера данных в отдельном треде
     data_thread = threading.Thread(
@@ -55,6 +125,16 @@ if __name__ == "__main__":
     data_thread.start()
     logging.info("Data provider started.")
 
-    # Запускаем Flask-сервер (этот вызов блокирует главный тред)
-    logging.info("Starting Flask web server for Telegram Web App...")
-    app_server.app.run(host="0.0.0.0", port=5000)
+    if serve_web:
+        # Запускаем Flask-сервер (этот вызов блокирует главный тред)
+        logging.info("Starting Flask web server for Telegram Web App...")
+        app_server.app.run(host="0.0.0.0", port=5000, threaded=True)
+    else:
+        # Веб-часть обслуживают воркеры gunicorn (wsgi.py), читающие сигналы из общей истории SQLite.
+        # Метрики движка и бота есть только в этом процессе – отдаём их отдельным маленьким сервером
+        if config.METRICS_PORT:
+            metrics.serve(config.METRICS_HOST, config.METRICS_PORT)
+            logging.info("Metrics endpoint: http://%s:%d/metrics", config.METRICS_HOST, config.METRICS_PORT)
+        logging.info("Web server disabled (WEB_SERVER=%s); serve the Mini App with gunicorn wsgi:app.",
+                     config.WEB_SERVER)
+        data_thread.join()
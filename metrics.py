@@ -0,0 +1,371 @@
+# metrics.py – Lekka instrumentacja: liczniki, wskaźniki i histogramy o stałych kubełkach (format Prometheus)
+
+import time
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Kubełki czasów (sekundy): od pół milisekundy do kilkudziesięciu sekund
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Kubełki dla blokad: czasy oczekiwania i trzymania są zwykle rzędu mikrosekund
+LOCK_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 1.0)
+# Czas trzymania blokady jest mierzony przy co N-tym przejęciu
+LOCK_HOLD_SAMPLE_EVERY = 16
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Rodzina metryk o wspólnej nazwie; każda kombinacja etykiet to osobne „dziecko”.
+    Zapis kosztuje jedną krótką blokadę – cała praca formatowania odbywa się dopiero przy odczycie /metrics.
+    """
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), collect=None):
+        """
+        :param collect: Opcjonalna funkcja zwracająca [(wartości etykiet, wartość)] przy każdym odczycie –
+                        dla zbiorów etykiet znanych dopiero w trakcie działania (np. konsumenci szyny).
+        """
+        self.name = name
+        self.collect = collect
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: dict[tuple, object] = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._new_child()
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Zwraca metrykę dla podanych wartości etykiet (warto ją zapamiętać poza gorącą pętlą).
+        """
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: oczekiwano etykiet {self.labelnames}")
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self.children[()]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.collect is not None:
+            try:
+                for values, value in self.collect():
+                    lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+            except Exception:
+                pass
+            return lines
+        for values, child in list(self.children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """
+    Licznik monotoniczny (np. liczba wysłanych wiadomości, ponownych połączeń).
+    Z collect – odczyt licznika prowadzonego gdzie indziej (np. odrzucone zdarzenia szyny).
+    """
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "func")
+
+    def __init__(self):
+        self.value = 0.0
+        self.func = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, func) -> None:
+        """
+        Wartość liczona dopiero przy odczycie /metrics – zero kosztu między odczytami.
+        """
+        self.func = func
+
+    def samples(self, name, labelnames, values):
+        value = self.value
+        if self.func is not None:
+            try:
+                value = self.func()
+            except Exception:
+                return []
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """
+    Wskaźnik bieżącej wartości (np. głębokość kolejki, liczba klientów SSE).
+    """
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def set_function(self, func) -> None:
+        self._default().set_function(func)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # ostatni kubełek to +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """
+        Menedżer kontekstu mierzący czas bloku: with histogram.time(): ...
+        """
+        return _Timer(self)
+
+    def samples(self, name, labelnames, values):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """
+    Histogram o stałych kubełkach: observe() to wyszukiwanie binarne i jedna inkrementacja.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    """
+    Zbiór metryk procesu renderowany w formacie tekstowym Prometheus (0.0.4).
+    """
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self.lock:
+            if any(existing.name == metric.name for existing in self.metrics):
+                raise ValueError(f"Metryka {metric.name} jest już zarejestrowana")
+            self.metrics.append(metric)
+
+    def render(self) -> bytes:
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+class InstrumentedLock:
+    """
+    Zamiennik threading.Lock mierzący czas oczekiwania na blokadę i czas jej trzymania.
+    Niezablokowane przejęcie kosztuje jedną próbę acquire(False) i inkrementację licznika pod samą blokadą;
+    czas trzymania jest próbkowany (co sample_every przejęcie), więc gorąca blokada nie płaci za histogram
+    przy każdym zwolnieniu. Czekanie (rzadkie i i tak kosztowne) jest mierzone zawsze.
+    """
+
+    def __init__(self, name: str, lock=None, sample_every: int = LOCK_HOLD_SAMPLE_EVERY):
+        """
+        :param name: Nazwa blokady (etykieta lock w metrykach).
+        :param lock: Opakowywana blokada (domyślnie nowa threading.Lock).
+        :param sample_every: Co które przejęcie mierzyć czas trzymania.
+        """
+        self.lock = lock if lock is not None else threading.Lock()
+        self.wait = lock_wait_seconds.labels(name)
+        self.hold = lock_hold_seconds.labels(name)
+        self.contended = lock_contended_total.labels(name)
+        self.sample_every = sample_every
+        self.acquisitions = 0
+        self.acquired_at = 0.0
+
+    def _acquired(self) -> None:
+        # Wywoływane pod blokadą – licznik nie potrzebuje własnej synchronizacji
+        self.acquisitions += 1
+        self.acquired_at = time.perf_counter() if self.acquisitions % self.sample_every == 0 else 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self.lock.acquire(False):
+            self._acquired()
+            return True
+        if not blocking:
+            return False
+        started = time.perf_counter()
+        if not self.lock.acquire(True, timeout):
+            return False
+        waited = time.perf_counter() - started
+        self._acquired()
+        self.contended.inc()
+        self.wait.observe(waited)
+        return True
+
+    def release(self) -> None:
+        acquired_at = self.acquired_at
+        if not acquired_at:
+            self.lock.release()
+            return
+        held = time.perf_counter() - acquired_at
+        self.lock.release()
+        self.hold.observe(held)
+
+    def locked(self) -> bool:
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Osobny endpoint /metrics w wątku tła – dla procesu bez serwera WWW (WEB_SERVER=none),
+    którego metryki (ticki, rozsyłka, Telegram, blokady) nie są widoczne w workerach gunicorna.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
+
+
+# Globalny rejestr metryk procesu
+registry = Registry()
+
+# Blokady
+lock_wait_seconds = Histogram("signalbot_lock_wait_seconds", "Czas oczekiwania na zajętą blokadę.",
+                              ("lock",), buckets=LOCK_BUCKETS)
+lock_hold_seconds = Histogram("signalbot_lock_hold_seconds", "Czas trzymania blokady (próbkowany).",
+                              ("lock",), buckets=LOCK_BUCKETS)
+lock_contended_total = Counter("signalbot_lock_contended_total", "Liczba przejęć blokady, na którą trzeba było czekać.",
+                               ("lock",))
+
+# Dostawcy danych
+tick_seconds = Histogram("signalbot_tick_seconds", "Czas obsługi jednego ticka dostawcy danych.", ("asset",))
+provider_errors_total = Counter("signalbot_provider_errors_total", "Błędy w pętli dostawcy danych.", ("asset",))
+provider_reconnects_total = Counter("signalbot_provider_reconnects_total",
+                                    "Ponowne połączenia z PocketOption.", ("asset", "status"))
+
+# Telegram
+delivery_seconds = Histogram("signalbot_signal_delivery_seconds",
+                             "Czas od utworzenia sygnału do zakończenia jego rozsyłki w Telegramie.")
+broadcast_seconds = Histogram("signalbot_broadcast_seconds", "Czas trwania jednej rozsyłki sygnału.")
+telegram_messages_total = Counter("signalbot_telegram_messages_total", "Wiadomości sygnałów wg wyniku wysyłki.",
+                                  ("status",))
+telegram_retries_total = Counter("signalbot_telegram_retries_total", "Ponowienia wysyłki (429 / błędy sieci).")
+
+# HTTP
+http_request_seconds = Histogram("signalbot_http_request_seconds", "Czas obsługi żądania HTTP.", ("endpoint",))
+http_requests_total = Counter("signalbot_http_requests_total", "Żądania HTTP wg endpointu i statusu.",
+                              ("endpoint", "status"))
@@ -1,26 +1,131 @@
 # models.py – Definicje struktur danych dla sygnałów
 
-from dataclasses import dataclass
-from threading import Lock
+import sys
+import json
+import time
+from enum import Enum
+from collections import deque
+
+import config
+from metrics import InstrumentedLock
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Direction(str, Enum):
+    """
+    Kierunek transakcji. Członkowie są współdzielonymi obiektami i porównują się równo z napisami
+    ("CALL" == Direction.CALL), więc strategie, filtry API i baza dalej operują na napisach.
+    """
+    CALL = "CALL"  # kupno
+    PUT = "PUT"    # sprzedaż
+
+    __str__ = str.__str__
+
+
+class Result(str, Enum):
+    """
+    Wynik rozliczonej transakcji (None – jeszcze nierozliczona).
+    """
+    WIN = "WIN"
+    LOSS = "LOSS"
+
+    __str__ = str.__str__
+
+
+def format_time(ts: float) -> str:
+    """
+    Czas epoki jako "YYYY-MM-DD HH:MM:SS" (czas lokalny) – format historii SQLite i statystyk.
+    """
+    return time.strftime(TIME_FORMAT, time.localtime(ts))
+
+
+def parse_time(text: str) -> float:
+    """
+    Odwrotność format_time (dla wierszy historii zapisanych bez kolumny ts).
+    """
+    return time.mktime(time.strptime(text, TIME_FORMAT))
+
 
-@dataclass
 class Signal:
     """
-    Klasa reprezentująca pojedynczy sygnał handlowy.
-    :param time: Czas utworzenia sygnału (format "YYYY-MM-DD HH:MM:SS").
-    :param asset: Symbol aktywa, np. "EURUSD".
-    :param direction: Kierunek transakcji – "CALL" (kupno) lub "PUT" (sprzedaż).
+    Klasa reprezentująca pojedynczy sygnał handlowy (ze __slots__ – bez słownika na instancję).
+    :param ts: Czas utworzenia sygnału (epoka, sekundy).
+    :param asset: Symbol aktywa, np. "EURUSD" (internowany – wszystkie sygnały aktywa dzielą jeden napis).
+    :param direction: Kierunek transakcji – Direction.CALL (kupno) lub Direction.PUT (sprzedaż); przyjmuje też napis.
     :param amount: Kwota transakcji w USD.
     :param entry_price: Cena wejścia w momencie generacji sygnału.
-    :param result: Wynik transakcji – "WIN", "LOSS" lub None, jeżeli jeszcze nie rozliczony.
-    """
-    time: str
-    asset: str
-    direction: str
-    amount: float
-    entry_price: float
-    result: str = None
-
-# Globalna lista sygnałów oraz blokada dla bezpiecznego dostępu wątków
-signals: list[Signal] = []
-signals_lock = Lock()
+    :param result: Wynik transakcji – Result.WIN, Result.LOSS lub None, jeżeli jeszcze nie rozliczony.
+    :param id: Identyfikator nadawany raz, przy zapisie do historii (None przed zapisem); nigdy nie jest
+               używany ponownie (AUTOINCREMENT), więc pozostaje stały także w innych procesach i po restarcie.
+    :param created: time.monotonic() w chwili utworzenia – do pomiaru opóźnienia dostarczenia (nie jest zapisywany).
+    """
+    __slots__ = ("ts", "asset", "direction", "amount", "entry_price", "_result", "id", "created", "_json")
+
+    def __init__(self, ts: float, asset: str, direction, amount: float, entry_price: float,
+                 result=None, id: int = None, created: float = None):
+        self.ts = ts
+        self.asset = sys.intern(asset)
+        self.direction = Direction(direction)
+        self.amount = amount
+        self.entry_price = entry_price
+        self._result = Result(result) if result is not None else None
+        self.id = id
+        self.created = created
+        # Pamięć podręczna JSON: (id, wynik, bytes) – ważna, dopóki id i wynik się nie zmienią
+        self._json = None
+
+    @property
+    def result(self):
+        return self._result
+
+    @result.setter
+    def result(self, value) -> None:
+        # Napisy "WIN" / "LOSS" są zamieniane na wspólne obiekty Result
+        self._result = Result(value) if value is not None else None
+
+    @property
+    def time(self) -> str:
+        """
+        Czas sygnału w formacie "YYYY-MM-DD HH:MM:SS" (czas lokalny).
+        """
+        return format_time(self.ts)
+
+    def to_json(self) -> bytes:
+        """
+        JSON sygnału (format odpowiedzi /api/signals i zdarzeń SSE), kodowany raz na zmianę id lub wyniku.
+        Klucz pamięci podręcznej zawiera wynik, więc rozliczenie w innym wątku nie zostawi nieaktualnego JSON.
+        """
+        cached = self._json
+        signal_id, result = self.id, self._result
+        if cached is not None and cached[0] == signal_id and cached[1] is result:
+            return cached[2]
+        data = json.dumps({
+            "id": signal_id,
+            "time": format_time(self.ts),
+            "ts": self.ts,
+            "asset": self.asset,
+            "direction": self.direction.value,
+            "amount": self.amount,
+            "entry_price": self.entry_price,
+            "result": result.value if result is not None else None
+        }, separators=(",", ":")).encode()
+        self._json = (signal_id, result, data)
+        return data
+
+    def __reduce__(self):
+        # Przesyłanie między procesami (silnik wieloprocesowy, copy.copy) – bez pamięci podręcznej JSON
+        return Signal, (self.ts, self.asset, self.direction, self.amount, self.entry_price,
+                        self._result, self.id, self.created)
+
+    def __repr__(self) -> str:
+        return (f"Signal(time={self.time!r}, asset={self.asset!r}, direction={str(self.direction)!r}, "
+                f"amount={self.amount!r}, entry_price={self.entry_price!r}, "
+                f"result={self.result and str(self.result)!r}, id={self.id!r})")
+
+
+# Bufor ostatnich sygnałów (o stałym rozmiarze) oraz blokada dla bezpiecznego dostępu wątków
+# (mierzona: czas oczekiwania i trzymania trafia do /metrics).
+# Starsze sygnały są dostępne w historii SQLite (signal_store.history).
+signals: deque[Signal] = deque(maxlen=config.SIGNALS_BUFFER_SIZE)
+signals_lock = InstrumentedLock("signals")
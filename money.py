@@ -40,3 +40,12 @@ class MoneyManager:
         elif result.upper() == "LOSS":
             # Przegrana i Martingale włączony – podwajamy stawkę
             self.current_amount *= 2
+
+    def checkpoint(self) -> dict:
+        """
+        Stan do punktu kontrolnego (bieżący krok Martingale).
+        """
+        return {"current_amount": self.current_amount}
+
+    def restore(self, state: dict) -> None:
+        self.current_amount = state["current_amount"]
@@ -0,0 +1,284 @@
+# series.py – Wspólna historia cen aktywów: ticki i świece OHLC wielu interwałów w buforach pierścieniowych
+
+import copy
+import threading
+from array import array
+
+import config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny – bez niego okna są obiektami memoryview
+    np = None
+
+
+def _view(column: array, start: int, stop: int):
+    """
+    Widok (bez kopiowania) fragmentu kolumny: tablica NumPy tylko do odczytu albo memoryview.
+    """
+    window = memoryview(column)[start:stop]
+    if np is None:
+        return window.toreadonly()
+    view = np.frombuffer(window, dtype=np.float64)
+    view.flags.writeable = False
+    return view
+
+
+class _Ring:
+    """
+    Kolumny float64 (array("d")) o podwójnej długości: wiersz r jest zapisywany w polach
+    r % capacity oraz r % capacity + capacity, dzięki czemu ostatnie n wierszy (n <= capacity)
+    zawsze leży w ciągłym fragmencie pamięci i okno jest zwykłym wycinkiem.
+    """
+    __slots__ = ("capacity", "columns")
+
+    def __init__(self, names: tuple, capacity: int):
+        self.capacity = capacity
+        self.columns = {name: array("d", bytes(16 * capacity)) for name in names}
+
+    def window(self, name: str, n: int, end: int):
+        """
+        Wiersze [end - n, end) kolumny name jako widok.
+        """
+        stop = (end - 1) % self.capacity + self.capacity + 1
+        return _view(self.columns[name], stop - n, stop)
+
+    def rows(self, end: int, count: int) -> dict[str, bytes]:
+        """
+        Kopia wierszy [end - n, end) wszystkich kolumn (n = min(count, capacity)) – do punktu kontrolnego.
+        """
+        n = min(count, end, self.capacity)
+        return {name: bytes(memoryview(self.window(name, n, end))) if n else b"" for name in self.columns}
+
+    def load(self, rows: dict[str, bytes], end: int) -> None:
+        """
+        Odtwarza wiersze zapisane przez rows() w obu połówkach pierścienia.
+        """
+        capacity = self.capacity
+        stop = (end - 1) % capacity + capacity + 1
+        for name, data in rows.items():
+            values = array("d", data)
+            if not values:
+                continue
+            column = self.columns[name]
+            start = stop - len(values)
+            column[start:stop] = values
+            # Lustrzana kopia: pozycje poniżej capacity w górnej połówce, pozostałe w dolnej
+            low_end = min(stop, capacity)
+            if start < low_end:
+                column[start + capacity:low_end + capacity] = column[start:low_end]
+            high_start = max(start, capacity)
+            column[high_start - capacity:stop - capacity] = column[high_start:stop]
+
+
+class Bars:
+    """
+    Świece OHLC jednego interwału. Formująca się świeca jest zapisywana w pierścieniu na bieżąco,
+    więc okno może ją obejmować bez kopiowania. Interwały bez ticków nie tworzą pustych świec.
+    """
+
+    def __init__(self, seconds: int, capacity: int):
+        """
+        :param seconds: Długość świecy w sekundach (np. 60 = 1m).
+        :param capacity: Ile ostatnich zamkniętych świec przechowywać.
+        """
+        self.seconds = seconds
+        self.capacity = capacity
+        # Dodatkowe miejsce na formującą się świecę
+        self.ring = _Ring(("time", "open", "high", "low", "close", "ticks"), capacity + 1)
+        cols = self.ring.columns
+        self._time, self._open, self._high, self._low, self._close, self._ticks = (
+            cols["time"], cols["open"], cols["high"], cols["low"], cols["close"], cols["ticks"])
+        self.closed = 0    # liczba zamkniętych świec od startu
+        self.start = None  # czas początku formującej się świecy
+        self.slot = 0      # pozycja formującej się świecy w górnej połowie pierścienia
+        self.high = self.low = 0.0
+        self.ticks = 0
+
+    def update(self, ts: float, price: float) -> bool:
+        """
+        Dopisuje tick do formującej się świecy.
+        Formująca się świeca jest zapisywana tylko w górnej połowie pierścienia (tam czytają ją okna);
+        kopia w dolnej połowie powstaje raz, przy zamknięciu.
+        :return: True, jeśli tick rozpoczął nową świecę (poprzednia została zamknięta).
+        """
+        bucket = ts - ts % self.seconds
+        if bucket == self.start:
+            j = self.slot
+            if price > self.high:
+                self.high = self._high[j] = price
+            elif price < self.low:
+                self.low = self._low[j] = price
+            self._close[j] = price
+            self.ticks += 1
+            self._ticks[j] = self.ticks
+            return False
+        if self.start is not None and bucket < self.start:
+            # Tick spóźniony względem formującej się świecy – pomijamy
+            return False
+        ring_size = self.capacity + 1
+        closed = self.start is not None
+        if closed:
+            j = self.slot
+            i = j - ring_size
+            for column in self.ring.columns.values():
+                column[i] = column[j]
+            self.closed += 1
+        self.start = bucket
+        self.high = self.low = price
+        self.ticks = 1
+        j = self.slot = self.closed % ring_size + ring_size
+        self._time[j] = bucket
+        self._open[j] = self._high[j] = self._low[j] = self._close[j] = price
+        self._ticks[j] = 1
+        return closed
+
+    def __len__(self) -> int:
+        """
+        Liczba dostępnych zamkniętych świec.
+        """
+        return min(self.closed, self.capacity)
+
+    def window(self, n: int, field: str = "close", forming: bool = False):
+        """
+        Ostatnie n świec (najstarsza pierwsza) jako widok bez kopii – tablica NumPy tylko do odczytu
+        lub memoryview. Widok odzwierciedla późniejsze zapisy do pierścienia; skopiuj go, jeśli ma przetrwać.
+        :param field: "time", "open", "high", "low", "close" lub "ticks".
+        :param forming: Czy dołączyć formującą się świecę jako ostatnią.
+        :return: Widok o długości min(n, dostępne świece).
+        """
+        end = self.closed + (1 if forming and self.start is not None else 0)
+        n = min(n, end, self.capacity + (1 if forming else 0))
+        return self.ring.window(field, n, end)
+
+    def checkpoint(self) -> dict:
+        """
+        Stan interwału do punktu kontrolnego: liczniki, formująca się świeca i wiersze pierścienia.
+        """
+        end = self.closed + (self.start is not None)
+        return {"seconds": self.seconds, "capacity": self.capacity, "closed": self.closed, "start": self.start,
+                "high": self.high, "low": self.low, "ticks": self.ticks, "rows": self.ring.rows(end, end)}
+
+    def restore(self, state: dict) -> None:
+        if (state["seconds"], state["capacity"]) != (self.seconds, self.capacity):
+            raise ValueError(f"Punkt kontrolny świec {state['seconds']}s/{state['capacity']} "
+                             f"nie pasuje do {self.seconds}s/{self.capacity}")
+        self.closed, self.start = state["closed"], state["start"]
+        self.high, self.low, self.ticks = state["high"], state["low"], state["ticks"]
+        ring_size = self.capacity + 1
+        self.slot = self.closed % ring_size + ring_size
+        self.ring.load(state["rows"], self.closed + (self.start is not None))
+
+
+class AssetSeries:
+    """
+    Historia cen jednego aktywa: pierścień ticków i świece kilku interwałów budowane w jednym przebiegu.
+    Zapisuje jeden wątek (dostawca danych aktywa); strategie czytają okna w tym samym wątku.
+    """
+
+    def __init__(self, asset: str, timeframes: tuple = None, capacity: int = None, tick_capacity: int = None):
+        """
+        :param timeframes: Interwały świec w sekundach (domyślnie config.SERIES_TIMEFRAMES).
+        :param capacity: Liczba świec każdego interwału (domyślnie config.SERIES_CAPACITY).
+        :param tick_capacity: Liczba ostatnich ticków (domyślnie config.SERIES_TICK_CAPACITY).
+        """
+        self.asset = asset
+        timeframes = timeframes if timeframes is not None else config.SERIES_TIMEFRAMES
+        capacity = capacity if capacity is not None else config.SERIES_CAPACITY
+        self.tick_capacity = tick_capacity if tick_capacity is not None else config.SERIES_TICK_CAPACITY
+        self.bars = {seconds: Bars(seconds, capacity) for seconds in sorted(timeframes)}
+        self._bars = list(self.bars.values())
+        self.ticks = _Ring(("time", "price"), self.tick_capacity)
+        self._tick_time, self._tick_price = self.ticks.columns["time"], self.ticks.columns["price"]
+        self.tick_count = 0
+        self.last_time = None
+        # Wspólne wskaźniki tego aktywa: (interwał, nazwa, parametry) -> indicators.SharedIndicator
+        self.indicators: dict[tuple, object] = {}
+
+    def on_tick(self, ts: float, price: float) -> tuple:
+        """
+        Dopisuje tick do historii i do świec wszystkich interwałów.
+        Ticki o czasie nie późniejszym niż ostatni są pomijane (np. ta sama świeca od dwóch dostawców).
+        :return: Interwały (w sekundach), w których właśnie zamknęła się świeca (zwykle pusta krotka).
+        """
+        if self.last_time is not None and ts <= self.last_time:
+            return ()
+        self.last_time = ts
+        i = self.tick_count % self.tick_capacity
+        j = i + self.tick_capacity
+        self._tick_time[i] = self._tick_time[j] = ts
+        self._tick_price[i] = self._tick_price[j] = price
+        self.tick_count += 1
+        closed = ()
+        for bars in self._bars:
+            if bars.update(ts, price):
+                closed += (bars.seconds,)
+        return closed
+
+    def prices(self, n: int, field: str = "price"):
+        """
+        Ostatnie n ticków (najstarszy pierwszy) jako widok bez kopii.
+        :param field: "price" lub "time".
+        """
+        n = min(n, self.tick_count, self.tick_capacity)
+        return self.ticks.window(field, n, self.tick_count)
+
+    def __getitem__(self, seconds: int) -> Bars:
+        return self.bars[seconds]
+
+    def checkpoint(self) -> dict:
+        """
+        Kopia stanu serii do punktu kontrolnego (checkpoint.py): ticki, świece i wspólne wskaźniki.
+        Wywoływana w wątku, który zapisuje serię – wynik nie dzieli już pamięci z serią.
+        """
+        return {
+            "tick_capacity": self.tick_capacity,
+            "tick_count": self.tick_count,
+            "last_time": self.last_time,
+            "ticks": self.ticks.rows(self.tick_count, self.tick_count),
+            "bars": [bars.checkpoint() for bars in self._bars],
+            # Wskaźnik jest małym obiektem (__slots__, krótkie kolejki) – kopia głęboka jest tania
+            "indicators": {key: (shared.consumed, copy.deepcopy(shared.indicator))
+                           for key, shared in self.indicators.items()},
+        }
+
+    def restore(self, state: dict) -> None:
+        """
+        Odtwarza stan z checkpoint(). Wskaźniki są podmieniane w istniejących obiektach SharedIndicator,
+        więc strategie trzymające do nich referencje widzą odtworzone wartości.
+        :raises ValueError: Pojemności lub interwały serii różnią się od zapisanych.
+        """
+        layout = [(bars["seconds"], bars["capacity"]) for bars in state["bars"]]
+        if state["tick_capacity"] != self.tick_capacity or layout != [(b.seconds, b.capacity) for b in self._bars]:
+            raise ValueError(f"Punkt kontrolny serii {self.asset} ma inną pojemność lub interwały")
+        for bars, bars_state in zip(self._bars, state["bars"]):
+            bars.restore(bars_state)
+        self.tick_count, self.last_time = state["tick_count"], state["last_time"]
+        self.ticks.load(state["ticks"], self.tick_count)
+        for key, (consumed, indicator) in state["indicators"].items():
+            shared = self.indicators.get(key)
+            if shared is not None:
+                shared.indicator, shared.consumed = indicator, consumed
+
+
+class SeriesStore:
+    """
+    Rejestr historii cen aktywów procesu – wiele strategii tego samego aktywa czyta jedną serię.
+    """
+
+    def __init__(self):
+        self.series: dict[str, AssetSeries] = {}
+        self.lock = threading.Lock()
+
+    def get(self, asset: str) -> AssetSeries:
+        series = self.series.get(asset)
+        if series is None:
+            with self.lock:
+                series = self.series.get(asset)
+                if series is None:
+                    series = self.series[asset] = AssetSeries(asset)
+        return series
+
+
+# Globalny rejestr serii cen
+store = SeriesStore()
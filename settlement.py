@@ -0,0 +1,80 @@
+# settlement.py – Rozliczanie transakcji: kopiec (min-heap) oczekujących sygnałów według czasu wygaśnięcia
+
+import copy
+import heapq
+import itertools
+
+from models import Signal, Direction, Result
+
+
+def resolve_result(direction: Direction, entry_price: float, exit_price: float) -> Result:
+    """
+    Reguła rozliczenia opcji binarnej:
+    CALL wygrywa, gdy cena wygaśnięcia > cena wejścia; PUT – gdy jest niższa.
+    Równa cena oznacza przegraną.
+    :return: Result.WIN lub Result.LOSS.
+    """
+    if direction == Direction.CALL:
+        return Result.WIN if exit_price > entry_price else Result.LOSS
+    return Result.WIN if exit_price < entry_price else Result.LOSS
+
+
+class SettlementEngine:
+    """
+    Oczekujące transakcje jednego aktywa uporządkowane według wygaśnięcia.
+    Kluczem wygaśnięcia może być numer ticka (symulacja) lub znacznik czasu (realne dane).
+    Każdy tick dotyka wyłącznie transakcji, które właśnie wygasły: O(k log n) dla k rozliczeń.
+    """
+
+    def __init__(self):
+        self.heap: list[tuple[float, int, Signal]] = []
+        self.seq = itertools.count()  # rozstrzyga remisy wygaśnięcia w kolejności dodania
+
+    def add(self, signal: Signal, expiry) -> None:
+        """
+        Dodaje transakcję wygasającą w chwili expiry.
+        """
+        heapq.heappush(self.heap, (expiry, next(self.seq), signal))
+
+    def next_expiry(self):
+        """
+        Zwraca najbliższy klucz wygaśnięcia albo None, gdy brak oczekujących.
+        """
+        return self.heap[0][0] if self.heap else None
+
+    def settle_due(self, now, price: float) -> list[Signal]:
+        """
+        Rozlicza wszystkie transakcje z expiry <= now po cenie price (ustawia signal.result).
+        :return: Rozliczone sygnały w kolejności wygaśnięcia.
+        """
+        settled = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, _, signal = heapq.heappop(heap)
+            signal.result = resolve_result(signal.direction, signal.entry_price, price)
+            settled.append(signal)
+        return settled
+
+    def pending(self) -> list[tuple[Signal, float]]:
+        """
+        Zwraca oczekujące transakcje jako [(Signal, expiry)] posortowane według wygaśnięcia.
+        """
+        return [(signal, expiry) for expiry, _, signal in sorted(self.heap)]
+
+    def checkpoint(self) -> list[tuple[float, Signal]]:
+        """
+        Kopie oczekujących transakcji [(expiry, Signal)] do punktu kontrolnego.
+        Sygnały są kopiowane, bo oryginały zmieniają się dalej (id nadawane przez magazyn, wynik przy rozliczeniu).
+        """
+        return [(expiry, copy.copy(signal)) for expiry, _, signal in sorted(self.heap)]
+
+    def restore(self, pending: list[tuple[float, Signal]]) -> None:
+        """
+        Zastępuje oczekujące transakcje zapisanymi przez checkpoint().
+        """
+        self.seq = itertools.count()
+        self.heap = [(expiry, next(self.seq), signal) for expiry, signal in pending]
+        heapq.heapify(self.heap)
+
+    def __len__(self) -> int:
+        return len(self.heap)
@@ -0,0 +1,374 @@
+# signal_store.py – Magazyn sygnałów: ograniczony bufor w pamięci + indeksowana historia w SQLite
+
+import os
+import copy
+import sqlite3
+import time
+import logging
+from contextlib import contextmanager
+from threading import Lock, Thread
+
+import config
+from models import Signal, signals, signals_lock, parse_time
+from event_bus import bus, TOPIC_SIGNAL_STORED, TOPIC_SIGNAL_UPDATED
+
+
+class SignalHistory:
+    """
+    Trwała historia sygnałów w SQLite (tryb WAL), indeksowana po (asset, time).
+    Pozwala odpytywać zakresy czasu i aktywa bez ładowania całej historii do pamięci.
+    """
+
+    COLUMNS = "id, time, asset, direction, amount, entry_price, result, ts"
+
+    def __init__(self, path: str):
+        """
+        :param path: Ścieżka do pliku bazy (np. "db/signals.db").
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS signals ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " time TEXT NOT NULL,"
+            " asset TEXT NOT NULL,"
+            " direction TEXT NOT NULL,"
+            " amount REAL NOT NULL,"
+            " entry_price REAL NOT NULL,"
+            " result TEXT,"
+            " seq INTEGER,"
+            " ts REAL)"
+        )
+        # Starsze bazy nie mają kolumn seq (numerujemy istniejące wiersze ich id)
+        # i ts (czas epoki odtwarzamy wtedy z kolumny time przy odczycie)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(signals)")}
+        if "seq" not in columns:
+            self.conn.execute("ALTER TABLE signals ADD COLUMN seq INTEGER")
+            self.conn.execute("UPDATE signals SET seq = id")
+        if "ts" not in columns:
+            self.conn.execute("ALTER TABLE signals ADD COLUMN ts REAL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_signals_asset_time ON signals (asset, time)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_signals_time ON signals (time)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_signals_seq ON signals (seq)")
+        self.conn.commit()
+        # Numer ostatniej zmiany (wstawienia lub rozliczenia) – kursor dla czytelników w innych procesach
+        self.seq = self.latest_seq()
+
+    @staticmethod
+    def _row_to_signal(row) -> Signal:
+        return Signal(ts=row[7] if row[7] is not None else parse_time(row[1]), asset=row[2], direction=row[3],
+                      amount=row[4], entry_price=row[5], result=row[6], id=row[0])
+
+    def insert(self, signal: Signal) -> int:
+        """
+        Zapisuje nowy sygnał i nadaje mu identyfikator (signal.id).
+        """
+        with self.lock:
+            self.seq += 1
+            cursor = self.conn.execute(
+                "INSERT INTO signals (time, asset, direction, amount, entry_price, result, seq, ts)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (signal.time, signal.asset, signal.direction.value, signal.amount, signal.entry_price,
+                 signal.result.value if signal.result is not None else None, self.seq, signal.ts)
+            )
+            self.conn.commit()
+        signal.id = cursor.lastrowid
+        return signal.id
+
+    def update_result(self, signal: Signal) -> None:
+        """
+        Zapisuje wynik rozliczonego sygnału.
+        """
+        if signal.id is None:
+            return
+        with self.lock:
+            self.seq += 1
+            self.conn.execute("UPDATE signals SET result = ?, seq = ? WHERE id = ?",
+                              (signal.result.value if signal.result is not None else None, self.seq, signal.id))
+            self.conn.commit()
+
+    def latest_seq(self) -> int:
+        """
+        Numer ostatniej zmiany zapisanej w bazie (także przez inny proces).
+        """
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM signals").fetchone()[0]
+
+    def unsettled(self) -> list[Signal]:
+        """
+        Zwraca sygnały bez wyniku (rosnąco po id).
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self.COLUMNS} FROM signals WHERE result IS NULL ORDER BY id"
+            ).fetchall()
+        return [self._row_to_signal(row) for row in rows]
+
+    @contextmanager
+    def snapshot(self):
+        """
+        Spójny odczyt: wszystkie zapytania w bloku widzą ten sam stan bazy (transakcja odczytu w trybie WAL),
+        nawet jeśli inny proces w tym czasie zapisuje. Nie wolno w nim zapisywać.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.conn.execute("COMMIT")
+
+    def changes_since(self, seq: int, limit: int = 1000) -> list[tuple[int, Signal]]:
+        """
+        Zwraca sygnały wstawione lub rozliczone po zmianie seq: [(numer zmiany, sygnał)], rosnąco.
+        Każdy sygnał występuje raz, z numerem swojej ostatniej zmiany.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self.COLUMNS}, seq FROM signals WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+        return [(row[8], self._row_to_signal(row)) for row in rows]
+
+    def query(self, asset: str = None, start: str = None, end: str = None, limit: int = 1000) -> list[Signal]:
+        """
+        Zwraca sygnały z zakresu czasu [start, end] (opcjonalnie dla jednego aktywa), rosnąco po czasie.
+        :param start: Początek zakresu ("YYYY-MM-DD HH:MM:SS" lub jego prefiks, np. "YYYY-MM-DD").
+        :param end: Koniec zakresu (włącznie, porównanie leksykograficzne).
+        """
+        conditions, params = [], []
+        if asset:
+            conditions.append("asset = ?")
+            params.append(asset)
+        if start:
+            conditions.append("time >= ?")
+            params.append(start)
+        if end:
+            conditions.append("time <= ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self.COLUMNS} FROM signals{where} ORDER BY time, id LIMIT ?", params
+            ).fetchall()
+        return [self._row_to_signal(row) for row in rows]
+
+    def recent(self, limit: int) -> list[Signal]:
+        """
+        Zwraca ostatnie limit sygnałów (rosnąco po id).
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self.COLUMNS} FROM signals ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_signal(row) for row in reversed(rows)]
+
+    def iter_all(self, batch_size: int = 1000):
+        """
+        Generator wszystkich sygnałów (rosnąco po id), czytanych partiami – bez ładowania całej historii.
+        """
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT {self.COLUMNS} FROM signals WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_signal(row)
+            last_id = rows[-1][0]
+
+
+# Globalna historia sygnałów
+history = SignalHistory(config.SIGNALS_DB)
+
+# Licznik wersji bufora – zwiększany przy każdym nowym lub rozliczonym sygnale (ETag dla API)
+version = 0
+# Gotowe odpowiedzi API dla bieżącej wersji bufora: {parametry zapytania: bytes}; czyszczone przy każdej zmianie
+response_cache: dict[tuple, bytes] = {}
+RESPONSE_CACHE_SIZE = 64
+
+
+def store_signal(signal: Signal) -> None:
+    """
+    Konsument szyny zdarzeń: zapisuje nowy sygnał w historii i w buforze ostatnich sygnałów,
+    a następnie publikuje TOPIC_SIGNAL_STORED dla konsumentów potrzebujących id sygnału.
+    """
+    history.insert(signal)
+    buffer_signal(signal)
+    # Konsumenci dostają migawkę z chwili otwarcia: dostawca mógł już rozliczyć ten obiekt (kolejka zaległa,
+    # zegar przyspieszony), a wynik i tak dotrze zdarzeniem rozliczenia, które w tej kolejce jest następne –
+    # statystyki nie mogą policzyć go dwa razy
+    stored = copy.copy(signal)
+    stored.result = None
+    bus.publish(TOPIC_SIGNAL_STORED, stored)
+
+
+def buffer_signal(signal: Signal) -> None:
+    """
+    Dodaje zapisany sygnał (z nadanym id) do bufora ostatnich sygnałów.
+    JSON sygnału jest kodowany przed wejściem pod signals_lock; pod blokadą zostaje tylko dopisanie.
+    """
+    global version
+    signal.to_json()
+    with signals_lock:
+        signals.append(signal)
+        response_cache.clear()
+        version += 1
+
+
+def store_settlement(signal: Signal) -> None:
+    """
+    Konsument szyny zdarzeń: utrwala wynik rozliczonego sygnału i publikuje TOPIC_SIGNAL_UPDATED.
+    """
+    history.update_result(signal)
+    publish_updated(signal)
+
+
+def publish_updated(signal: Signal) -> None:
+    """
+    Odświeża JSON rozliczonego sygnału w buforze i publikuje TOPIC_SIGNAL_UPDATED (bez zapisu do historii).
+    """
+    global version
+    signal.to_json()
+    with signals_lock:
+        # Sygnał odtworzony z punktu kontrolnego (checkpoint.py) to inny obiekt niż wczytany do bufora z historii
+        for buffered in reversed(signals):
+            if buffered.id == signal.id:
+                if buffered is not signal:
+                    buffered.result = signal.result
+                break
+        response_cache.clear()
+        version += 1
+    bus.publish(TOPIC_SIGNAL_UPDATED, signal)
+
+
+def select_encoded(limit: int, since_id: int = None, asset: str = None,
+                   direction: str = None, result: str = None) -> tuple[int, bytes]:
+    """
+    Zwraca (wersja bufora, tablica JSON) z sygnałami spełniającymi filtry.
+    - Bez since_id: ostatnie limit sygnałów.
+    - Z since_id: pierwsze limit sygnałów o id > since_id (stronicowanie kursorem).
+    :param result: "WIN", "LOSS" lub "PENDING" (jeszcze nierozliczone).
+    """
+    key = (limit, since_id, asset, direction, result)
+    with signals_lock:
+        current_version = version
+        body = response_cache.get(key)
+        if body is not None:
+            return current_version, body
+        wanted_result = None if result == "PENDING" else result
+        selected = [
+            sig for sig in signals
+            if (since_id is None or sig.id > since_id)
+            and (asset is None or sig.asset == asset)
+            and (direction is None or sig.direction == direction)
+            and (result is None or sig.result == wanted_result)
+        ]
+    selected = selected[:limit] if since_id is not None else selected[-limit:]
+    # JSON każdego sygnału jest już zakodowany (Signal.to_json) – odpowiedź to złączenie bajtów
+    body = b"[" + b",".join([sig.to_json() for sig in selected]) + b"]"
+    with signals_lock:
+        # Odpowiedź trafia do pamięci podręcznej tylko, jeśli bufor nie zmienił się w międzyczasie
+        if version == current_version:
+            if len(response_cache) >= RESPONSE_CACHE_SIZE:
+                response_cache.clear()
+            response_cache[key] = body
+    return current_version, body
+
+
+def load_recent() -> int:
+    """
+    Wczytuje ostatnie sygnały z historii do bufora w pamięci (przy starcie aplikacji).
+    :return: Liczba wczytanych sygnałów.
+    """
+    global version
+    recent = history.recent(signals.maxlen)
+    for sig in recent:
+        sig.to_json()
+    with signals_lock:
+        signals.clear()
+        signals.extend(recent)
+        response_cache.clear()
+        version += 1
+    logging.info("Wczytano %d ostatnich sygnałów z %s.", len(recent), history.path)
+    return len(recent)
+
+
+class FeedReader:
+    """
+    Odczyt sygnałów zapisywanych przez silnik działający w innym procesie (np. w workerach gunicorna).
+    Co interval sekund pobiera z historii SQLite (WAL – czytelnicy nie blokują zapisu) zmiany po ostatnim
+    numerze seq, dopisuje je do lokalnego bufora i publikuje na lokalnej szynie TOPIC_SIGNAL_STORED /
+    TOPIC_SIGNAL_UPDATED – dalej (SSE, statystyki, /api/signals) wszystko działa jak w jednym procesie.
+    """
+
+    def __init__(self, history: SignalHistory, seq: int = None, interval: float = None):
+        """
+        :param history: Historia sygnałów (połączenie tylko do odczytu zmian).
+        :param seq: Numer zmiany, od której czytać; None = ostatnia zmiana w bazie.
+                    Bufor, statystyki, seq i sam czytelnik powinny powstać w jednym history.snapshot().
+        :param interval: Odstęp między odpytaniami w sekundach (domyślnie config.FEED_POLL_INTERVAL).
+        """
+        self.history = history
+        self.seq = seq if seq is not None else history.latest_seq()
+        self.interval = interval if interval is not None else config.FEED_POLL_INTERVAL
+        # Wszystkie nierozliczone sygnały: zmiana sygnału spoza tego zbioru oznacza nowy sygnał.
+        # Dla sygnałów z bufora trzymamy obiekt z bufora – rozliczenie ma być widoczne w /api/signals.
+        self.pending: dict[int, Signal] = {sig.id: sig for sig in history.unsettled()}
+        with signals_lock:
+            self.pending.update((sig.id, sig) for sig in signals if sig.result is None)
+        self.thread = None
+
+    def poll(self) -> int:
+        """
+        Przetwarza zmiany zapisane od poprzedniego odczytu.
+        :return: Liczba przetworzonych zmian.
+        """
+        changes = self.history.changes_since(self.seq)
+        if not changes:
+            return 0
+        self.seq = changes[-1][0]
+        created, settled = [], []
+        for _, signal in changes:
+            known = self.pending.pop(signal.id, None)
+            if known is None:
+                created.append(signal)
+            else:
+                known.result = signal.result
+                settled.append(known)
+        # Wiersz rozliczony po wstawieniu nowszego ma większy numer zmiany – bufor ma być uporządkowany po id
+        created.sort(key=lambda sig: sig.id)
+        for signal in created:
+            if signal.result is None:
+                self.pending[signal.id] = signal
+            buffer_signal(signal)
+            # Konsumenci dostają kopię – późniejsze rozliczenie zmienia obiekt z bufora,
+            # a statystyki nie mogą policzyć wyniku dwa razy (w zdarzeniu nowego sygnału i rozliczenia)
+            bus.publish(TOPIC_SIGNAL_STORED, copy.copy(signal))
+        for signal in settled:
+            publish_updated(signal)
+        return len(changes)
+
+    def run(self) -> None:
+        while True:
+            try:
+                # Pełna partia oznacza zaległości – czytamy dalej bez czekania
+                if self.poll() < 1000:
+                    time.sleep(self.interval)
+            except Exception as e:
+                logging.error("Błąd odczytu zmian historii sygnałów: %s", e)
+                time.sleep(self.interval)
+
+    def start(self) -> "FeedReader":
+        self.thread = Thread(target=self.run, name="FeedReaderThread", daemon=True)
+        self.thread.start()
+        return self
@@ -0,0 +1,317 @@
+# stats.py – Przyrostowe agregaty statystyk sygnałów (dzień, godzina, aktywo, kierunek, ekspozycja)
+
+import random
+import logging
+import argparse
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+from models import Signal
+
+
+class Counts:
+    """
+    Liczniki jednego kubełka statystyk.
+    """
+    __slots__ = ("signals", "wins", "losses", "staked")
+
+    def __init__(self, signals: int = 0, wins: int = 0, losses: int = 0, staked: float = 0.0):
+        self.signals = signals
+        self.wins = wins
+        self.losses = losses
+        self.staked = staked
+
+    def copy(self) -> "Counts":
+        return Counts(self.signals, self.wins, self.losses, self.staked)
+
+    def plus(self, other: "Counts") -> "Counts":
+        return Counts(self.signals + other.signals, self.wins + other.wins,
+                      self.losses + other.losses, self.staked + other.staked)
+
+    def minus(self, other: "Counts") -> "Counts":
+        return Counts(self.signals - other.signals, self.wins - other.wins,
+                      self.losses - other.losses, self.staked - other.staked)
+
+    def to_dict(self) -> dict:
+        settled = self.wins + self.losses
+        return {
+            "signals": self.signals,
+            "wins": self.wins,
+            "losses": self.losses,
+            "win_rate": round(100.0 * self.wins / settled, 2) if settled else None,
+            "staked": round(self.staked, 2),
+        }
+
+
+class SignalStats:
+    """
+    Agregaty aktualizowane w O(1) przy utworzeniu i rozliczeniu sygnału.
+    Wyniki (WIN/LOSS) są przypisywane do kubełka czasu utworzenia sygnału.
+    Dla kubełków godzinowych utrzymywane są sumy prefiksowe, więc dowolny
+    zakres czasu to różnica dwóch sum (bez ponownego przeglądania historii).
+    Aktualizacja tylko zaznacza najwcześniejszą zmienioną godzinę; sumy od niej
+    w górę są przeliczane przy odczycie zakresu – zdarzenie dla bieżącej godziny
+    kosztuje przy odczycie jedną pozycję, a spóźnione (starsza godzina) nie
+    przepisuje sum przy każdym zdarzeniu, tylko raz przed odczytem.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = 0
+        self.total = Counts()
+        self.by_day: dict[str, Counts] = {}
+        self.by_hour: dict[str, Counts] = {}
+        self.by_asset: dict[str, Counts] = {}
+        self.by_direction: dict[str, Counts] = {}
+        # Posortowane klucze godzin ("YYYY-MM-DD HH") i skumulowane liczniki do danej godziny włącznie;
+        # prefix[stale:] jest nieaktualny (None = wszystkie sumy aktualne)
+        self.hours: list[str] = []
+        self.prefix: list[Counts] = []
+        self.stale: int | None = None
+        # Ekspozycja Martingale: stawki otwartych transakcji i największa stawka
+        self.open_trades = 0
+        self.open_stake = 0.0
+        self.max_stake = 0.0
+
+    def _buckets(self, signal: Signal) -> list[Counts]:
+        day, hour = signal.time[:10], signal.time[:13]
+        buckets = []
+        for table, key in ((self.by_day, day), (self.by_hour, hour),
+                           (self.by_asset, signal.asset), (self.by_direction, signal.direction)):
+            bucket = table.get(key)
+            if bucket is None:
+                bucket = table[key] = Counts()
+            buckets.append(bucket)
+        buckets.append(self.total)
+        return buckets
+
+    def _hour_index(self, hour: str) -> int:
+        """
+        Zwraca indeks godziny w sumach prefiksowych, dodając ją w razie potrzeby.
+        Sygnały przychodzą chronologicznie, więc zwykle jest to ostatni element.
+        """
+        if self.hours and self.hours[-1] == hour:
+            return len(self.hours) - 1
+        if not self.hours or self.hours[-1] < hour:
+            self.hours.append(hour)
+            self.prefix.append(Counts())
+            return len(self.hours) - 1
+        index = bisect_left(self.hours, hour)
+        if index == len(self.hours) or self.hours[index] != hour:
+            self.hours.insert(index, hour)
+            self.prefix.insert(index, Counts())
+        return index
+
+    def _mark_hour(self, hour: str) -> None:
+        # Liczniki godziny są już w by_hour – zapamiętujemy tylko, od której sumy trzeba przeliczyć
+        index = self._hour_index(hour)
+        if self.stale is None or index < self.stale:
+            self.stale = index
+
+    def _prefix_sums(self) -> list[Counts]:
+        """
+        Przelicza nieaktualny ogon sum prefiksowych (wywoływane pod self.lock, przy odczycie).
+        """
+        if self.stale is not None:
+            hours, prefix, by_hour = self.hours, self.prefix, self.by_hour
+            for index in range(self.stale, len(hours)):
+                counts = by_hour[hours[index]]
+                prefix[index] = prefix[index - 1].plus(counts) if index else counts.copy()
+            self.stale = None
+        return self.prefix
+
+    def on_signal(self, signal: Signal) -> None:
+        """
+        Konsument szyny zdarzeń: nowy sygnał.
+        """
+        with self.lock:
+            for bucket in self._buckets(signal):
+                bucket.signals += 1
+                bucket.staked += signal.amount
+            self._mark_hour(signal.time[:13])
+            self.max_stake = max(self.max_stake, signal.amount)
+            if signal.result is None:
+                self.open_trades += 1
+                self.open_stake += signal.amount
+            else:
+                self._count_result(signal)
+            self.version += 1
+
+    def on_settled(self, signal: Signal) -> None:
+        """
+        Konsument szyny zdarzeń: sygnał rozliczony (WIN/LOSS).
+        """
+        with self.lock:
+            self.open_trades = max(0, self.open_trades - 1)
+            self.open_stake = max(0.0, self.open_stake - signal.amount)
+            self._count_result(signal)
+            self.version += 1
+
+    def _count_result(self, signal: Signal) -> None:
+        win = signal.result == "WIN"
+        for bucket in self._buckets(signal):
+            if win:
+                bucket.wins += 1
+            else:
+                bucket.losses += 1
+        self._mark_hour(signal.time[:13])
+
+    @staticmethod
+    def _hour_bounds(start: str = None, end: str = None) -> tuple[str, str]:
+        """
+        Zamienia granice zakresu na klucze godzin. Koniec podany jako sam dzień
+        ("YYYY-MM-DD") obejmuje wszystkie jego godziny.
+        """
+        start_key = start[:13] if start else ""
+        end_key = (end[:13] if len(end) > 10 else f"{end} 99") if end else "~"
+        return start_key, end_key
+
+    def range_totals(self, start: str = None, end: str = None) -> Counts:
+        """
+        Sumuje liczniki w zakresie [start, end] (z dokładnością do godziny) jako różnicę sum prefiksowych.
+        :param start: Początek ("YYYY-MM-DD" lub "YYYY-MM-DD HH[:MM:SS]").
+        :param end: Koniec (włącznie).
+        """
+        start_key, end_key = self._hour_bounds(start, end)
+        with self.lock:
+            first = bisect_left(self.hours, start_key)
+            last = bisect_right(self.hours, end_key) - 1
+            if last < first:
+                return Counts()
+            prefix = self._prefix_sums()
+            result = prefix[last].copy()
+            return result.minus(prefix[first - 1]) if first else result
+
+    def snapshot(self, start: str = None, end: str = None, hourly_limit: int = 48) -> dict:
+        """
+        Zwraca komplet statystyk (dla /api/stats).
+        :param hourly_limit: Ile ostatnich godzin z zakresu zwrócić w "hourly".
+        """
+        totals = self.range_totals(start, end) if (start or end) else None
+        start_key, end_key = self._hour_bounds(start, end)
+        with self.lock:
+            first = bisect_left(self.hours, start_key)
+            last = bisect_right(self.hours, end_key)
+            hours = self.hours[max(first, last - hourly_limit):last]
+            days = [day for day in sorted(self.by_day) if start_key[:10] <= day <= end_key[:10]]
+            data = {
+                "version": self.version,
+                "total": self.total.to_dict(),
+                "daily": [dict(day=day, **self.by_day[day].to_dict()) for day in days],
+                "hourly": [dict(hour=hour, **self.by_hour[hour].to_dict()) for hour in hours],
+                "assets": {asset: counts.to_dict() for asset, counts in self.by_asset.items()},
+                "directions": {direction: counts.to_dict() for direction, counts in self.by_direction.items()},
+                "exposure": {
+                    "open_trades": self.open_trades,
+                    "open_stake": round(self.open_stake, 2),
+                    "max_stake": round(self.max_stake, 2),
+                    "total_staked": round(self.total.staked, 2),
+                },
+            }
+        if totals is not None:
+            data["range"] = totals.to_dict()
+        return data
+
+    def load(self, signals) -> int:
+        """
+        Jednorazowo odtwarza agregaty z historii (przy starcie aplikacji).
+        :param signals: Iterowalna sekwencja sygnałów (chronologicznie).
+        """
+        count = 0
+        for signal in signals:
+            self.on_signal(signal)
+            count += 1
+        logging.info("Odtworzono statystyki z %d sygnałów.", count)
+        return count
+
+
+# Globalne statystyki sygnałów
+stats = SignalStats()
+
+
+def self_check(count: int = 5000, hours: int = 500, seed: int = 1) -> None:
+    """
+    Porównuje range_totals() i snapshot() z liczeniem „na piechotę” po liście zdarzeń – dla zdarzeń
+    chronologicznych i pomieszanych (spóźnione sygnały i rozliczenia ze starszych godzin),
+    z odczytami przeplatanymi z aktualizacjami.
+    """
+    from models import format_time
+
+    rng = random.Random(seed)
+    start = 1_700_000_000 - 1_700_000_000 % 3600
+    signals = [Signal(ts=start + rng.randrange(hours * 3600), asset=rng.choice(("EURUSD", "GBPUSD", "USDJPY")),
+                      direction=rng.choice(("CALL", "PUT")), amount=rng.choice((1.0, 2.0, 4.0, 8.0)),
+                      entry_price=1.1, id=i) for i in range(count)]
+    signals.sort(key=lambda sig: sig.ts)
+    results = {sig.id: rng.choice(("WIN", "LOSS", None)) for sig in signals}
+
+    def expected(seen, settled, first: str, last: str) -> Counts:
+        counts = Counts()
+        for sig in seen:
+            if first <= sig.time[:13] <= last:
+                counts.signals += 1
+                counts.staked += sig.amount
+                result = settled.get(sig.id)
+                counts.wins += result == "WIN"
+                counts.losses += result == "LOSS"
+        return counts
+
+    def settled_copy(sig: Signal, result: str) -> Signal:
+        return Signal(sig.ts, sig.asset, sig.direction, sig.amount, sig.entry_price, result, sig.id)
+
+    for ordered in (True, False):
+        # Zdarzenia: utworzenie, a rozliczenie w losowym miejscu po nim
+        events = []
+        for position, sig in enumerate(signals):
+            events.append((position, 0, sig))
+            if results[sig.id] is not None:
+                events.append((position + rng.randrange(1, 50), 1, sig))
+        events.sort(key=lambda event: event[:2])
+        if not ordered:
+            # Spóźnione zdarzenia: co piąte przesuwamy o do kilkuset pozycji (rozliczenie zawsze po utworzeniu)
+            for i in range(0, len(events), 5):
+                j = min(len(events) - 1, i + rng.randrange(300))
+                events[i], events[j] = events[j], events[i]
+            created = set()
+            fixed = []
+            deferred = {}
+            for event in events:
+                _, kind, sig = event
+                if kind == 1 and sig.id not in created:
+                    deferred[sig.id] = event
+                    continue
+                fixed.append(event)
+                if kind == 0:
+                    created.add(sig.id)
+                    if sig.id in deferred:
+                        fixed.append(deferred.pop(sig.id))
+            events = fixed
+        checker = SignalStats()
+        seen, settled = [], {}
+        for step, (_, kind, sig) in enumerate(events):
+            if kind == 0:
+                checker.on_signal(sig)
+                seen.append(sig)
+            else:
+                checker.on_settled(settled_copy(sig, results[sig.id]))
+                settled[sig.id] = results[sig.id]
+            if step % 97 == 0:
+                first = format_time(start + rng.randrange(hours * 3600))[:13]
+                last = max(first, format_time(start + rng.randrange(hours * 3600))[:13])
+                got = checker.range_totals(first, last + ":59:59").to_dict()
+                assert got == expected(seen, settled, first, last).to_dict(), (ordered, step, first, last)
+        got = checker.snapshot()["total"]
+        assert got == expected(seen, settled, "", "~").to_dict(), (ordered, got)
+        assert checker.open_trades == len(seen) - len(settled), ordered
+    print(f"OK: {count} sygnałów w {hours} godzinach – zakresy zgodne przy zdarzeniach chronologicznych "
+          f"i spóźnionych.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zgodność przyrostowych statystyk z przeliczeniem od zera.")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--hours", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    self_check(args.count, args.hours, args.seed)
@@ -1,7 +1,17 @@
 # strategy.py – Logika strategii generowania sygnałów na podstawie lokalnych ekstremów cenowych
 
+import operator
 from collections import deque
 
+import indicators
+from series import AssetSeries
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny – bez niego check_signals działa w pętli
+    np = None
+
+
 class Strategy:
     """
     Klasa strategii, która generuje sygnały "CALL" lub "PUT"
@@ -15,6 +25,11 @@ class Strategy:
         """
         self.window_size = window_size
         self.recent_prices = deque(maxlen=window_size)
+        # Kolejki monotoniczne (indeks, cena): minimum i maksimum okna są zawsze na początku,
+        # więc każda aktualizacja kosztuje zamortyzowane O(1) zamiast O(window_size)
+        self.tick = 0
+        self.min_queue: deque[tuple[int, float]] = deque()
+        self.max_queue: deque[tuple[int, float]] = deque()
 
     def check_signal(self, price: float) -> str | None:
         """
@@ -24,16 +39,288 @@ class Strategy:
         """
         # Dodajemy cenę do kolejki o długości window_size
         self.recent_prices.append(price)
+        self._push_extremes(price)
 
         # Jeśli nie zebraliśmy jeszcze window_size cen, nie generujemy sygnału
         if len(self.recent_prices) < self.window_size:
             return None
 
         # Sprawdź, czy obecna cena jest minimalną w oknie → sygnał CALL
-        if price == min(self.recent_prices):
+        if price == self.min_queue[0][1]:
             return "CALL"
         # Sprawdź, czy obecna cena jest maksymalną w oknie → sygnał PUT
-        if price == max(self.recent_prices):
+        if price == self.max_queue[0][1]:
+            return "PUT"
+
+        return None
+
+    def _push_extremes(self, price: float) -> None:
+        """
+        Aktualizuje kolejki monotoniczne o nową cenę i usuwa ceny spoza okna.
+        """
+        tick = self.tick
+        self.tick += 1
+        while self.min_queue and self.min_queue[-1][1] >= price:
+            self.min_queue.pop()
+        self.min_queue.append((tick, price))
+        while self.max_queue and self.max_queue[-1][1] <= price:
+            self.max_queue.pop()
+        self.max_queue.append((tick, price))
+        oldest = tick - self.window_size
+        if self.min_queue[0][0] <= oldest:
+            self.min_queue.popleft()
+        if self.max_queue[0][0] <= oldest:
+            self.max_queue.popleft()
+
+    def checkpoint(self) -> dict:
+        """
+        Kopia stanu okna do punktu kontrolnego (checkpoint.py).
+        """
+        return {"kind": type(self).__name__, "window_size": self.window_size,
+                "recent_prices": list(self.recent_prices), "tick": self.tick,
+                "min_queue": list(self.min_queue), "max_queue": list(self.max_queue)}
+
+    def restore(self, state: dict) -> None:
+        """
+        Odtwarza stan z checkpoint() – kolejne check_signal() działają tak, jakby restartu nie było.
+        """
+        if (state["kind"], state["window_size"]) != (type(self).__name__, self.window_size):
+            raise ValueError(f"Punkt kontrolny strategii {state['kind']} (okno {state['window_size']}) "
+                             f"nie pasuje do {type(self).__name__} (okno {self.window_size})")
+        self.recent_prices = deque(state["recent_prices"], maxlen=self.window_size)
+        self.tick = state["tick"]
+        self.min_queue = deque(state["min_queue"])
+        self.max_queue = deque(state["max_queue"])
+
+    def check_signals(self, prices) -> list[str | None]:
+        """
+        Wersja wsadowa: wyznacza sygnały dla całej serii cen w jednym przebiegu.
+        Wynik jest identyczny z wywoływaniem check_signal() cena po cenie na nowej
+        instancji strategii (stan tej instancji nie jest zmieniany).
+        :param prices: Sekwencja lub tablica NumPy cen.
+        :return: Lista "CALL" / "PUT" / None o długości równej liczbie cen.
+        """
+        if np is None:
+            fresh = Strategy(self.window_size)
+            return [fresh.check_signal(price) for price in prices]
+
+        prices = np.asarray(prices, dtype=float)
+        result = np.full(len(prices), None, dtype=object)
+        if len(prices) < self.window_size:
+            return result.tolist()
+        windows = np.lib.stride_tricks.sliding_window_view(prices, self.window_size)
+        current = prices[self.window_size - 1:]
+        is_call = current == windows.min(axis=1)
+        is_put = ~is_call & (current == windows.max(axis=1))
+        tail = result[self.window_size - 1:]
+        tail[is_call] = "CALL"
+        tail[is_put] = "PUT"
+        return result.tolist()
+
+
+class IndicatorStrategy(Strategy):
+    """
+    Bazowa klasa strategii opartych na wspólnych wskaźnikach (indicators.shared).
+    Wskaźniki są liczone raz na (aktywo, interwał, parametry) – kolejne strategie tego samego
+    aktywa tylko odczytują gotowe wartości z series.AssetSeries.
+    - timeframe=None: decyzja na każdym ticku.
+    - timeframe=N: decyzja raz na zamkniętą świecę N-sekundową (między zamknięciami brak sygnałów).
+    Bez podanej serii strategia prowadzi własną serię ticków (np. w backteście lub testach).
+    """
+
+    def __init__(self, series=None, timeframe: int = None, window_size: int = 1):
+        """
+        :param series: series.AssetSeries aktywa zasilana przez dostawcę danych (None = własna seria ticków).
+        :param timeframe: Interwał świec w sekundach lub None (ticki).
+        :param window_size: Liczba danych potrzebnych do rozgrzania wskaźników (informacyjnie).
+        """
+        super().__init__(window_size=window_size)
+        self.timeframe = timeframe
+        self.owns_series = series is None
+        if self.owns_series:
+            if timeframe is not None:
+                raise ValueError("Strategia na świecach wymaga serii aktywa zasilanej przez dostawcę danych.")
+            series = AssetSeries("", timeframes=())
+        self.series = series
+        self.last_revision = None
+
+    def indicator(self, name: str, *params):
+        return indicators.shared(self.series, name, *params, timeframe=self.timeframe)
+
+    def check_signal(self, price: float) -> str | None:
+        """
+        Sprawdza sygnał po nowej cenie (dostawca dopisał ją już do serii aktywa).
+        """
+        if self.owns_series:
+            self.tick += 1
+            self.series.on_tick(self.tick, price)
+        # Decyzja zapada tylko, gdy pojawiły się nowe dane w interwale strategii
+        self.main.value()
+        revision = self.main.revision
+        if revision == self.last_revision:
+            return None
+        self.last_revision = revision
+        return self.decide(price)
+
+    def checkpoint(self) -> dict:
+        """
+        Wartości wskaźników należą do serii aktywa – tu tylko ostatnia rewizja (i własna seria, jeśli jest).
+        """
+        state = super().checkpoint()
+        state["last_revision"] = self.last_revision
+        if self.owns_series:
+            state["series"] = self.series.checkpoint()
+        return state
+
+    def restore(self, state: dict) -> None:
+        super().restore(state)
+        self.last_revision = state["last_revision"]
+        if self.owns_series:
+            self.series.restore(state["series"])
+
+    def decide(self, price: float) -> str | None:
+        raise NotImplementedError("Metoda decide() musi być zaimplementowana w podklasie.")
+
+    def check_signals(self, prices) -> list[str | None]:
+        """
+        Wersja wsadowa dla serii ticków – wynik identyczny z check_signal() na nowej instancji
+        z własną serią. Korzysta z wektorowych form wskaźników (indicators.sma, rsi, ...).
+        """
+        prices = np.asarray(prices, dtype=float) if np is not None else [float(p) for p in prices]
+        calls, puts = self.batch(prices)
+        return ["CALL" if call else "PUT" if put else None for call, put in zip(calls, puts)]
+
+    def batch(self, prices) -> tuple:
+        """
+        :return: (maska CALL, maska PUT) dla kolejnych cen.
+        """
+        raise NotImplementedError("Metoda batch() musi być zaimplementowana w podklasie.")
+
+
+def _compare(values, op, threshold) -> list[bool]:
+    # NaN (wskaźnik nierozgrzany) nigdy nie daje sygnału
+    if np is not None:
+        with np.errstate(invalid="ignore"):
+            return op(np.asarray(values), threshold).tolist()
+    return [value == value and op(value, threshold) for value in values]
+
+
+class RSIStrategy(IndicatorStrategy):
+    """
+    RSI poniżej oversold → "CALL", powyżej overbought → "PUT".
+    """
+
+    def __init__(self, series=None, timeframe: int = None, period: int = 14,
+                 oversold: float = 30.0, overbought: float = 70.0):
+        super().__init__(series, timeframe, window_size=period + 1)
+        self.period = period
+        self.oversold = oversold
+        self.overbought = overbought
+        self.main = self.indicator("rsi", period)
+
+    def decide(self, price: float) -> str | None:
+        value = self.main.value()
+        if value is None:
+            return None
+        if value <= self.oversold:
+            return "CALL"
+        if value >= self.overbought:
+            return "PUT"
+        return None
+
+    def batch(self, prices) -> tuple:
+        values = indicators.rsi(prices, self.period)
+        return _compare(values, operator.le, self.oversold), _compare(values, operator.ge, self.overbought)
+
+
+class MACrossStrategy(IndicatorStrategy):
+    """
+    Przecięcie średnich: szybka przecina wolną od dołu → "CALL", od góry → "PUT".
+    :param kind: "ema" lub "sma".
+    """
+
+    def __init__(self, series=None, timeframe: int = None, fast: int = 9, slow: int = 21, kind: str = "ema"):
+        if fast >= slow:
+            raise ValueError("Okres szybkiej średniej musi być krótszy niż wolnej.")
+        super().__init__(series, timeframe, window_size=slow)
+        self.fast_period = fast
+        self.slow_period = slow
+        self.kind = kind
+        self.fast = self.indicator(kind, fast)
+        self.main = self.slow = self.indicator(kind, slow)
+        self.previous_diff = None
+
+    def decide(self, price: float) -> str | None:
+        fast, slow = self.fast.value(), self.slow.value()
+        if fast is None or slow is None:
+            return None
+        diff, previous = fast - slow, self.previous_diff
+        self.previous_diff = diff
+        if previous is None:
+            return None
+        if previous <= 0 < diff:
+            return "CALL"
+        if previous >= 0 > diff:
             return "PUT"
+        return None
+
+    def checkpoint(self) -> dict:
+        state = super().checkpoint()
+        state["previous_diff"] = self.previous_diff
+        return state
+
+    def restore(self, state: dict) -> None:
+        super().restore(state)
+        self.previous_diff = state["previous_diff"]
+
+    def batch(self, prices) -> tuple:
+        average = indicators.ema if self.kind == "ema" else indicators.sma
+        diff = average(prices, self.fast_period) - average(prices, self.slow_period) if np is not None else [
+            f - s for f, s in zip(average(prices, self.fast_period), average(prices, self.slow_period))]
+        previous = [float("nan")] + list(diff[:-1])
+        calls = [p <= 0 < d for p, d in zip(previous, diff)]
+        puts = [p >= 0 > d for p, d in zip(previous, diff)]
+        return calls, puts
+
+
+class BollingerStrategy(IndicatorStrategy):
+    """
+    Cena na lub poniżej dolnej wstęgi → "CALL", na lub powyżej górnej → "PUT".
+    """
+
+    def __init__(self, series=None, timeframe: int = None, period: int = 20, k: float = 2.0):
+        super().__init__(series, timeframe, window_size=period)
+        self.period = period
+        self.k = k
+        self.main = self.indicator("bollinger", period, k)
 
+    def decide(self, price: float) -> str | None:
+        bands = self.main.value()
+        if bands is None:
+            return None
+        lower, _, upper = bands
+        if price <= lower:
+            return "CALL"
+        if price >= upper:
+            return "PUT"
         return None
+
+    def batch(self, prices) -> tuple:
+        lower, _, upper = indicators.bollinger(prices, self.period, self.k)
+        calls = [p <= low for p, low in zip(prices, lower)]
+        puts = [p >= up for p, up in zip(prices, upper)]
+        return calls, puts
+
+
+# Strategie dostępne w konfiguracji aktywów (engine.AssetConfig.strategy)
+STRATEGIES = {"extremum": Strategy, "rsi": RSIStrategy, "ma_cross": MACrossStrategy, "bollinger": BollingerStrategy}
+
+
+def make_strategy(name: str, window_size: int = 5, series=None, **params) -> Strategy:
+    """
+    Tworzy strategię po nazwie: "extremum" (okno window_size) lub strategię wskaźnikową na serii series.
+    :param params: Parametry strategii wskaźnikowej (np. period=14, timeframe=60).
+    """
+    if name == "extremum":
+        return Strategy(window_size=window_size)
+    return STRATEGIES[name](series=series, **params)
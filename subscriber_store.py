@@ -0,0 +1,477 @@
+# subscriber_store.py – Хранилище подписчиков: журнал только на дозапись с периодическим уплотнением
+
+import os
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from metrics import InstrumentedLock
+
+try:
+    import fcntl
+except ImportError:  # Windows – журнал используется только одним процессом
+    fcntl = None
+
+
+ALL = "*"
+
+
+def _format_filter(assets, direction) -> str:
+    return f"{','.join(sorted(assets)) if assets else ALL} {direction or ALL}"
+
+
+class SubscriberStore:
+    """
+    Множество подписчиков, сохраняемое в текстовый журнал.
+    Каждое изменение дописывает одну строку ("add <id>" / "del <id>" /
+    "filter <id> <активы через запятую|*> <CALL|PUT|*>"), поэтому подписка и
+    отписка стоят O(1). Когда журнал становится заметно длиннее числа
+    подписчиков, он атомарно переписывается (уплотняется): подписчики без
+    фильтра – простым списком идентификаторов, как в старом subscribers.txt.
+    Уплотнение выполняет фоновый поток, а не обработчик, дописавший строку:
+    копия журнала пишется и синхронизируется с диском без блокировки.
+
+    Для рассылки ведётся обратный индекс (актив | None, направление | None) -> чаты.
+    Каждый чат лежит ровно в тех ключах, которые соответствуют его фильтру, поэтому
+    получатели сигнала – это объединение четырёх непересекающихся множеств,
+    и рассылка стоит O(подходящих подписчиков), а не O(всех).
+
+    Журналом могут пользоваться несколько процессов (движок и воркеры gunicorn,
+    принимающие webhook): запись идёт под блокировкой файла (flock), а перед
+    каждой операцией процесс дочитывает строки, дописанные другими, и
+    перечитывает журнал целиком, если его уплотнил кто-то другой.
+    """
+
+    def __init__(self, path: str, compact_ratio: float = 2.0, min_compact_lines: int = 1000,
+                 fsync: bool = False):
+        """
+        :param path: Путь к файлу журнала (config.SUBSCRIBERS_FILE).
+        :param compact_ratio: Уплотнять, когда строк в журнале больше, чем compact_ratio × подписчиков.
+        :param min_compact_lines: Не уплотнять журналы короче этого числа строк.
+        :param fsync: Выполнять os.fsync после каждой записи (надёжнее, но медленнее).
+        """
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_lines = min_compact_lines
+        self.fsync = fsync
+        self.lock = InstrumentedLock("subscribers")
+        self.ids: set[int] = set()
+        # Фильтры только у тех, кто их задал: chat_id -> (frozenset активов | None, направление | None)
+        self.filters: dict[int, tuple] = {}
+        self.index: dict[tuple, set[int]] = {}
+        self.journal_lines = 0
+        # Позиция, до которой журнал применён, и inode файла (меняется при уплотнении)
+        self.offset = 0
+        self.inode = None
+        self.file = None
+        self.compact_wanted = threading.Event()
+        self.compactor = None
+        self.lock_file = open(f"{path}.lock", "a") if fcntl is not None else None
+        with self._exclusive(sync=False):
+            self._load(complete_last_line=True)
+            self._open_journal()
+            if self._needs_compaction():
+                self._compact_locked()
+
+    @contextmanager
+    def _exclusive(self, sync: bool = True):
+        """
+        Блокировка для изменений: внутри процесса и (если есть fcntl) между процессами.
+        Перед изменением состояние дочитывается из журнала.
+        """
+        with self.lock:
+            if self.lock_file is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                if sync:
+                    self._sync()
+                yield
+            finally:
+                if self.lock_file is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _load(self, complete_last_line: bool = False) -> None:
+        """
+        Читает журнал целиком.
+        :param complete_last_line: Применить и оборванную последнюю строку (при старте: старый файл
+                                   без перевода строки); иначе она может дописываться другим процессом.
+        """
+        self.ids.clear()
+        self.filters.clear()
+        self.index.clear()
+        self.journal_lines = 0
+        self.offset = 0
+        try:
+            with open(self.path, "rb") as f:
+                self.inode = os.fstat(f.fileno()).st_ino
+                data = f.read()
+            if complete_last_line and data and not data.endswith(b"\n"):
+                data += b"\n"
+            self._apply_lines(data)
+            logging.info("Loaded %d subscribers from %s.", len(self.ids), self.path)
+        except FileNotFoundError:
+            self.inode = None
+            logging.info("No %s found – starting with an empty subscribers list.", self.path)
+
+    def _apply_lines(self, data: bytes) -> None:
+        """
+        Применяет полные строки из data (фрагмент журнала, начиная с self.offset).
+        """
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            self.journal_lines += 1
+            self._apply(line.split())
+        self.offset += end
+
+    def _sync(self) -> None:
+        """
+        Дочитывает изменения журнала, сделанные другими процессами (вызывается под self.lock).
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self.inode:
+            # Журнал уплотнён другим процессом – перечитываем его целиком
+            self.file.close()
+            while True:
+                self._load()
+                self.file = open(self.path, "a")
+                if os.fstat(self.file.fileno()).st_ino == self.inode:
+                    break
+                self.file.close()  # файл снова заменён между чтением и открытием
+        elif stat.st_size > self.offset:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                self._apply_lines(f.read())
+
+    def _apply(self, parts: list[str]) -> None:
+        """
+        Применяет одну строку журнала. Повреждённые строки (например, оборванные
+        при сбое) пропускаются.
+        """
+        try:
+            if len(parts) == 1:
+                # Старый формат: один идентификатор в строке
+                self._subscribe(int(parts[0]), None, None)
+            elif len(parts) == 2 and parts[0] == "add":
+                chat_id = int(parts[1])
+                if chat_id not in self.ids:
+                    self._subscribe(chat_id, None, None)
+            elif len(parts) == 2 and parts[0] == "del":
+                self._unsubscribe(int(parts[1]))
+            elif len(parts) == 4 and parts[0] == "filter":
+                assets = None if parts[2] == ALL else frozenset(parts[2].split(","))
+                direction = None if parts[3] == ALL else parts[3]
+                self._subscribe(int(parts[1]), assets, direction)
+        except ValueError:
+            logging.warning("Skipping malformed line in %s: %r", self.path, " ".join(parts))
+
+    def _keys(self, chat_id: int) -> list[tuple]:
+        assets, direction = self.filters.get(chat_id, (None, None))
+        if assets is None:
+            return [(None, direction)]
+        return [(asset, direction) for asset in assets]
+
+    def _subscribe(self, chat_id: int, assets, direction) -> None:
+        """
+        Подписывает чат (или меняет его фильтр) и обновляет индекс.
+        """
+        self._unsubscribe(chat_id)
+        self.ids.add(chat_id)
+        if assets is not None or direction is not None:
+            self.filters[chat_id] = (assets, direction)
+        for key in self._keys(chat_id):
+            self.index.setdefault(key, set()).add(chat_id)
+
+    def _unsubscribe(self, chat_id: int) -> None:
+        if chat_id not in self.ids:
+            return
+        for key in self._keys(chat_id):
+            chats = self.index.get(key)
+            if chats is not None:
+                chats.discard(chat_id)
+                if not chats:
+                    del self.index[key]
+        self.ids.discard(chat_id)
+        self.filters.pop(chat_id, None)
+
+    def _open_journal(self) -> None:
+        f = open(self.path, "a+")
+        # Если последняя строка оборвана, начинаем запись с новой строки
+        if f.tell() > 0:
+            f.seek(f.tell() - 1)
+            if f.read(1) != "\n":
+                f.write("\n")
+                f.flush()
+        self.file = f
+        self._mark_applied()
+
+    def _mark_applied(self) -> None:
+        stat = os.fstat(self.file.fileno())
+        self.inode = stat.st_ino
+        self.offset = stat.st_size
+
+    def _append(self, lines: list[str]) -> None:
+        self.file.write("".join(lines))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        # Под блокировкой файла журнал до этого места уже применён – наша запись последняя
+        self._mark_applied()
+        self.journal_lines += len(lines)
+        if self._needs_compaction():
+            self._request_compaction()
+
+    def _needs_compaction(self) -> bool:
+        return self.journal_lines > max(self.min_compact_lines, self.compact_ratio * len(self.ids))
+
+    def _request_compaction(self) -> None:
+        """
+        Поручает уплотнение фоновому потоку (вызывается под self.lock).
+        """
+        if self.compactor is None:
+            self.compactor = threading.Thread(target=self._compact_loop, name="SubscribersCompact", daemon=True)
+            self.compactor.start()
+        self.compact_wanted.set()
+
+    def _compact_loop(self) -> None:
+        while True:
+            self.compact_wanted.wait()
+            self.compact_wanted.clear()
+            try:
+                with self.lock:
+                    needed = self._needs_compaction()
+                if needed:
+                    self.compact()
+            except Exception as e:
+                logging.error("Failed to compact %s: %s", self.path, e)
+
+    def add(self, chat_id: int) -> bool:
+        """
+        Добавляет подписчика. Возвращает True, если он не был подписан ранее.
+        """
+        with self._exclusive():
+            if chat_id in self.ids:
+                return False
+            self._subscribe(chat_id, None, None)
+            self._append([f"add {chat_id}\n"])
+            return True
+
+    def discard(self, chat_id: int) -> bool:
+        """
+        Удаляет подписчика. Возвращает True, если он был подписан.
+        """
+        return self.discard_many([chat_id]) > 0
+
+    def discard_many(self, chat_ids) -> int:
+        """
+        Удаляет нескольких подписчиков одной записью в журнал.
+        :return: Количество фактически удалённых.
+        """
+        with self._exclusive():
+            removed = [chat_id for chat_id in set(chat_ids) if chat_id in self.ids]
+            if removed:
+                for chat_id in removed:
+                    self._unsubscribe(chat_id)
+                self._append([f"del {chat_id}\n" for chat_id in removed])
+            return len(removed)
+
+    def set_filter(self, chat_id: int, assets=None, direction: str = None) -> None:
+        """
+        Задаёт фильтр подписки чата (и подписывает его, если он ещё не подписан).
+        :param assets: Набор активов (например {"EURUSD", "GBPUSD"}) или None – все активы.
+        :param direction: "CALL", "PUT" или None – оба направления.
+        """
+        assets = frozenset(asset.upper() for asset in assets) if assets else None
+        direction = str(direction).upper() if direction else None
+        with self._exclusive():
+            self._subscribe(chat_id, assets, direction)
+            self._append([f"filter {chat_id} {_format_filter(assets, direction)}\n"])
+
+    def get_filter(self, chat_id: int) -> tuple:
+        """
+        Возвращает фильтр чата: (frozenset активов | None, направление | None).
+        """
+        with self.lock:
+            self._sync()
+            return self.filters.get(chat_id, (None, None))
+
+    def recipients(self, asset: str, direction: str) -> list[int]:
+        """
+        Подписчики, которым нужно отправить сигнал по активу asset в направлении direction.
+        Стоимость – O(числа получателей): множества индекса не пересекаются.
+        """
+        direction = str(direction)
+        with self.lock:
+            self._sync()
+            recipients = []
+            for key in ((asset, direction), (asset, None), (None, direction), (None, None)):
+                chats = self.index.get(key)
+                if chats:
+                    recipients.extend(chats)
+            return recipients
+
+    def snapshot(self) -> list[int]:
+        """
+        Возвращает копию списка подписчиков (для рассылки).
+        """
+        with self.lock:
+            self._sync()
+            return list(self.ids)
+
+    def compact(self) -> None:
+        """
+        Атомарно переписывает журнал в виде списка текущих подписчиков.
+        Копия пишется без блокировки; если журнал за это время изменился, она пишется заново под блокировкой.
+        """
+        with self._exclusive():
+            data = self._render()
+            applied = (self.inode, self.offset)
+        tmp_path = self._write_copy(data)
+        try:
+            with self._exclusive():
+                if (self.inode, self.offset) != applied:
+                    os.unlink(tmp_path)
+                    tmp_path = self._write_copy(self._render())
+                self._replace(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _compact_locked(self) -> None:
+        self._replace(self._write_copy(self._render()))
+
+    def _render(self) -> str:
+        return "".join(f"{chat_id}\n" if chat_id not in self.filters
+                       else f"filter {chat_id} {_format_filter(*self.filters[chat_id])}\n"
+                       for chat_id in self.ids)
+
+    def _write_copy(self, data: str) -> str:
+        """
+        Пишет уплотнённый журнал во временный файл рядом с журналом и синхронизирует его с диском.
+        :return: Путь временного файла.
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}-", suffix=".tmp",
+                                        dir=os.path.dirname(self.path) or ".")
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def _replace(self, tmp_path: str) -> None:
+        """
+        Подменяет журнал уплотнённой копией (под блокировкой). Как в checkpoint.write(),
+        после os.replace синхронизируется каталог – иначе после сбоя может вернуться старый журнал.
+        """
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        directory = os.path.dirname(self.path) or "."
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self.file = open(self.path, "a")
+        self._mark_applied()
+        self.journal_lines = len(self.ids)
+        logging.info("Compacted %s to %d subscribers.", self.path, len(self.ids))
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _expected_state(worker: int, operations: int) -> tuple[set, dict]:
+    """
+    Итог _churn(worker, operations): у каждого процесса свои chat_id, множества не пересекаются.
+    """
+    base = (worker + 1) * 1_000_000
+    ids = {base + i for i in range(operations) if i % 3}
+    filters = {base + i: (frozenset({"EURUSD"}), "CALL") for i in range(operations) if i % 3 and i % 5 == 0}
+    return ids, filters
+
+
+def _churn(path: str, worker: int, operations: int) -> None:
+    """
+    Процесс-участник проверки: подписки, отписки и фильтры через собственный SubscriberStore.
+    """
+    store = SubscriberStore(path, min_compact_lines=50)
+    base = (worker + 1) * 1_000_000
+    for i in range(operations):
+        chat_id = base + i
+        store.add(chat_id)
+        if i % 5 == 0:
+            store.set_filter(chat_id, {"eurusd"}, "call")
+        if i % 3 == 0:
+            store.discard(chat_id)
+        if i % 11 == 0:
+            store.discard_many([chat_id - 1, chat_id - 2])
+            for old in (chat_id - 1, chat_id - 2):
+                if old >= base and (old - base) % 3:
+                    store.add(old)  # возвращаем, чтобы итог не зависел от discard_many
+                    if (old - base) % 5 == 0:
+                        store.set_filter(old, {"eurusd"}, "call")
+
+
+def self_check(workers: int = 3, operations: int = 600) -> None:
+    """
+    Несколько процессов одновременно дописывают журнал, пока этот процесс раз за разом его уплотняет
+    (и фоновый поток уплотнения каждого процесса делает то же самое). В конце каждый участник после
+    синхронизации и заново загруженный журнал должны видеть один и тот же итог без потерянных строк.
+    """
+    import multiprocessing
+
+    directory = tempfile.mkdtemp(prefix="subscribers-check-")
+    path = os.path.join(directory, "subscribers.txt")
+    try:
+        # Старый формат (идентификатор в строке, последняя строка без перевода) читается как есть
+        with open(path, "w") as f:
+            f.write("7\n-100123\n42")
+        store = SubscriberStore(path, min_compact_lines=50)
+        assert store.ids == {7, -100123, 42}, store.ids
+
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_churn, args=(path, worker, operations)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        compactions = 0
+        while any(process.is_alive() for process in processes):
+            store.compact()
+            compactions += 1
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0, process.exitcode
+
+        ids, filters = {7, -100123, 42}, {}
+        for worker in range(workers):
+            worker_ids, worker_filters = _expected_state(worker, operations)
+            ids |= worker_ids
+            filters.update(worker_filters)
+        assert set(store.snapshot()) == ids, len(set(store.snapshot()) ^ ids)
+        assert store.filters == filters
+        reloaded = SubscriberStore(path)
+        assert reloaded.ids == ids and reloaded.filters == filters
+        assert sorted(reloaded.recipients("EURUSD", "CALL")) == sorted(ids)
+        assert sorted(reloaded.recipients("GBPUSD", "PUT")) == sorted(ids - set(filters))
+        print(f"OK: {workers} процесса по {operations} операций, {compactions} уплотнений во время записи – "
+              f"{len(ids)} подписчиков, журнал после перезагрузки совпадает.")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка журнала подписчиков: несколько процессов и уплотнение.")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--operations", type=int, default=600)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    self_check(args.workers, args.operations)
@@ -0,0 +1,414 @@
+# tick_archive.py – Archiwum ticków: binarne segmenty stałej szerokości, indeks czasu i odczyt przez mmap
+#   python tick_archive.py                 # sprawdzenie offline (zakresy, odtworzenie = przebieg na żywo)
+#   python tick_archive.py --info DIR      # aktywa, segmenty i zakresy czasu archiwum
+#
+# Układ katalogu: {root}/{aktywo}/{n:08d}.seg – rekordy (ts float64, cena float64), rosnąco po ts,
+#                 {root}/{aktywo}/{n:08d}.idx – ts co INDEX_STRIDE-tego rekordu segmentu (float64).
+# Aktywo wyznacza katalog, więc rekord nie musi go powtarzać, a wycinek zakresu czasu jest ciągły.
+
+import os
+import re
+import mmap
+import time
+import struct
+import random
+import logging
+import argparse
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+
+import config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny – bez niego wycinki są obiektami memoryview
+    np = None
+
+RECORD = struct.Struct("<dd")
+INDEX_STRIDE = 1024
+_ASSET_NAME = re.compile(r"^[A-Za-z0-9_.#-]+$")
+_SEGMENT_NAME = re.compile(r"^(\d{8})\.seg$")
+
+
+def _asset_dir(root: str, asset: str) -> str:
+    if not _ASSET_NAME.match(asset):
+        raise ValueError(f"Niedozwolona nazwa aktywa w archiwum: {asset!r}")
+    return os.path.join(root, asset)
+
+
+def _segment_numbers(directory: str) -> list[int]:
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(_SEGMENT_NAME.match, names) if match)
+
+
+class _SegmentWriter:
+    """
+    Dopisywanie ticków jednego aktywa do bieżącego segmentu (i jego indeksu); po SEGMENT_RECORDS rekordach
+    otwiera następny. Zapisy są buforowane – widoczne dla czytelników po flush().
+    """
+
+    def __init__(self, directory: str, segment_records: int):
+        self.directory = directory
+        self.segment_records = segment_records
+        os.makedirs(directory, exist_ok=True)
+        numbers = _segment_numbers(directory)
+        self.number = numbers[-1] if numbers else 0
+        self.last_time = None
+        self._open()
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"{self.number:08d}{suffix}")
+
+    def _open(self) -> None:
+        path = self._path(".seg")
+        records = os.path.getsize(path) // RECORD.size if os.path.exists(path) else 0
+        # Po awarii ostatni rekord może być niepełny – obcinamy do pełnych rekordów
+        with open(path, "ab") as f:
+            f.truncate(records * RECORD.size)
+        # Indeks bieżącego segmentu odbudowujemy z danych – mógł nie zostać zapisany do końca
+        index = array("d")
+        if records:
+            with open(path, "rb") as f:
+                for position in range(0, records, INDEX_STRIDE):
+                    f.seek(position * RECORD.size)
+                    index.append(RECORD.unpack(f.read(RECORD.size))[0])
+                f.seek((records - 1) * RECORD.size)
+                self.last_time = RECORD.unpack(f.read(RECORD.size))[0]
+        with open(self._path(".idx"), "wb") as f:
+            index.tofile(f)
+        self.records = records
+        self.segment = open(path, "ab")
+        self.index = open(self._path(".idx"), "ab")
+
+    def append(self, ts: float, price: float) -> bool:
+        """
+        :return: False, jeśli tick nie jest późniejszy od ostatniego (archiwum jest rosnące po czasie).
+        """
+        if self.last_time is not None and ts <= self.last_time:
+            return False
+        if self.records >= self.segment_records:
+            self.close()
+            self.number += 1
+            self._open()
+        if self.records % INDEX_STRIDE == 0:
+            self.index.write(struct.pack("<d", ts))
+        self.segment.write(RECORD.pack(ts, price))
+        self.records += 1
+        self.last_time = ts
+        return True
+
+    def flush(self) -> None:
+        # Najpierw dane, potem indeks; czytelnik i tak uzupełnia brakujące wpisy indeksu z danych
+        self.segment.flush()
+        self.index.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.segment.close()
+        self.index.close()
+
+
+class TickRecorder:
+    """
+    Zapis ticków (czas, aktywo, cena) do archiwum. Wywoływany w wątku ticka dostawcy danych:
+    dopisanie rekordu to zapis do bufora pliku, a bufory trafiają na dysk co flush_interval sekund.
+    Jedno aktywo może nagrywać tylko jeden proces (silnik przydziela je pierwszemu strumieniowi aktywa).
+    """
+
+    def __init__(self, root: str = None, segment_records: int = None, flush_interval: float = None):
+        """
+        :param root: Katalog archiwum (domyślnie config.TICK_ARCHIVE_DIR).
+        :param segment_records: Liczba rekordów w segmencie (domyślnie config.TICK_SEGMENT_RECORDS).
+        :param flush_interval: Co ile sekund opróżniać bufory (domyślnie config.TICK_FLUSH_INTERVAL).
+        """
+        self.root = root if root is not None else config.TICK_ARCHIVE_DIR
+        self.segment_records = segment_records if segment_records is not None else config.TICK_SEGMENT_RECORDS
+        self.flush_interval = flush_interval if flush_interval is not None else config.TICK_FLUSH_INTERVAL
+        self.writers: dict[str, _SegmentWriter] = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, asset: str, ts: float, price: float) -> bool:
+        """
+        Dopisuje tick. Ticki nie późniejsze niż ostatni tick aktywa są pomijane.
+        """
+        writer = self.writers.get(asset)
+        if writer is None:
+            writer = self.writers[asset] = _SegmentWriter(_asset_dir(self.root, asset), self.segment_records)
+        added = writer.append(ts, price)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return added
+
+    def flush(self) -> None:
+        self.last_flush = time.monotonic()
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+class _Segment:
+    """
+    Segment archiwum zmapowany w pamięci (tylko do odczytu) wraz z indeksem czasu.
+    Pełny segment jest niezmienny; ostatni może rosnąć – refresh() mapuje go ponownie.
+    """
+
+    def __init__(self, directory: str, number: int):
+        self.path = os.path.join(directory, f"{number:08d}.seg")
+        self.index_path = os.path.join(directory, f"{number:08d}.idx")
+        self.records = 0
+        self.ts = self.price = None
+        self.index = array("d")
+
+    def refresh(self) -> None:
+        records = os.path.getsize(self.path) // RECORD.size
+        if records == self.records:
+            return
+        with open(self.path, "rb") as f:
+            # Wcześniejsze widoki trzymają referencję do swojej mapy, więc pozostają ważne
+            buffer = mmap.mmap(f.fileno(), records * RECORD.size, access=mmap.ACCESS_READ) if records else b""
+        if np is not None:
+            columns = np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+            self.ts, self.price = columns[:, 0], columns[:, 1]
+        else:
+            flat = memoryview(buffer).cast("d")
+            self.ts, self.price = flat[0::2], flat[1::2]
+        index = array("d")
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            index.frombytes(data[:len(data) - len(data) % index.itemsize])
+        except FileNotFoundError:
+            pass
+        # Plik segmentu opróżnia swój bufor sam (co kilkaset rekordów), a indeks dopiero przy flush(),
+        # więc przy nagrywaniu w toku indeks zwykle nie pokrywa końca danych – brakujące wpisy bierzemy
+        # wprost z mapy (ts co INDEX_STRIDE-tego rekordu). Nadmiarowe wpisy (bez rekordów) odrzucamy.
+        blocks = (records + INDEX_STRIDE - 1) // INDEX_STRIDE
+        del index[blocks:]
+        for block in range(len(index), blocks):
+            index.append(float(self.ts[block * INDEX_STRIDE]))
+        self.index = index
+        self.records = records
+
+    @property
+    def first_time(self) -> float | None:
+        return self.index[0] if self.index else None
+
+    @property
+    def last_time(self) -> float | None:
+        return float(self.ts[self.records - 1]) if self.records else None
+
+    def position(self, ts: float, right: bool = False) -> int:
+        """
+        Pozycja pierwszego rekordu o czasie >= ts (right=True: > ts).
+        Indeks zawęża wyszukiwanie do jednego bloku INDEX_STRIDE rekordów – dotykamy jednej-dwóch stron mapy.
+        """
+        find = bisect_right if right else bisect_left
+        block = find(self.index, ts) - 1
+        if block < 0:
+            return 0
+        lo = block * INDEX_STRIDE
+        # Ostatni blok indeksu sięga do końca segmentu
+        hi = min(lo + INDEX_STRIDE, self.records) if block + 1 < len(self.index) else self.records
+        if np is not None:
+            return lo + int(np.searchsorted(self.ts[lo:hi], ts, side="right" if right else "left"))
+        return find(self.ts, ts, lo, hi)
+
+
+class TickArchive:
+    """
+    Odczyt archiwum ticków. Wycinki zakresu czasu to widoki bez kopii na zmapowane segmenty:
+    tablice NumPy tylko do odczytu albo memoryview (bez NumPy).
+    Archiwum może być jednocześnie nagrywane przez inny proces – każde zapytanie widzi dane po ostatnim flush().
+    """
+
+    def __init__(self, root: str = None):
+        """
+        :param root: Katalog archiwum (domyślnie config.TICK_ARCHIVE_DIR).
+        """
+        self.root = root if root is not None else config.TICK_ARCHIVE_DIR
+        self.segments: dict[str, list[_Segment]] = {}
+
+    def assets(self) -> list[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names
+                      if _ASSET_NAME.match(name) and os.path.isdir(os.path.join(self.root, name)))
+
+    def _segments(self, asset: str) -> list[_Segment]:
+        directory = _asset_dir(self.root, asset)
+        segments = self.segments.setdefault(asset, [])
+        known = len(segments)
+        for number in _segment_numbers(directory)[known:]:
+            segments.append(_Segment(directory, number))
+        # Pełne segmenty się nie zmieniają – odświeżamy nowe i ostatni (mógł urosnąć)
+        for segment in segments[max(known - 1, 0):]:
+            segment.refresh()
+        return segments
+
+    def slices(self, asset: str, start: float = None, end: float = None):
+        """
+        Generator wycinków (ts, cena) kolejnych segmentów z zakresu [start, end) – każdy bez kopii.
+        """
+        for segment in self._segments(asset):
+            if not segment.records:
+                continue
+            if end is not None and segment.first_time >= end:
+                break
+            if start is not None and segment.last_time < start:
+                continue
+            lo = segment.position(start) if start is not None else 0
+            hi = segment.position(end) if end is not None else segment.records
+            if lo < hi:
+                yield segment.ts[lo:hi], segment.price[lo:hi]
+
+    def range(self, asset: str, start: float = None, end: float = None) -> tuple:
+        """
+        Ticki aktywa z zakresu [start, end) jako (czasy, ceny).
+        Zakres w jednym segmencie to widoki bez kopii; zakres obejmujący kilka segmentów jest sklejany (kopia).
+        """
+        parts = list(self.slices(asset, start, end))
+        if len(parts) == 1:
+            return parts[0]
+        if np is not None:
+            if not parts:
+                return np.empty(0), np.empty(0)
+            return np.concatenate([ts for ts, _ in parts]), np.concatenate([price for _, price in parts])
+        ts, price = array("d"), array("d")
+        for ts_part, price_part in parts:
+            ts.extend(ts_part)
+            price.extend(price_part)
+        return memoryview(ts), memoryview(price)
+
+    def ticks(self, asset: str, start: float = None, end: float = None, chunk: int = 4096):
+        """
+        Generator ticków (ts, cena) jako liczb Pythona – do odtwarzania przez ReplayDataProvider.
+        """
+        for ts, price in self.slices(asset, start, end):
+            for i in range(0, len(ts), chunk):
+                yield from zip(ts[i:i + chunk].tolist(), price[i:i + chunk].tolist())
+
+    def info(self, asset: str) -> dict:
+        segments = [segment for segment in self._segments(asset) if segment.records]
+        return {
+            "segments": len(segments),
+            "ticks": sum(segment.records for segment in segments),
+            "first": segments[0].first_time if segments else None,
+            "last": segments[-1].last_time if segments else None,
+        }
+
+
+def self_check(count: int = 50_000, segment_records: int = 7_000, queries: int = 500, seed: int = 3) -> None:
+    """
+    Sprawdzenie offline: zakresy czasu z archiwum (kilka segmentów) = filtr na liście w pamięci,
+    a odtworzenie nagranego przebiegu symulatora przez ReplayDataProvider daje te same sygnały.
+    """
+    from clock import VirtualClock
+    from series import AssetSeries
+    from strategy import Strategy
+    from money import MoneyManager
+    from event_bus import TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED
+    from data_provider import DummyDataProvider, ReplayDataProvider
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as root:
+        recorder = TickRecorder(root, segment_records=segment_records, flush_interval=3600)
+        ticks = []
+        ts = 1_700_000_000.0
+        for _ in range(count):
+            ts += rng.choice((0.25, 0.5, 1.0, 2.0))
+            price = round(1.1 + rng.uniform(-0.01, 0.01), 5)
+            ticks.append((ts, price))
+            recorder.record("CHECK", ts, price)
+        assert not recorder.record("CHECK", ts, 1.0), "tick nie późniejszy od ostatniego musi być pominięty"
+        recorder.flush()
+        archive = TickArchive(root)
+        assert archive.info("CHECK")["ticks"] == count
+        times = [t for t, _ in ticks]
+        for _ in range(queries):
+            start, end = sorted(rng.uniform(times[0] - 10, times[-1] + 10) for _ in range(2))
+            got_ts, got_price = archive.range("CHECK", start, end)
+            expected = [(t, p) for t, p in ticks if start <= t < end]
+            assert list(zip(got_ts, got_price)) == expected, (start, end)
+        recorder.close()
+
+        # Odczyt w trakcie nagrywania: dane trafiają na dysk bez indeksu (bufor pliku segmentu), a indeks
+        # pojawia się dopiero po flush() – zapytania muszą widzieć wszystko, co już jest w pliku danych
+        concurrent = TickRecorder(root, segment_records=segment_records, flush_interval=3600)
+        reader = TickArchive(root)
+        ts = 1_800_000_000.0
+        written = []
+        for step in range(3 * INDEX_STRIDE + 17):
+            ts += 0.5
+            concurrent.record("LIVE_READ", ts, 1.0 + step * 1e-5)
+            written.append(ts)
+            if step % 301 == 0:
+                concurrent.writers["LIVE_READ"].segment.flush()  # tylko dane, indeks zostaje w buforze
+                visible = written[:]
+                for _ in range(5):
+                    start, end = sorted(rng.uniform(visible[0] - 5, visible[-1] + 5) for _ in range(2))
+                    got_ts, _ = reader.range("LIVE_READ", start, end)
+                    assert list(got_ts) == [t for t in visible if start <= t < end], (step, start, end)
+                assert len(reader.range("LIVE_READ")[0]) == len(visible)
+        concurrent.close()
+
+        # Przebieg na żywo z nagrywaniem, a potem odtworzenie archiwum przez ten sam potok
+        class _Bus:
+            def __init__(self):
+                self.events = []
+
+            def publish(self, topic, signal):
+                if topic in (TOPIC_SIGNAL_NEW, TOPIC_SIGNAL_SETTLED):
+                    self.events.append((topic, str(signal.direction), signal.amount, signal.entry_price,
+                                        str(signal.result)))
+
+        live_bus, replay_bus = _Bus(), _Bus()
+        live_clock = VirtualClock(1_700_000_000)
+        live = DummyDataProvider("LIVE", Strategy(5), MoneyManager(1.0), bus=live_bus, clock=live_clock, seed=seed,
+                                 trade_duration_steps=6, series=AssetSeries("LIVE"))
+        live.recorder = TickRecorder(root, segment_records=segment_records)
+        for _ in range(5_000):
+            live.step()
+            live_clock.sleep(live.update_interval)
+        live.recorder.close()
+        replay = ReplayDataProvider("LIVE", Strategy(5), MoneyManager(1.0), TickArchive(root), bus=replay_bus,
+                                    clock=VirtualClock(0), series=AssetSeries("LIVE"))
+        replay.trade_duration = 6 * live.update_interval
+        while not replay.finished:
+            replay.step()
+            replay.clock.sleep(replay.update_interval)
+        # Symulator rozlicza po numerze ticka, a odtworzenie po czasie – przy stałym odstępie to te same chwile
+        assert replay_bus.events == live_bus.events, "odtworzenie różni się od przebiegu na żywo"
+    print(f"OK: {queries} zapytań o zakres w {count // segment_records + 1} segmentach, "
+          f"odtworzenie {len(live_bus.events)} zdarzeń zgodne z przebiegiem na żywo.")
+
+
+def print_info(root: str) -> None:
+    archive = TickArchive(root)
+    for asset in archive.assets():
+        info = archive.info(asset)
+        first = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info["first"])) if info["first"] else "-"
+        last = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info["last"])) if info["last"] else "-"
+        print(f"{asset:<16} {info['ticks']:>12} ticków {info['segments']:>5} segm.  {first} – {last}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiwum ticków: sprawdzenie offline lub podsumowanie katalogu.")
+    parser.add_argument("--info", metavar="DIR", help="Wypisz aktywa i zakresy archiwum zamiast sprawdzenia")
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    if args.info:
+        print_info(args.info)
+    else:
+        self_check(args.count, seed=args.seed)
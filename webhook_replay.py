@@ -0,0 +1,87 @@
+# webhook_replay.py - Отправка записанных обновлений Telegram на локальный маршрут /telegram/webhook
+#   python webhook_replay.py                          # встроенные примеры (/start, /assets, web_app_data, /stop)
+#   python webhook_replay.py updates.jsonl --url http://127.0.0.1:5000/telegram/webhook --secret s3cret
+# Файл содержит по одному JSON-объекту Update в строке (как в ответе getUpdates).
+
+import sys
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+
+import config
+
+
+def sample_updates(chat_id: int = 100001) -> list[dict]:
+    """
+    Примеры обновлений: подписка, фильтр по активам, фильтр из Mini App и отписка.
+    """
+    def message(update_id: int, **fields) -> dict:
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": "Replay"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Replay"},
+                **fields,
+            },
+        }
+
+    def command(update_id: int, text: str) -> dict:
+        name = text.split()[0]
+        return message(update_id, text=text,
+                       entities=[{"type": "bot_command", "offset": 0, "length": len(name)}])
+
+    return [
+        command(1, "/start"),
+        command(2, "/assets EURUSD GBPUSD"),
+        message(3, web_app_data={"button_text": "⚙️ Signal filters",
+                                 "data": json.dumps({"action": "filters", "assets": ["EURUSD"],
+                                                     "direction": "CALL"})}),
+        command(4, "/stop"),
+    ]
+
+
+def post(url: str, secret: str, update: dict, timeout: float = 10.0) -> int:
+    """
+    Отправляет одно обновление и возвращает HTTP-статус ответа.
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Отправка записанных обновлений Telegram на webhook.")
+    parser.add_argument("updates", nargs="?", help="Файл JSONL с обновлениями (по умолчанию – встроенные примеры)")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/telegram/webhook")
+    parser.add_argument("--secret", default=config.WEBHOOK_SECRET)
+    parser.add_argument("--chat-id", type=int, default=100001, help="Чат для встроенных примеров")
+    args = parser.parse_args()
+
+    if args.updates:
+        with open(args.updates) as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+    else:
+        updates = sample_updates(args.chat_id)
+    failed = 0
+    for update in updates:
+        started = time.perf_counter()
+        status = post(args.url, args.secret, update)
+        failed += status != 200
+        print(f"update {update.get('update_id')}: HTTP {status} ({1000 * (time.perf_counter() - started):.1f} ms)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
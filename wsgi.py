@@ -0,0 +1,52 @@
+# wsgi.py - Точка входа WSGI для нескольких воркеров gunicorn:
+#   WEB_SERVER=none python main.py        # движок и бот
+#   gunicorn wsgi:app                     # Mini App и API (воркеры gevent, см. gunicorn.conf.py)
+# Воркеры не видят память движка: каждый читает новые и рассчитанные сигналы из общей истории
+# SQLite (WAL) и ведёт собственные буфер, статистику и SSE. Запускать без --preload –
+# поток чтения должен стартовать в каждом воркере.
+# В воркере gevent соединение SSE – гринлет, поэтому лимит SSE_WORKER_CLIENTS близок к worker_connections.
+# Воркер с потоками (sync/gthread) держит SSE только в пределах --threads: лимит SSE_THREAD_CLIENTS
+# и предупреждение в логе, остальные клиенты Mini App получают 503 и опрашивают /api/signals.
+# Метрики движка (тики, рассылка, Telegram) отдаёт сам процесс main.py на METRICS_PORT.
+
+import logging
+
+import config
+import signal_store
+import app_server
+from live_feed import feed
+from stats import stats
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# Буфер, статистика и номер последнего изменения читаются из одного снимка базы: движок в это время
+# продолжает писать, и поток чтения продолжит ровно с того изменения, на котором закончилась загрузка
+with signal_store.history.snapshot():
+    seq = signal_store.history.latest_seq()
+    signal_store.load_recent()
+    stats.load(signal_store.history.iter_all())
+    reader = signal_store.FeedReader(signal_store.history, seq, interval=config.FEED_POLL_INTERVAL)
+app_server.subscribe_consumers()
+reader.start()
+
+
+def cooperative_worker() -> bool:
+    """
+    Работает ли воркер на gevent (gunicorn -k gevent патчит сокеты до загрузки приложения).
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+if cooperative_worker():
+    feed.max_clients = min(config.SSE_MAX_CLIENTS, config.SSE_WORKER_CLIENTS)
+else:
+    # Потоки воркера конечны: оставляем часть для /api/signals и /api/stats
+    feed.max_clients = min(config.SSE_MAX_CLIENTS, config.SSE_THREAD_CLIENTS)
+    logging.warning("Воркер без gevent: не больше %d соединений SSE, остальные клиенты перейдут на опрос. "
+                    "Запускайте gunicorn wsgi:app с gunicorn.conf.py (worker_class = gevent).", feed.max_clients)
+
+app = app_server.app